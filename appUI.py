@@ -1,13 +1,19 @@
-import autogen
+import asyncio
+import os
+import time
 from rich import print
 import chainlit as cl
-from typing_extensions import Annotated
 from chainlit.input_widget import (
    Select, Slider, Switch)
-from autogen import AssistantAgent, UserProxyAgent
-from utils.chainlit_agents import ChainlitUserProxyAgent, ChainlitAssistantAgent
+from utils.agent_factory import AgentFactory
+from utils.answer_cache import answer_cache_from_env
+from utils.completion_cache import get_completion_cache
+from utils.embedding_cache import get_embedding_cache
+from utils.graphrag_index import get_index
+from utils.retrieval_executor import retrieval_executor_from_env
+from utils.tracing import breakdown, get_tracer
 # from graphrag.query.cli import run_global_search, run_local_search
-from graphrag.cli.query import run_global_search, run_local_search
+# from graphrag.cli.query import run_global_search, run_local_search
 
 # LLama3 LLM from Lite-LLM Server for Agents #
 llm_config_autogen = {
@@ -19,6 +25,77 @@ llm_config_autogen = {
     ],
     "timeout": 60000,
 }
+MAX_ITER = 10
+
+# Shared by every session; keyed by search settings and artifact version #
+answer_cache = answer_cache_from_env()
+
+# GraphRAG artifacts are loaded once per process and shared by every session #
+ROOT_DIR = '.'
+graphrag_index = get_index(ROOT_DIR)
+try:
+    graphrag_index.snapshot()
+except Exception as e:
+    print("GraphRAG index not loaded yet:", e)
+
+# Searches run on a bounded worker pool so they never block the event loop #
+retrieval_executor = retrieval_executor_from_env()
+
+# Span tracing; enabled with TRACE_FILE and/or TRACE_CHAINLIT_STEPS #
+tracer = get_tracer()
+
+def retrieve(local_search, community, response_type, question):
+    search_type = "local" if local_search else "global"
+    snapshot = graphrag_index.snapshot()
+    version = snapshot.version
+    result = answer_cache.get(search_type, community, response_type, question, version)
+    if result is None:
+        start = time.perf_counter()
+        result = snapshot.search(local_search, community, response_type, question)
+        answer_cache.put(search_type, community, response_type, question, version,
+                         result, time.perf_counter() - start)
+    print("Answer cache:", answer_cache.summary())
+    return result
+
+async def query_graphRAG(context, question):
+    print(f"Invoking GraphRAG retrieval with question: {question}")
+    async with cl.Step(name="query_graphRAG", type="tool") as step:
+        step.input = question
+        with tracer.span("tool.query_graphRAG", question=question) as span:
+            try:
+                result = await retrieval_executor.run(
+                    context["session_id"], retrieve, context["local_search"],
+                    context["community"], context["response_type"], question)
+            except asyncio.TimeoutError:
+                result = f"GraphRAG retrieval timed out after {retrieval_executor.timeout:.0f}s."
+                span.set(timed_out=True)
+        step.output = result
+    await cl.Message(content=result).send()
+    return result
+
+# Clients and tool schemas are built once; sessions borrow pooled agent sets #
+# Completions are cached on disk and shared by every session #
+agent_factory = AgentFactory(llm_config_autogen, query_graphRAG, max_round=MAX_ITER, stream=True,
+                             prompt_token_budget=int(os.environ.get("AGENT_PROMPT_TOKEN_BUDGET", "6000")),
+                             cache=get_completion_cache())
+
+def cache_report():
+    rows = []
+    for name, cache in [("Completions", get_completion_cache()), ("Embeddings", get_embedding_cache())]:
+        if cache is None:
+            rows.append(f"| {name} | disabled | | | |")
+            continue
+        stats = cache.stats()
+        rows.append(f"| {name} | {stats['entries']} | {stats['hits']} / {stats['misses']} "
+                    f"| {stats['hit_rate']:.1%} | {stats['bytes'] / 1e6:.1f} MB |")
+    answers = answer_cache.summary()
+    rows.append(f"| Answers | {answers['entries']} | {answers['exact_hits'] + answers['semantic_hits']} / {answers['misses']} "
+                f"| {answers['hit_rate']:.1%} | in memory |")
+    return "\n".join([
+        "| Cache | Entries | Hits / misses | Hit rate | Size |",
+        "|---|---|---|---|---|",
+        *rows,
+    ])
 
 @cl.on_chat_start
 async def on_chat_start():
@@ -52,66 +129,10 @@ async def on_chat_start():
     cl.user_session.set("Community", community)
     cl.user_session.set("Search_type", local_search)
 
-    # retriever   = AssistantAgent(
-    #    name="Retriever", 
-    #    llm_config=llm_config_autogen, 
-    #    system_message="""Only execute the function query_graphRAG to look for context. 
-    #                 Output 'TERMINATE' when an answer has been provided.""",
-    #    max_consecutive_auto_reply=1,
-    #    human_input_mode="NEVER", 
-    #    description="Retriever Agent"
-    # )
-
-    user_proxy = ChainlitUserProxyAgent(
-        name="User_Proxy",
-        human_input_mode="ALWAYS",
-        llm_config=llm_config_autogen,
-        is_termination_msg=lambda x: x.get("content", "").rstrip().endswith("TERMINATE"),
-        code_execution_config=False,
-        system_message='''A human admin.''',
-        description="User Proxy Agent"
-    )
-
-    predictor = AssistantAgent(
-        name="Predictor",
-        is_termination_msg=lambda x: "TERMINATE" in str(x.get("content", "")).upper(),
-        system_message="You are a medical expert specializing in CHF prediction.",
-        llm_config=llm_config_autogen,
-        description="Medical expert predicting CHF within 5 years.",
-    )
-
-    critic = AssistantAgent(
-        name="Critic",
-        is_termination_msg=lambda x: "TERMINATE" in str(x.get("content", "")).upper(),
-        system_message="You are an assistant evaluating and providing feedback for CHF predictions.",
-        llm_config=llm_config_autogen,
-        description="Critic providing feedback for predictions.",
-    )
-
-    assistant = autogen.AssistantAgent(
-        name="Assistant",
-        human_input_mode="NEVER",
-        system_message="""Only execute the function to retrieve for context.""",
-        llm_config=llm_config_autogen
-    )
-
-    helper = autogen.AssistantAgent(
-        name="Helper",
-        human_input_mode="NEVER",
-        system_message="""Interact with the retriever to provide any context.""",
-        llm_config=llm_config_autogen
-    )
-    
-    print("Set agents.")
-
-    # cl.user_session.set("Query Agent", user_proxy)
-    # cl.user_session.set("Retriever", retriever)
-
-    cl.user_session.set("User Proxy", user_proxy)
-    cl.user_session.set("Predictor", predictor)
-    cl.user_session.set("Critic", critic)
-    # cl.user_session.set("Assistant", assistant)
-    cl.user_session.set("Helper", helper)
+    start = time.perf_counter()
+    agents = agent_factory.acquire()
+    cl.user_session.set("Agents", agents)
+    print(f"Set agents in {(time.perf_counter() - start) * 1000:.1f} ms.")
 
     msg = cl.Message(content=f"""Hello! What task would you like to get done today?      
                      """, 
@@ -134,139 +155,55 @@ async def setup_agent(settings):
     cl.user_session.set("Search_type", local_search)
     print("on_settings_update", settings)
 
+@cl.on_stop
+async def cancel_retrievals():
+    cancelled = retrieval_executor.cancel_session(cl.user_session.get("id"))
+    if cancelled:
+        print(f"Cancelled {cancelled} GraphRAG retrievals")
+
+@cl.on_chat_end
+async def end_session():
+    await cancel_retrievals()
+    agents = cl.user_session.get("Agents")
+    if agents is not None:
+        agent_factory.release(agents)
+
 @cl.on_message
 async def run_conversation(message: cl.Message):
     print("Running conversation")
-    INPUT_DIR = None
-    ROOT_DIR = '.'    
+    if message.content.strip() == "/cache":
+      await cl.Message(content=cache_report(), author="Admin").send()
+      return
+    start = time.perf_counter()
     CONTEXT = message.content
-    MAX_ITER = 10   
-    RESPONSE_TYPE = cl.user_session.get("Gen_type")
-    COMMUNITY = cl.user_session.get("Community")
-    LOCAL_SEARCH = cl.user_session.get("Search_type")
-
-    # retriever   = cl.user_session.get("Retriever")
-    # user_proxy  = cl.user_session.get("Query Agent")
-
-    predictor = cl.user_session.get("Predictor")
-    critic = cl.user_session.get("Critic")
-    user_proxy = cl.user_session.get("User Proxy")
-    # assistant = cl.user_session.get("Assistant")
-    helper = cl.user_session.get("Helper")
-
-    print("Setting groupchat")
-
-    user_proxy.reset()
-    predictor.reset()
-    critic.reset()
-    helper.reset()
-    # assistant.reset()
-
-    # def state_transition(last_speaker, groupchat):
-    #     messages = groupchat.messages
-    #     if last_speaker is user_proxy:
-    #         return retriever
-    #     if last_speaker is retriever:
-    #         if messages[-1]["content"].lower() not in ['math_expert','physics_expert']:
-    #             return user_proxy
-    #         else:
-    #             if messages[-1]["content"].lower() == 'math_expert':
-    #                 return user_proxy
-    #             else:
-    #                 return user_proxy
-    #     else:
-    #         pass
-    #         return None
-        
-    previous = {"value": None}
-    def state_transition(last_speaker, groupchat):
-        messages = groupchat.messages
-        print("previous:", previous["value"])
-        if last_speaker is user_proxy:
-            previous["value"] = 'user_proxy'
-            return helper
-        elif last_speaker is helper:
-        #     return assistant
-        # if last_speaker is assistant:
-            # print(last_speaker, messages[-1]["content"].lower())
-            if previous['value'] == 'user_proxy':
-                previous['value'] = 'helper'
-                print('1')
-                return predictor
-            else: #previous['value'] == 'predictor'
-                previous['value'] = 'helper'
-                return critic
-        elif last_speaker is predictor:
-            if previous['value'] not in ['critic']: # == 'helper'
-                previous['value'] = 'predictor'
-                # return assistant
-                return helper
-            else: #previous['value'] == 'critic'
-                pass
-        elif last_speaker is critic:
-            previous['value'] = 'critic'
-            return predictor
-        else:
-            print(last_speaker, previous['value'])
-    
-    async def query_graphRAG(
-          question: Annotated[str, 'Query string containing information that you want from RAG search']
-                          ) -> str:
-        print(f"Invoking GraphRAG retrieval with question: {question}")
-        if LOCAL_SEARCH:
-            print(LOCAL_SEARCH)
-            result = run_local_search(INPUT_DIR, ROOT_DIR, COMMUNITY ,RESPONSE_TYPE, question)
-        else:
-            result = run_global_search(INPUT_DIR, ROOT_DIR, COMMUNITY ,RESPONSE_TYPE, question)
-        await cl.Message(content=result).send()
-        return result
-
-    # for caller in [retriever]:
-    #     d_retrieve_content = caller.register_for_llm(
-    #         description="retrieve content for code generation and question answering.", api_style="function"
-    #     )(query_graphRAG)
-
-    # for agents in [user_proxy, retriever]:
-    #     print(agents)
-    #     agents.register_for_execution()(d_retrieve_content)
-
-    for caller in [helper]:
-        d_retrieve_content = caller.register_for_llm(
-            description="retrieve content for code generation and question answering.", api_style="function"
-        )(query_graphRAG)
-
-    # for agents in [helper, assistant]:
-    #     agents.register_for_execution()(d_retrieve_content)
-    for agents in [helper, predictor]:
-        agents.register_for_execution()(d_retrieve_content)
-
-#     groupchat = autogen.GroupChat(
-#         agents=[user_proxy, retriever],
-#         messages=[],
-#         max_round=MAX_ITER,
-#         # speaker_selection_method=state_transition,
-#         allow_repeat_speaker=True,
-#     )
 
-    groupchat = autogen.GroupChat(
-        # agents=[user_proxy, helper, assistant, predictor, critic],
-        agents=[user_proxy, helper, predictor, critic],
-        messages=[],
-        max_round=MAX_ITER,
-        speaker_selection_method=state_transition,
-        allow_repeat_speaker=True,
+    agents = cl.user_session.get("Agents")
+    agents.reset()
+    agents.context.update(
+        session_id=cl.user_session.get("id"),
+        local_search=cl.user_session.get("Search_type"),
+        community=cl.user_session.get("Community"),
+        response_type=cl.user_session.get("Gen_type"),
     )
-        
-    manager = autogen.GroupChatManager(groupchat=groupchat,
-                                       llm_config=llm_config_autogen, 
-                                       is_termination_msg=lambda x: x.get("content", "") and x.get("content", "").rstrip().endswith("TERMINATE"),
-                                       code_execution_config=False,
-                                       )    
+    user_proxy = agents.user_proxy
+    groupchat = agents.groupchat
+    manager = agents.manager
+    print(f"Set groupchat in {(time.perf_counter() - start) * 1000:.1f} ms.")
 
 # -------------------- Conversation Logic. Edit to change your first message based on the Task you want to get done. ----------------------------- # 
-    if len(groupchat.messages) == 0: 
-      await cl.make_async(user_proxy.initiate_chat)( manager, message=CONTEXT, )
-    elif len(groupchat.messages) < MAX_ITER:
-      await cl.make_async(user_proxy.send)( manager, message=CONTEXT, )
-    elif len(groupchat.messages) == MAX_ITER:  
-      await cl.make_async(user_proxy.send)( manager, message="exit", )
\ No newline at end of file
+    with tracer.span("message", session_id=agents.context["session_id"], round=len(groupchat.messages)) as root:
+      if len(groupchat.messages) == 0: 
+        await cl.make_async(agents.bind(user_proxy.initiate_chat))( manager, message=CONTEXT, cache=agents.cache, )
+      elif len(groupchat.messages) < MAX_ITER:
+        await cl.make_async(agents.bind(user_proxy.send))( manager, message=CONTEXT, )
+      elif len(groupchat.messages) == MAX_ITER:  
+        await cl.make_async(agents.bind(user_proxy.send))( manager, message="exit", )
+      root.set(**agents.counter.as_dict())
+
+    print("LLM calls:", agents.counter.as_dict())
+    print("Prompt tokens per round:", agents.prompt_tokens())
+    if agents.stream is not None:
+      print("Time to first token:", agents.stream.summary())
+    if tracer.chainlit_steps:
+      async with cl.Step(name="Timing breakdown") as step:
+        step.output = breakdown(root)
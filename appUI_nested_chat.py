@@ -1,3 +1,4 @@
+import os
 import autogen
 from rich import print
 import chainlit as cl
@@ -6,6 +7,8 @@ from chainlit.input_widget import (
    Select, Slider, Switch)
 from autogen import AssistantAgent, UserProxyAgent
 from utils.chainlit_agents import ChainlitUserProxyAgent, ChainlitAssistantAgent
+from utils.completion_cache import get_completion_cache
+from utils.predictor_ensemble import PredictorEnsemble
 # from graphrag.query.cli import run_global_search, run_local_search
 from graphrag.cli.query import run_global_search, run_local_search
 
@@ -20,6 +23,15 @@ llm_config_autogen = {
     "timeout": 60000,
 }
 
+# Number of predictors run in parallel before a single critic pass.
+# 1 keeps the sequential predictor -> critic -> predictor nested chat.
+ENSEMBLE_SIZE = int(os.environ.get("PREDICTOR_ENSEMBLE_SIZE", "1"))
+
+def retrieve_context(question):
+    """GraphRAG search for question with the session's settings, as query_graphRAG does."""
+    search = run_local_search if cl.user_session.get("Search_type") else run_global_search
+    return search(None, '.', cl.user_session.get("Community"), cl.user_session.get("Gen_type"), question)
+
 @cl.on_chat_start
 async def on_chat_start():
   try:
@@ -96,6 +108,22 @@ async def on_chat_start():
         is_termination_msg=lambda x: x.get("content", "").find("TERMINATE") >= 0,
         llm_config=llm_config_autogen
     )
+
+    if ENSEMBLE_SIZE > 1:
+        ensemble = PredictorEnsemble(llm_config_autogen, size=ENSEMBLE_SIZE,
+                                     cache=get_completion_cache())
+
+        def ensemble_reply(recipient, messages, sender, config):
+            # The ensemble agents have no tools: retrieve once and give every agent the result.
+            question = messages[-1].get("content", "")
+            print(f"Invoking GraphRAG retrieval with question: {question}")
+            retrieved = retrieve_context(question)
+            cl.run_sync(cl.Message(content=retrieved).send())
+            return True, ensemble.run(question, retrieved)
+
+        # Answers the user in place of the nested chat queue.
+        assistant.register_reply([user_proxy], ensemble_reply, position=0)
+        cl.user_session.set("Ensemble", ensemble)
     
     print("Set agents.")
 
@@ -175,10 +203,13 @@ async def run_conversation(message: cl.Message):
         return f"Re-evaluate the prediction considering the feedback provided."
 
 
+    # Each nested chat is an initiate_chat that sets its agents' client_cache to
+    # its own "cache" entry, so the cache has to be passed per chat.
+    cache = get_completion_cache()
     nested_chat_queue = [
-        {"recipient": predictor, "message": prediction_message, "summary_method": "last_msg", "max_turns": 1},
-        {"recipient": critic, "message": reflection_message, "summary_method": "last_msg", "max_turns": 1},
-        {"recipient": predictor, "message": reprediction_message, "summary_method": "last_msg", "max_turns": 1},
+        {"recipient": predictor, "message": prediction_message, "summary_method": "last_msg", "max_turns": 1, "cache": cache},
+        {"recipient": critic, "message": reflection_message, "summary_method": "last_msg", "max_turns": 1, "cache": cache},
+        {"recipient": predictor, "message": reprediction_message, "summary_method": "last_msg", "max_turns": 1, "cache": cache},
     ]
     
     async def query_graphRAG(
@@ -244,20 +275,25 @@ async def run_conversation(message: cl.Message):
     predictor.reset()
     critic.reset()
     assistant.reset()
+    ensemble = cl.user_session.get("Ensemble")
+    if ensemble is not None:
+        ensemble.reset()
 
     # Initial conversation check
     if len(cl.user_session.get("messages", [])) == 0:
         # Register and start the nested chat sequence
-        assistant.register_nested_chats(
-            nested_chat_queue,
-            trigger=user_proxy,
-        )
+        if ensemble is None:
+            assistant.register_nested_chats(
+                nested_chat_queue,
+                trigger=user_proxy,
+            )
 
         await cl.make_async(user_proxy.initiate_chat)(
             assistant,
             message=CONTEXT,
             max_turns=1,
             summary_method="last_msg",
+            cache=cache,
         )
         # await cl.Message(content="Nested chat process initiated.").send()
 
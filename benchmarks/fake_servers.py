@@ -0,0 +1,280 @@
+"""Local stand-ins for the Ollama embeddings API and the OpenAI-compatible chat API.
+
+Both servers answer deterministically (the same input always gives the same
+output) after a configurable delay, so the benchmarks measure this code rather
+than a model. They run on ThreadingHTTPServer in a background thread:
+
+    with FakeOllamaServer(latency) as ollama, FakeChatServer(latency) as chat:
+        os.environ["OLLAMA_HOST"] = ollama.url
+        ... chat.url + "/v1" as the OpenAI base_url ...
+"""
+
+import base64
+import hashlib
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 768
+
+
+@dataclass
+class Latency:
+    request: float = 0.005  # fixed cost of every request
+    per_item: float = 0.001  # per embedded text
+    per_token: float = 0.0005  # per generated token (streamed or not)
+    completion_words: int = 48
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> list[float]:
+    """Unit vector derived from sha256(text)."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def fake_completion(messages: list[dict], words: int) -> str:
+    last = str(messages[-1].get("content") or "") if messages else ""
+    digest = hashlib.sha256(last.encode("utf-8")).hexdigest()
+    rng = random.Random(digest)
+    vocabulary = [
+        "patient", "ejection", "fraction", "risk", "hypertension", "diabetes",
+        "guideline", "stage", "evidence", "history", "cardiac", "function",
+        "assessment", "likely", "unlikely", "follow-up", "therapy", "marker",
+    ]
+    body = " ".join(rng.choice(vocabulary) for _ in range(words))
+    return f"[{digest[:8]}] {body}"
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency: Latency, embedding_dim: int):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.embedding_dim = embedding_dim
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+class _OllamaHandler(_Handler):
+    def do_POST(self):
+        request = self._read_json()
+        latency = self.server.latency
+        self.server.count()
+        if self.path == "/api/embed":
+            texts = request.get("input") or []
+            if isinstance(texts, str):
+                texts = [texts]
+            time.sleep(latency.request + latency.per_item * len(texts))
+            self._send_json({
+                "model": request.get("model", ""),
+                "embeddings": [fake_embedding(t, self.server.embedding_dim) for t in texts],
+            })
+        elif self.path == "/api/embeddings":
+            time.sleep(latency.request + latency.per_item)
+            self._send_json({
+                "embedding": fake_embedding(request.get("prompt", ""), self.server.embedding_dim)
+            })
+        elif self.path == "/v1/embeddings":
+            # OpenAI-compatible endpoint, used by graphrag's own embedder.
+            texts = request.get("input") or []
+            if isinstance(texts, str) or (texts and isinstance(texts[0], int)):
+                texts = [texts]
+            time.sleep(latency.request + latency.per_item * len(texts))
+            data = []
+            for i, text in enumerate(texts):
+                embedding = fake_embedding(text if isinstance(text, str) else str(text), self.server.embedding_dim)
+                if request.get("encoding_format") == "base64":
+                    # The openai client asks for base64 float32 by default.
+                    embedding = base64.b64encode(struct.pack(f"<{len(embedding)}f", *embedding)).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(_count_tokens(str(text)) for text in texts)
+            self._send_json({
+                "object": "list",
+                "model": request.get("model", ""),
+                "data": data,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+
+class _ChatHandler(_Handler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+            return
+        request = self._read_json()
+        self.server.count()
+        latency = self.server.latency
+        messages = request.get("messages") or []
+        model = request.get("model", "fake")
+        prompt_tokens = sum(_count_tokens(str(m.get("content") or "")) for m in messages)
+        time.sleep(latency.request)
+
+        tool_calls = None
+        content = None
+        if request.get("tools") and not any(m.get("role") == "tool" for m in messages):
+            # First turn of an agent with tools: call the first tool with the last message.
+            function = request["tools"][0]["function"]
+            question = str(messages[-1].get("content") or "")[:200] if messages else ""
+            tool_calls = [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {
+                    "name": function["name"],
+                    "arguments": json.dumps({"question": question}),
+                },
+            }]
+        elif _wants_json(request):
+            # GraphRAG global search map stage.
+            content = json.dumps({"points": [
+                {"description": fake_completion(messages, 16), "score": 50 + i * 10}
+                for i in range(3)
+            ]})
+        else:
+            content = fake_completion(messages, latency.completion_words)
+
+        completion_tokens = _count_tokens(content or "") if content else 8
+        if request.get("stream"):
+            self._stream(model, content, tool_calls, latency)
+            return
+        time.sleep(latency.per_token * completion_tokens)
+        self._send_json({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": tool_calls},
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _stream(self, model: str, content: str | None, tool_calls: list | None, latency: Latency):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def event(delta: dict, finish_reason: str | None = None) -> None:
+            payload = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        if tool_calls:
+            time.sleep(latency.per_token * 8)
+            event({"tool_calls": [{**call, "index": i} for i, call in enumerate(tool_calls)]})
+            event({}, "tool_calls")
+        else:
+            for i, word in enumerate((content or "").split(" ")):
+                time.sleep(latency.per_token)
+                event({"content": word if i == 0 else f" {word}"})
+            event({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def _wants_json(request: dict) -> bool:
+    if (request.get("response_format") or {}).get("type") == "json_object":
+        return True
+    system = next(
+        (str(m.get("content") or "") for m in request.get("messages") or [] if m.get("role") == "system"),
+        "",
+    )
+    return '"points"' in system
+
+
+class _FakeServer:
+    handler: type[_Handler]
+
+    def __init__(self, latency: Latency | None = None, embedding_dim: int = EMBEDDING_DIM):
+        self.latency = latency or Latency()
+        self._server = _Server(self.handler, self.latency, embedding_dim)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    def start(self) -> "_FakeServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeOllamaServer(_FakeServer):
+    """Serves /api/embed, /api/embeddings and OpenAI-style /v1/embeddings."""
+
+    handler = _OllamaHandler
+
+
+class FakeChatServer(_FakeServer):
+    """Serves OpenAI-style /v1/chat/completions, streamed or not, with tool calls."""
+
+    handler = _ChatHandler
@@ -0,0 +1,361 @@
+"""Offline benchmark suite for the embedding, search and conversation paths.
+
+Starts FakeOllamaServer and FakeChatServer, writes a synthetic GraphRAG
+index into a temporary root and measures:
+
+- embeddings:    OpenAIEmbeddingsLLM (indexing) and OpenAIEmbedding (query) throughput
+- search:        local and global search latency per community level
+- conversation:  one full CHF group-chat turn, as appUI's run_conversation runs it
+- vectors:       exact vs IVF top-k latency and recall@k for float32, float16
+                 and int8 stores, on clustered random vectors
+
+Results are written as JSON. With --baseline, the run is compared to an
+earlier result and the exit code is 1 if any metric regressed by more than
+--tolerance. Run from the repository root:
+
+    python -m benchmarks.run --output benchmarks/results/local.json
+    python -m benchmarks.run --baseline benchmarks/results/local.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from rich import print
+
+from benchmarks.fake_servers import FakeChatServer, FakeOllamaServer, Latency
+from benchmarks.synthetic_index import write_settings, write_synthetic_index
+
+SUITES = ("embeddings", "search", "conversation", "vectors")
+QUESTIONS = [
+    "What are the main risk factors for heart failure in diabetic patients?",
+    "How does ejection fraction relate to CHF staging?",
+    "Which drugs are recommended for stage C heart failure?",
+    "What does an elevated biomarker indicate for renal patients?",
+    "Summarize the guideline for follow-up after arrhythmia.",
+]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_stats(prefix: str, values: list[float]) -> dict:
+    return {
+        f"{prefix}_p50_s": round(statistics.median(values), 4),
+        f"{prefix}_p95_s": round(_percentile(values, 0.95), 4),
+    }
+
+
+def _documents(n: int) -> list[str]:
+    words = "patient history shows reduced ejection fraction with hypertension".split()
+    return [f"Document {i}: " + " ".join(words[(i + j) % len(words)] for j in range(40 + i % 200)) for i in range(n)]
+
+
+def bench_embeddings(documents: int, repeats: int) -> dict:
+    from graphrag.llm.openai.openai_configuration import OpenAIConfiguration
+    from graphrag.llm.openai.openai_embeddings_llm import OpenAIEmbeddingsLLM
+
+    from utils.embedding import OpenAIEmbedding
+    from utils.ollama_client import EMBEDDING_MODEL
+
+    texts = _documents(documents)
+    results: dict = {"documents": documents}
+
+    if hasattr(OpenAIEmbeddingsLLM, "_make_batches"):
+        llm = OpenAIEmbeddingsLLM(None, OpenAIConfiguration({
+            "model": EMBEDDING_MODEL,
+            "batch_size": 16,
+            "batch_max_tokens": 8191,
+            "concurrent_requests": 5,
+        }))
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            asyncio.run(llm(texts))
+            timings.append(time.perf_counter() - start)
+        results["index_embedding_s"] = round(statistics.median(timings), 4)
+        results["index_docs_per_sec"] = round(documents / statistics.median(timings), 1)
+    else:
+        results["index_embedding"] = (
+            "skipped: copy utils/openai_embeddings_llm.py into graphrag/llm/openai first"
+        )
+
+    embedder = OpenAIEmbedding(api_key="benchmark", model=EMBEDDING_MODEL, max_retries=1)
+    single = []
+    for text in texts[:50]:
+        start = time.perf_counter()
+        embedder.embed(text)
+        single.append(time.perf_counter() - start)
+    results.update(_latency_stats("query_embed", single))
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        asyncio.run(embedder.aembed_batch(texts))
+        timings.append(time.perf_counter() - start)
+    results["query_batch_docs_per_sec"] = round(documents / statistics.median(timings), 1)
+    return results
+
+
+def bench_search(root: Path, levels: list[int], queries: int) -> tuple[dict, object]:
+    from utils.artifacts import latest_output_dir
+    from utils.graphrag_index import IndexSnapshot
+
+    output_dir = latest_output_dir(root)
+    if output_dir is None:
+        msg = f"No complete artifacts folder under {root / 'output'}; the synthetic index is missing tables."
+        raise ValueError(msg)
+    start = time.perf_counter()
+    snapshot = IndexSnapshot.load(root, output_dir)
+    results: dict = {"load_s": round(time.perf_counter() - start, 4)}
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(queries)]
+
+    for level in levels:
+        for local in (True, False):
+            name = f"{'local' if local else 'global'}_level{level}"
+            start = time.perf_counter()
+            snapshot.search(local, level, "multiple paragraphs", questions[0])
+            results[f"{name}_cold_s"] = round(time.perf_counter() - start, 4)
+            timings = []
+            for question in questions:
+                start = time.perf_counter()
+                snapshot.search(local, level, "multiple paragraphs", question)
+                timings.append(time.perf_counter() - start)
+            results.update(_latency_stats(name, timings))
+    return results, snapshot
+
+
+def bench_conversation(snapshot, chat_url: str, conversations: int) -> dict:
+    from autogen import UserProxyAgent
+
+    from utils.agent_factory import AgentFactory
+
+    llm_config = {
+        "seed": 42,
+        "temperature": 0,
+        "config_list": [{"model": "litellm", "base_url": f"{chat_url}/v1", "api_key": "benchmark"}],
+        "timeout": 600,
+    }
+
+    async def tool(context, question):
+        return await asyncio.to_thread(snapshot.search, True, 0, "multiple paragraphs", question)
+
+    start = time.perf_counter()
+    factory = AgentFactory(
+        llm_config, tool, max_round=10, user_proxy_cls=UserProxyAgent, human_input_mode="NEVER",
+        prompt_token_budget=6000,
+    )
+    results: dict = {"factory_s": round(time.perf_counter() - start, 4)}
+
+    timings, llm_calls = [], []
+    for i in range(conversations):
+        agents = factory.acquire()
+        agents.reset()
+        agents.context.update(session_id=f"benchmark-{i}")
+        start = time.perf_counter()
+        agents.bind(agents.user_proxy.initiate_chat)(
+            agents.manager, message=QUESTIONS[i % len(QUESTIONS)], cache=None
+        )
+        timings.append(time.perf_counter() - start)
+        llm_calls.append(agents.counter.content)
+        factory.release(agents)
+    results.update(_latency_stats("turn", timings))
+    results["llm_calls_per_turn"] = statistics.mean(llm_calls)
+    return results
+
+
+def bench_vectors(n: int, dim: int, queries: int, k: int, nprobes: list[int]) -> dict:
+    import numpy as np
+
+    from utils.embedding_store import DTYPES, EmbeddingStore
+    from utils.vector_index import VectorIndex
+
+    # Entity embeddings are clustered by topic; uniform random vectors would
+    # make every IVF list equally likely and understate recall.
+    rng = np.random.default_rng(0)
+    topics = rng.normal(size=(max(8, n // 200), dim))
+    vectors = topics[rng.integers(len(topics), size=n)] + 0.5 * rng.normal(size=(n, dim))
+    probes = topics[rng.integers(len(topics), size=queries)] + 0.5 * rng.normal(size=(queries, dim))
+
+    start = time.perf_counter()
+    exact_index = VectorIndex.build([str(i) for i in range(n)], vectors)
+    results: dict = {"vectors": n, "dim": dim, "nlist": exact_index.nlist, "build_s": round(time.perf_counter() - start, 4)}
+    truth = [{row for row, _ in exact_index.search(probe, k)} for probe in probes]
+
+    def measure(name: str, index: VectorIndex, **search) -> None:
+        timings, recall = [], []
+        for probe, expected in zip(probes, truth):
+            start = time.perf_counter()
+            found = {row for row, _ in index.search(probe, k, **search)}
+            timings.append(time.perf_counter() - start)
+            recall.append(len(found & expected) / len(expected))
+        results.update(_latency_stats(name, timings))
+        results[f"{name}_recall"] = round(statistics.mean(recall), 4)
+
+    normalized = np.asarray(exact_index.store.vectors)
+    for dtype in DTYPES:
+        # Same IVF lists for every precision, so only the stored rows differ.
+        store = EmbeddingStore.quantize(normalized, dtype)
+        index = VectorIndex(exact_index.ids, store, exact_index.centroids, exact_index.order, exact_index.offsets)
+        results[f"{dtype}_mb"] = round(store.nbytes / 1e6, 1)
+        measure(f"{dtype}_exact", index)
+        for nprobe in nprobes:
+            measure(f"{dtype}_ivf_nprobe{nprobe}", index, mode="ivf", nprobe=nprobe)
+    return results
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """Return a description of every metric that got worse by more than tolerance.
+
+    Metrics ending in _s are latencies (lower is better); metrics ending in
+    _per_sec or _recall are higher-is-better. Other numbers are ignored.
+    """
+    now = _flatten(current["results"])
+    before = _flatten(baseline["results"])
+    regressions = []
+    for name, value in sorted(now.items()):
+        old = before.get(name)
+        if not old:
+            continue
+        if name.endswith("_s"):
+            change = value / old - 1
+        elif name.endswith(("_per_sec", "_recall")):
+            change = old / value - 1 if value else float("inf")
+        else:
+            continue
+        if change > tolerance:
+            regressions.append(f"{name}: {old:g} -> {value:g} ({change:+.0%} worse)")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma-separated subset of " + ", ".join(SUITES))
+    parser.add_argument("--output", type=Path, help="result JSON (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--request-latency", type=float, default=0.005, help="seconds per fake request")
+    parser.add_argument("--item-latency", type=float, default=0.001, help="seconds per embedded text")
+    parser.add_argument("--token-latency", type=float, default=0.0005, help="seconds per generated token")
+    parser.add_argument("--documents", type=int, default=512)
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--levels", default="0,1,2")
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--vectors", type=int, default=50000, help="vectors in the vector index benchmark")
+    parser.add_argument("--vector-dim", type=int, default=768)
+    parser.add_argument("--nprobes", default="1,4,8,16,32", help="IVF nprobe values to measure")
+    parser.add_argument("--with-caches", action="store_true", help="keep the embedding cache enabled")
+    args = parser.parse_args(argv)
+
+    suites = [suite for suite in args.suites.split(",") if suite]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.levels.split(",")]
+    latency = Latency(
+        request=args.request_latency, per_item=args.item_latency, per_token=args.token_latency
+    )
+
+    record: dict = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "latency": asdict(latency),
+        "params": {
+            "documents": args.documents,
+            "entities": args.entities,
+            "levels": levels,
+            "queries": args.queries,
+            "conversations": args.conversations,
+            "repeats": args.repeats,
+            "vectors": args.vectors,
+            "vector_dim": args.vector_dim,
+            "with_caches": args.with_caches,
+        },
+        "results": {},
+    }
+
+    with FakeOllamaServer(latency) as ollama, FakeChatServer(latency) as chat, \
+            tempfile.TemporaryDirectory(prefix="graphrag-bench-") as tmp:
+        # Must be set before utils.ollama_client creates its clients.
+        os.environ["OLLAMA_HOST"] = ollama.url
+        if not args.with_caches:
+            os.environ["EMBEDDING_CACHE_DISABLED"] = "1"
+            os.environ["COMPLETION_CACHE_DISABLED"] = "1"
+
+        root = Path(tmp)
+        write_settings(root, chat.url, ollama.url)
+        write_synthetic_index(root, n_entities=args.entities, levels=max(levels) + 1)
+
+        if "embeddings" in suites:
+            print("[bold]embeddings[/bold]")
+            record["results"]["embeddings"] = bench_embeddings(args.documents, args.repeats)
+        snapshot = None
+        if "search" in suites or "conversation" in suites:
+            print("[bold]search[/bold]")
+            search, snapshot = bench_search(root, levels if "search" in suites else [0], args.queries)
+            if "search" in suites:
+                record["results"]["search"] = search
+        if "conversation" in suites:
+            print("[bold]conversation[/bold]")
+            record["results"]["conversation"] = bench_conversation(snapshot, chat.url, args.conversations)
+        if "vectors" in suites:
+            print("[bold]vectors[/bold]")
+            nprobes = [int(nprobe) for nprobe in args.nprobes.split(",")]
+            record["results"]["vectors"] = bench_vectors(args.vectors, args.vector_dim, max(args.queries, 50), 10, nprobes)
+        record["requests"] = {"ollama": ollama.requests, "chat": chat.requests}
+
+    output = args.output or Path("benchmarks", "results", f"{record['commit'] or 'local'}-{int(time.time())}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(record, indent=2))
+    print(record["results"])
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        regressions = compare(record, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"[red]{len(regressions)} regressions against {args.baseline}:[/red]")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"[green]No regressions against {args.baseline}[/green]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
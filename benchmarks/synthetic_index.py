@@ -0,0 +1,171 @@
+"""Synthetic GraphRAG artifact set for the search benchmarks.
+
+write_synthetic_index() lays out <root>/settings.yaml and
+<root>/output/<version>/artifacts/*.parquet with the columns graphrag's
+query adapters read. Communities form a hierarchy: every level splits each
+community of the level above into two. Description embeddings come from
+fake_embedding(), so they match what FakeOllamaServer returns at query time.
+"""
+
+import random
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.fake_servers import EMBEDDING_DIM, fake_embedding
+
+SETTINGS_TEMPLATE = """\
+encoding_model: cl100k_base
+llm:
+  api_key: benchmark
+  type: openai_chat
+  model: benchmark-chat
+  model_supports_json: true
+  api_base: {chat_url}/v1
+  max_retries: 1
+  concurrent_requests: {concurrent_requests}
+embeddings:
+  vector_store:
+    type: lancedb
+    db_uri: {root}/lancedb
+  llm:
+    api_key: benchmark
+    type: openai_embedding
+    model: nomic-embed-text
+    api_base: {ollama_url}/v1
+"""
+
+WORDS = [
+    "heart", "failure", "ejection", "fraction", "hypertension", "diabetes", "renal",
+    "valve", "arrhythmia", "ischemia", "diuretic", "beta-blocker", "biomarker",
+    "echocardiogram", "dyspnea", "edema", "cardiomyopathy", "stage", "guideline",
+]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def write_settings(root: Path, chat_url: str, ollama_url: str, concurrent_requests: int = 8) -> Path:
+    path = root / "settings.yaml"
+    path.write_text(SETTINGS_TEMPLATE.format(
+        root=root.as_posix(),
+        chat_url=chat_url,
+        ollama_url=ollama_url,
+        concurrent_requests=concurrent_requests,
+    ))
+    return path
+
+
+def write_synthetic_index(
+    root: str | Path,
+    n_entities: int = 1000,
+    entities_per_community: int = 50,
+    levels: int = 3,
+    n_text_units: int = 500,
+    embedding_dim: int = EMBEDDING_DIM,
+    version: str = "20240101-000000",
+    seed: int = 0,
+) -> Path:
+    """Write the parquet artifacts and return the artifacts directory."""
+    rng = random.Random(seed)
+    artifacts = Path(root) / "output" / version / "artifacts"
+    artifacts.mkdir(parents=True, exist_ok=True)
+
+    names = [f"ENTITY_{i}" for i in range(n_entities)]
+    level_counts = [
+        max(1, n_entities // entities_per_community) * 2**level for level in range(levels)
+    ]
+    level_offsets = [sum(level_counts[:level]) for level in range(levels)]
+
+    def community(i: int, level: int) -> int:
+        return level_offsets[level] + i * level_counts[level] // n_entities
+
+    text_unit_entities: list[list[int]] = [
+        rng.sample(range(n_entities), k=min(5, n_entities)) for _ in range(n_text_units)
+    ]
+    entity_text_units: list[list[str]] = [[] for _ in range(n_entities)]
+    for t, members in enumerate(text_unit_entities):
+        for i in members:
+            entity_text_units[i].append(f"tu-{t}")
+
+    relationships = []
+    for i in range(n_entities):
+        for j in range(1, 4):
+            k = i + j
+            if k < n_entities and community(i, 0) == community(k, 0):
+                relationships.append((i, k))
+    degree = [0] * n_entities
+    for i, k in relationships:
+        degree[i] += 1
+        degree[k] += 1
+
+    descriptions = [f"{names[i]} is described as {_text(rng, 30)}" for i in range(n_entities)]
+    pd.DataFrame({
+        "id": [f"e-{i}" for i in range(n_entities)],
+        "human_readable_id": list(range(n_entities)),
+        "name": names,
+        "type": [rng.choice(["CONDITION", "DRUG", "TEST", "PERSON"]) for _ in range(n_entities)],
+        "description": descriptions,
+        "description_embedding": [fake_embedding(d, embedding_dim) for d in descriptions],
+        "text_unit_ids": [units or ["tu-0"] for units in entity_text_units],
+    }).to_parquet(artifacts / "create_final_entities.parquet")
+
+    pd.DataFrame([
+        {
+            "id": f"e-{i}",
+            "title": names[i],
+            "degree": degree[i],
+            "community": community(i, level),
+            "level": level,
+        }
+        for level in range(levels)
+        for i in range(n_entities)
+    ]).to_parquet(artifacts / "create_final_nodes.parquet")
+
+    reports = []
+    for level in range(levels):
+        for c in range(level_counts[level]):
+            title = f"Community {level_offsets[level] + c} (level {level})"
+            summary = _text(rng, 60)
+            reports.append({
+                "id": f"r-{level_offsets[level] + c}",
+                "community": str(level_offsets[level] + c),
+                "level": level,
+                "title": title,
+                "summary": summary,
+                "full_content": f"# {title}\n\n{summary}\n\n{_text(rng, 400)}",
+                "rank": float(rng.randint(1, 10)),
+                "rank_explanation": _text(rng, 12),
+            })
+    pd.DataFrame(reports).to_parquet(artifacts / "create_final_community_reports.parquet")
+
+    pd.DataFrame({
+        "id": [f"rel-{n}" for n in range(len(relationships))],
+        "human_readable_id": [str(n) for n in range(len(relationships))],
+        "source": [names[i] for i, _ in relationships],
+        "target": [names[k] for _, k in relationships],
+        "description": [f"{names[i]} relates to {names[k]}" for i, k in relationships],
+        "weight": [1.0 + rng.random() for _ in relationships],
+        "rank": [degree[i] + degree[k] for i, k in relationships],
+        "text_unit_ids": [["tu-0"] for _ in relationships],
+    }).to_parquet(artifacts / "create_final_relationships.parquet")
+
+    pd.DataFrame({
+        "id": [f"tu-{t}" for t in range(n_text_units)],
+        "text": [_text(rng, 220) for _ in range(n_text_units)],
+        "n_tokens": [300] * n_text_units,
+        "document_ids": [["doc-0"] for _ in range(n_text_units)],
+        "entity_ids": [[f"e-{i}" for i in members] for members in text_unit_entities],
+        "relationship_ids": [[] for _ in range(n_text_units)],
+    }).to_parquet(artifacts / "create_final_text_units.parquet")
+
+    # Search does not read it, but utils.artifacts only serves complete folders.
+    pd.DataFrame({
+        "id": ["doc-0"],
+        "title": ["synthetic.md"],
+        "raw_content": [""],
+        "text_unit_ids": [[f"tu-{t}" for t in range(n_text_units)]],
+    }).to_parquet(artifacts / "create_final_documents.parquet")
+
+    return artifacts
@@ -1,4 +1,243 @@
-import pandas as pd
+"""Inspect GraphRAG artifact tables without loading them into pandas.
 
-df = pd.read_parquet('/Users/elaineyys/Desktop/autogen_graphRAG/output/20241107-151951/artifacts/create_final_relationships.parquet', engine='pyarrow')
-print(df.columns, df)
\ No newline at end of file
+Every command goes through pyarrow datasets over a memory-mapped local
+filesystem. Only the requested columns are read, --where filters are pushed
+down to the parquet row groups, and rows are processed batch by batch, so
+memory use stays about one batch regardless of the table size.
+
+    python read_output.py tables
+    python read_output.py show create_final_relationships --columns source,target,weight --where "weight>=5" --limit 20
+    python read_output.py stats --top 15
+    python read_output.py diff 20241107-151951 20241126-173731
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from utils.artifacts import latest_artifacts_dir
+
+FILESYSTEM = fs.LocalFileSystem(use_mmap=True)
+BATCH_SIZE = 64 * 1024
+EMBEDDING_COLUMNS = ("embedding", "graph_embedding", "description_embedding")
+_WHERE = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|=| in )\s*(.+?)\s*$")
+
+
+def artifacts_dir(version: str | None, root: str = ".") -> Path:
+    """A timestamp under <root>/output, an artifacts path, or the latest version."""
+    if version is None:
+        return latest_artifacts_dir(root)
+    path = Path(version)
+    if not path.exists():
+        path = Path(root) / "output" / version
+    if (path / "artifacts").is_dir():
+        path = path / "artifacts"
+    if not path.is_dir():
+        raise SystemExit(f"No artifacts found for {version}")
+    return path.absolute()
+
+
+def dataset(artifacts: Path, table: str) -> ds.Dataset:
+    path = artifacts / (table if table.endswith(".parquet") else f"{table}.parquet")
+    if not path.exists():
+        raise SystemExit(f"{path.name} not found in {artifacts}")
+    return ds.dataset(str(path), format="parquet", filesystem=FILESYSTEM)
+
+
+def _scalar(text: str, type_: pa.DataType):
+    text = text.strip().strip("'\"")
+    if pa.types.is_integer(type_):
+        return int(text)
+    if pa.types.is_floating(type_):
+        return float(text)
+    if pa.types.is_boolean(type_):
+        return text.lower() in ("1", "true", "yes")
+    return text
+
+
+def parse_where(conditions: list[str], schema: pa.Schema) -> ds.Expression | None:
+    """Turn "column op value" strings into one pushed-down dataset expression."""
+    expression = None
+    for condition in conditions:
+        match = _WHERE.match(condition)
+        if not match or match.group(1) not in schema.names:
+            raise SystemExit(f"Cannot parse --where {condition!r}; use e.g. \"level==0\", \"weight>=5\" or \"type in PERSON,ORGANIZATION\"")
+        column, op, value = match.groups()
+        field, type_ = pc.field(column), schema.field(column).type
+        op = op.strip()
+        if op == "in":
+            term = field.isin([_scalar(item, type_) for item in value.split(",")])
+        else:
+            value = _scalar(value, type_)
+            term = {
+                "==": field == value, "=": field == value, "!=": field != value,
+                ">=": field >= value, "<=": field <= value, ">": field > value, "<": field < value,
+            }[op]
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def batches(data: ds.Dataset, columns: list[str] | None = None, where: ds.Expression | None = None):
+    yield from data.to_batches(columns=columns, filter=where, batch_size=BATCH_SIZE)
+
+
+def cmd_tables(args) -> None:
+    artifacts = artifacts_dir(args.version, args.root)
+    print(f"{artifacts}")
+    print(f"{'table':<42} {'rows':>10} {'row groups':>10} {'MB':>9}  columns")
+    for path in sorted(artifacts.glob("*.parquet")):
+        # Parquet footers only; no data pages are read.
+        metadata = pq.ParquetFile(path, memory_map=True).metadata
+        columns = ", ".join(metadata.schema.to_arrow_schema().names)
+        print(f"{path.stem:<42} {metadata.num_rows:>10} {metadata.num_row_groups:>10} {path.stat().st_size / 1e6:>9.1f}  {columns}")
+
+
+def cmd_show(args) -> None:
+    data = dataset(artifacts_dir(args.version, args.root), args.table)
+    columns = args.columns.split(",") if args.columns else [
+        name for name in data.schema.names if name not in EMBEDDING_COLUMNS
+    ]
+    where = parse_where(args.where, data.schema)
+    if args.count:
+        print(data.count_rows(filter=where))
+        return
+    shown = 0
+    for batch in batches(data, columns, where):
+        rows = batch.slice(0, args.limit - shown).to_pylist()
+        for row in rows:
+            print(" | ".join(f"{name}={_short(row[name], args.width)}" for name in columns))
+        shown += len(rows)
+        if shown >= args.limit:
+            break
+
+
+def _short(value, width: int) -> str:
+    text = str(value).replace("\n", " ")
+    return text if len(text) <= width else text[: width - 1] + "…"
+
+
+def cmd_stats(args) -> None:
+    artifacts = artifacts_dir(args.version, args.root)
+    for path in sorted(artifacts.glob("*.parquet")):
+        print(f"{path.stem:<42} {pq.ParquetFile(path, memory_map=True).metadata.num_rows:>10} rows")
+
+    if (artifacts / "create_final_relationships.parquet").exists():
+        degree = Counter()
+        for batch in batches(dataset(artifacts, "create_final_relationships"), ["source", "target"]):
+            degree.update(batch.column("source").to_pylist())
+            degree.update(batch.column("target").to_pylist())
+        if degree:
+            values = sorted(degree.values())
+            print(f"\nDegree over {len(values)} connected entities: "
+                  f"min {values[0]}, median {values[len(values) // 2]}, "
+                  f"p90 {values[int(0.9 * (len(values) - 1))]}, max {values[-1]}")
+            histogram = Counter(1 << (value.bit_length() - 1) for value in values)
+            for low in sorted(histogram):
+                print(f"  {low:>6}-{2 * low - 1:<6} {histogram[low]:>8}")
+            print(f"\nTop {args.top} entities by degree:")
+            for name, value in degree.most_common(args.top):
+                print(f"  {value:>6}  {name}")
+
+    if (artifacts / "create_final_nodes.parquet").exists():
+        communities: dict[int, set] = {}
+        for batch in batches(dataset(artifacts, "create_final_nodes"), ["level", "community"]):
+            for level, community in zip(batch.column("level").to_pylist(), batch.column("community").to_pylist()):
+                if community is not None:
+                    communities.setdefault(level, set()).add(community)
+        print("\nCommunities per level: " + ", ".join(
+            f"level {level}: {len(values)}" for level, values in sorted(communities.items())
+        ))
+
+
+def _row_hashes(data: ds.Dataset, keys: list[str], columns: list[str]) -> dict:
+    """key (a tuple of the key columns) -> digest of the compared columns, one batch at a time."""
+    hashes = {}
+    for batch in batches(data, [*keys, *columns]):
+        row_keys = list(zip(*(batch.column(name).to_pylist() for name in keys)))
+        values = zip(*(batch.column(name).to_pylist() for name in columns)) if columns else ([()] * len(row_keys))
+        for row_key, row in zip(row_keys, values):
+            hashes[row_key] = hashlib.sha1(repr(row).encode("utf-8")).digest()
+    return hashes
+
+
+def cmd_diff(args) -> None:
+    old_dir, new_dir = artifacts_dir(args.old, args.root), artifacts_dir(args.new, args.root)
+    old_tables = {path.stem for path in old_dir.glob("*.parquet")}
+    new_tables = {path.stem for path in new_dir.glob("*.parquet")}
+    for table in sorted(old_tables - new_tables):
+        print(f"{table}: only in {args.old}")
+    for table in sorted(new_tables - old_tables):
+        print(f"{table}: only in {args.new}")
+    for table in sorted(old_tables & new_tables):
+        if args.table and table not in args.table:
+            continue
+        old, new = dataset(old_dir, table), dataset(new_dir, table)
+        key = next((name for name in (args.key, "id", "title") if name and name in old.schema.names and name in new.schema.names), None)
+        if key is None:
+            print(f"{table}: {old.count_rows()} -> {new.count_rows()} rows (no key column to compare)")
+            continue
+        # create_final_nodes has one row per entity and level.
+        keys = [key, "level"] if key != "level" and "level" in old.schema.names and "level" in new.schema.names else [key]
+        columns = [
+            name for name in old.schema.names
+            if name not in keys and name in new.schema.names and name not in EMBEDDING_COLUMNS
+        ]
+        before, after = _row_hashes(old, keys, columns), _row_hashes(new, keys, columns)
+        added = after.keys() - before.keys()
+        removed = before.keys() - after.keys()
+        changed = [row_key for row_key in after.keys() & before.keys() if after[row_key] != before[row_key]]
+        print(f"{table}: {len(before)} -> {len(after)} rows by {', '.join(keys)}; "
+              f"{len(added)} added, {len(removed)} removed, {len(changed)} changed")
+        for label, changes in (("+", added), ("-", removed), ("~", changed)):
+            for row_key in sorted(", ".join(map(str, row_key)) for row_key in changes)[: args.examples]:
+                print(f"  {label} {row_key}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect GraphRAG artifact tables.")
+    parser.add_argument("--root", default=".", help="GraphRAG root folder (with output/)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tables = commands.add_parser("tables", help="row counts, row groups and columns of every table")
+    tables.add_argument("version", nargs="?", help="output timestamp or artifacts path (default: latest)")
+    tables.set_defaults(func=cmd_tables)
+
+    show = commands.add_parser("show", help="print rows of one table")
+    show.add_argument("table", help="e.g. create_final_entities")
+    show.add_argument("--version", help="output timestamp or artifacts path (default: latest)")
+    show.add_argument("--columns", help="comma-separated columns to read")
+    show.add_argument("--where", action="append", default=[], help='filter such as "level==0" (repeatable)')
+    show.add_argument("--limit", type=int, default=20)
+    show.add_argument("--width", type=int, default=60, help="truncate values to this many characters")
+    show.add_argument("--count", action="store_true", help="only count the matching rows")
+    show.set_defaults(func=cmd_show)
+
+    stats = commands.add_parser("stats", help="row counts, degree distribution, top entities, communities")
+    stats.add_argument("version", nargs="?", help="output timestamp or artifacts path (default: latest)")
+    stats.add_argument("--top", type=int, default=10)
+    stats.set_defaults(func=cmd_stats)
+
+    diff = commands.add_parser("diff", help="added, removed and changed rows between two versions")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--table", action="append", help="limit to these tables (repeatable)")
+    diff.add_argument("--key", help="key column (default: id, else title)")
+    diff.add_argument("--examples", type=int, default=5, help="keys listed per change type")
+    diff.set_defaults(func=cmd_diff)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""One incremental update over a small graph.
+
+The scratch graphrag.index run and the LLM report generation are replaced by
+fixtures; merging, Leiden re-clustering and writing the new version are real.
+"""
+
+import asyncio
+import hashlib
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("graphrag")
+pytest.importorskip("graspologic")
+
+from utils import incremental_index  # noqa: E402
+from utils.incremental_index import IncrementalIndexer  # noqa: E402
+
+SETTINGS = """\
+encoding_model: cl100k_base
+llm:
+  api_key: test
+  type: openai_chat
+  model: test-chat
+embeddings:
+  llm:
+    api_key: test
+    type: openai_embedding
+    model: test-embedding
+input:
+  type: file
+  file_type: text
+  base_dir: input
+  file_pattern: ".*\\\\.md$"
+"""
+
+
+def _md5(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def _entity(id_, name, hid, text_units, description="desc"):
+    return {
+        "id": id_, "name": name, "type": "CONCEPT", "description": description, "human_readable_id": hid,
+        "text_unit_ids": text_units, "description_embedding": [1.0, float(hid), 0.5],
+    }
+
+
+def _relationship(id_, hid, source, target, text_units):
+    return {
+        "id": id_, "human_readable_id": str(hid), "source": source, "target": target,
+        "description": f"{source} relates to {target}", "weight": 1.0, "rank": 2, "text_unit_ids": text_units,
+    }
+
+
+def _text_unit(id_, doc_id, entity_ids, relationship_ids):
+    return {
+        "id": id_, "text": id_, "n_tokens": 5, "document_ids": [doc_id],
+        "entity_ids": entity_ids, "relationship_ids": relationship_ids,
+    }
+
+
+def _write(folder: Path, tables: dict) -> Path:
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, rows in tables.items():
+        pd.DataFrame(rows).to_parquet(folder / f"{name}.parquet")
+    return folder
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "settings.yaml").write_text(SETTINGS)
+    (tmp_path / "input").mkdir()
+    # alpha.md is unchanged, beta.md was deleted, gamma.md is new.
+    (tmp_path / "input" / "alpha.md").write_text("alpha")
+    (tmp_path / "input" / "gamma.md").write_text("gamma")
+    alpha, beta = _md5("alpha"), _md5("beta")
+    _write(tmp_path / "output" / "20240101-000000" / "artifacts", {
+        "create_final_documents": [
+            {"id": alpha, "title": "alpha.md", "raw_content": "alpha", "text_unit_ids": ["tu-a"]},
+            {"id": beta, "title": "beta.md", "raw_content": "beta", "text_unit_ids": ["tu-b"]},
+        ],
+        "create_final_text_units": [
+            _text_unit("tu-a", alpha, ["e-x", "e-y"], ["r-xy"]),
+            _text_unit("tu-b", beta, ["e-z"], ["r-yz"]),
+        ],
+        "create_final_entities": [
+            _entity("e-x", "X", 0, ["tu-a"]),
+            _entity("e-y", "Y", 1, ["tu-a"]),
+            _entity("e-z", "Z", 2, ["tu-b"]),
+        ],
+        "create_final_relationships": [
+            _relationship("r-xy", 0, "X", "Y", ["tu-a"]),
+            _relationship("r-yz", 1, "Y", "Z", ["tu-b"]),
+        ],
+        "create_final_nodes": [
+            {"id": "e-x", "human_readable_id": 0, "title": "X", "type": "CONCEPT", "description": "desc",
+             "degree": 1, "community": "0", "level": 0},
+            {"id": "e-y", "human_readable_id": 1, "title": "Y", "type": "CONCEPT", "description": "desc",
+             "degree": 2, "community": "0", "level": 0},
+            {"id": "e-z", "human_readable_id": 2, "title": "Z", "type": "CONCEPT", "description": "desc",
+             "degree": 1, "community": "1", "level": 0},
+        ],
+        "create_final_communities": [
+            {"id": "0", "title": "Community 0", "level": 0, "relationship_ids": ["r-xy"], "text_unit_ids": ["tu-a"]},
+            {"id": "1", "title": "Community 1", "level": 0, "relationship_ids": [], "text_unit_ids": ["tu-b"]},
+        ],
+        "create_final_community_reports": [
+            {"id": "rep-0", "community": "0", "level": 0, "title": "X and Y", "summary": "s",
+             "full_content": "c", "rank": 5.0, "rank_explanation": "r"},
+            {"id": "rep-1", "community": "1", "level": 0, "title": "Z", "summary": "s",
+             "full_content": "c", "rank": 3.0, "rank_explanation": "r"},
+        ],
+    })
+    return tmp_path
+
+
+def test_update_merges_delta_and_reclusters(root, tmp_path, monkeypatch):
+    gamma = _md5("gamma")
+    delta = _write(tmp_path / "delta", {
+        "create_final_documents": [{"id": gamma, "title": "gamma.md", "raw_content": "gamma", "text_unit_ids": ["tu-c"]}],
+        "create_final_text_units": [_text_unit("tu-c", gamma, ["d-y", "d-w"], ["d-yw"])],
+        "create_final_entities": [_entity("d-y", "Y", 0, ["tu-c"]), _entity("d-w", "W", 1, ["tu-c"])],
+        "create_final_relationships": [_relationship("d-yw", 0, "Y", "W", ["tu-c"])],
+    })
+    indexed = []
+
+    def index_documents(root_dir, base_dir, files, scratch):
+        indexed.extend(path.name for path in files)
+        return delta
+
+    async def generate_reports(self, pending, entity_rows, degree):
+        return [
+            {"id": f"new-{community}", "community": community, "level": level, "title": "new",
+             "summary": "s", "full_content": "c", "rank": 1.0, "rank_explanation": "r"}
+            for community, level, members, internal in pending
+        ]
+
+    monkeypatch.setattr(incremental_index, "index_documents", index_documents)
+    monkeypatch.setattr(IncrementalIndexer, "generate_reports", generate_reports)
+    output = IncrementalIndexer(str(root)).update()
+
+    assert indexed == ["gamma.md"]
+    documents = pd.read_parquet(output / "create_final_documents.parquet")
+    assert set(documents["id"]) == {_md5("alpha"), gamma}
+
+    entities = pd.read_parquet(output / "create_final_entities.parquet").set_index("name")
+    assert set(entities.index) == {"X", "Y", "W"}
+    assert entities.loc["Y", "id"] == "e-y"  # merged by name, previous id kept
+    assert set(entities.loc["Y", "text_unit_ids"]) == {"tu-a", "tu-c"}
+
+    relationships = pd.read_parquet(output / "create_final_relationships.parquet")
+    assert set(zip(relationships["source"], relationships["target"])) == {("X", "Y"), ("Y", "W")}
+
+    text_units = pd.read_parquet(output / "create_final_text_units.parquet").set_index("id")
+    assert set(text_units.index) == {"tu-a", "tu-c"}
+    assert set(text_units.loc["tu-c", "entity_ids"]) == {"e-y", "d-w"}
+
+    nodes = pd.read_parquet(output / "create_final_nodes.parquet")
+    assert set(nodes["title"]) == {"X", "Y", "W"}
+    assert nodes["community"].notna().all()
+    reports = pd.read_parquet(output / "create_final_community_reports.parquet")
+    clustered = nodes.dropna(subset=["community"])
+    assert set(zip(reports["level"], reports["community"])) == set(zip(clustered["level"], clustered["community"]))
+
+
+def test_update_without_changes_writes_nothing(root):
+    (root / "input" / "gamma.md").unlink()
+    (root / "input" / "beta.md").write_text("beta")
+    assert IncrementalIndexer(str(root)).update() is None
+    assert len(list((root / "output").iterdir())) == 1
+
+
+def test_diff_classifies_documents(root):
+    _, _, added, removed = IncrementalIndexer(str(root)).diff()
+    assert [path.name for path in added.values()] == ["gamma.md"]
+    assert removed == {_md5("beta")}
+
+
+def test_recluster_reuses_reports_of_unchanged_communities(root):
+    indexer = IncrementalIndexer(str(root))
+    previous = incremental_index.load_tables(root / "output" / "20240101-000000" / "artifacts")
+    tables = indexer.merge(previous, {}, removed=set())
+
+    async def reports_for(pending, entity_rows, degree):
+        return [
+            {"id": f"rep-{community}", "community": community, "level": level, "title": f"report {community}",
+             "summary": "s", "full_content": "c", "rank": 1.0, "rank_explanation": "r"}
+            for community, level, members, internal in pending
+        ]
+
+    indexer.generate_reports = reports_for
+    first = asyncio.run(indexer.recluster(previous, tables))
+
+    # Same graph again: Leiden is seeded, so every community keeps its members.
+    async def no_reports(pending, entity_rows, degree):
+        assert not pending
+        return []
+
+    indexer.generate_reports = no_reports
+    second = asyncio.run(indexer.recluster({**previous, **first}, tables))
+    assert sorted(second["create_final_community_reports"]["id"]) == sorted(first["create_final_community_reports"]["id"])
@@ -0,0 +1,59 @@
+"""Report pack caching: saved packs are reused until their settings or tables change."""
+
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("graphrag")
+
+from graphrag.query.indexer_adapters import read_indexer_entities, read_indexer_reports  # noqa: E402
+
+from benchmarks.synthetic_index import write_synthetic_index  # noqa: E402
+from utils import report_packs  # noqa: E402
+
+LEVEL = 1
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    return write_synthetic_index(tmp_path, n_entities=60, entities_per_community=10, levels=2,
+                                 n_text_units=30, embedding_dim=8)
+
+
+def _build(artifacts, max_tokens=2000):
+    nodes = pd.read_parquet(artifacts / "create_final_nodes.parquet")
+    entities = pd.read_parquet(artifacts / "create_final_entities.parquet")
+    reports = pd.read_parquet(artifacts / "create_final_community_reports.parquet")
+    return report_packs.load_or_build(
+        artifacts, LEVEL,
+        read_indexer_reports(reports, nodes, LEVEL), read_indexer_entities(nodes, entities, LEVEL),
+        max_tokens, "cl100k_base",
+    )
+
+
+def test_saved_pack_is_reused(artifacts, monkeypatch):
+    first = _build(artifacts)
+    path = artifacts / report_packs.PACK_DIR / f"level-{LEVEL}.json"
+    assert path.exists()
+    assert not list(path.parent.glob(".*.tmp"))
+
+    def no_build(*args, **kwargs):
+        raise AssertionError("pack rebuilt")
+
+    monkeypatch.setattr(report_packs.ReportPack, "build", no_build)
+    again = _build(artifacts)
+    assert again.rows == first.rows
+    assert again.batches == first.batches
+
+
+def test_pack_is_rebuilt_when_settings_or_tables_change(artifacts):
+    first = _build(artifacts)
+    smaller = _build(artifacts, max_tokens=600)
+    assert smaller.key != first.key
+    assert len(smaller.batches) > len(first.batches)
+
+    nodes = artifacts / "create_final_nodes.parquet"
+    stat = nodes.stat()
+    os.utime(nodes, (stat.st_atime, stat.st_mtime + 10))
+    assert _build(artifacts, max_tokens=600).key != smaller.key
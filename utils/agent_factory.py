@@ -0,0 +1,286 @@
+"""Per-process factory for the CHF group-chat agents.
+
+Building the agents used to happen on every chat start (five agents, each
+parsing llm_config and creating its own OpenAI clients), and every message
+re-registered query_graphRAG and rebuilt the GroupChat and its manager.
+
+AgentFactory creates the OpenAIWrapper clients and the query_graphRAG tool
+schema once. Agents are constructed without an LLM config and then handed
+the shared client, so an AgentSet is cheap to build. Released sets are reset
+and reused by the next session. Each AgentSet keeps its GroupChat, manager and
+tool registration across messages.
+"""
+
+import contextvars
+import copy
+import functools
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import autogen
+from autogen import AssistantAgent, OpenAIWrapper
+from autogen.cache.abstract_cache_base import AbstractCache
+from autogen.function_utils import get_function_schema
+from autogen.io import IOStream
+from rich import print
+from typing_extensions import Annotated
+
+from utils.chainlit_agents import ChainlitIOStream, ChainlitUserProxyAgent
+from utils.history_compaction import add_history_compaction
+from utils.speaker_router import (
+    ANY,
+    END,
+    LLMCallCounter,
+    TransitionRouter,
+    count_calls,
+    counting,
+)
+from utils.tracing import get_tracer
+
+TOOL_NAME = "query_graphRAG"
+TOOL_DESCRIPTION = "retrieve content for code generation and question answering."
+
+# tool(context, question) -> answer; context holds the session's search settings.
+Tool = Callable[[dict, str], Awaitable[str]]
+
+# (previous speaker, last speaker) -> next speaker for the CHF prediction loop:
+# user -> helper -> predictor (runs the retrieval) -> helper -> critic -> predictor -> end
+CHF_TRANSITIONS = {
+    (ANY, "User_Proxy"): "Helper",
+    ("User_Proxy", "Helper"): "Predictor",
+    (ANY, "Helper"): "Critic",
+    ("Critic", "Predictor"): END,
+    (ANY, "Predictor"): "Helper",
+    (ANY, "Critic"): "Predictor",
+}
+
+
+async def _query_graphRAG_signature(
+    question: Annotated[str, 'Query string containing information that you want from RAG search']
+) -> str: ...
+
+
+def _ends_with_terminate(x: dict) -> bool:
+    return bool(x.get("content", "")) and x.get("content", "").rstrip().endswith("TERMINATE")
+
+
+def _contains_terminate(x: dict) -> bool:
+    return "TERMINATE" in str(x.get("content", "")).upper()
+
+
+def _trace_turns(agent: autogen.ConversableAgent) -> None:
+    """Run each of agent's replies inside an agent.turn span."""
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return
+    generate_reply = agent.generate_reply
+
+    @functools.wraps(generate_reply)
+    def traced_generate_reply(*args, **kwargs):
+        with tracer.span("agent.turn", agent=agent.name):
+            return generate_reply(*args, **kwargs)
+
+    agent.generate_reply = traced_generate_reply
+
+
+def _attach_llm(agent: autogen.ConversableAgent, llm_config: dict, client: OpenAIWrapper):
+    agent.llm_config = llm_config
+    agent.client = client
+    return agent
+
+
+class AgentSet:
+    """The agents, group chat and manager used by one Chainlit session."""
+
+    def __init__(self, factory: "AgentFactory"):
+        self.context: dict[str, Any] = {}
+
+        self.user_proxy = _attach_llm(
+            factory.user_proxy_cls(
+                name="User_Proxy",
+                human_input_mode=factory.human_input_mode,
+                llm_config=False,
+                is_termination_msg=lambda x: x.get("content", "").rstrip().endswith("TERMINATE"),
+                code_execution_config=False,
+                system_message='''A human admin.''',
+                description="User Proxy Agent",
+            ),
+            factory.llm_config, factory.client,
+        )
+        self.predictor = _attach_llm(
+            AssistantAgent(
+                name="Predictor",
+                is_termination_msg=_contains_terminate,
+                system_message="You are a medical expert specializing in CHF prediction.",
+                llm_config=False,
+                description="Medical expert predicting CHF within 5 years.",
+            ),
+            factory.llm_config, factory.client,
+        )
+        self.critic = _attach_llm(
+            AssistantAgent(
+                name="Critic",
+                is_termination_msg=_contains_terminate,
+                system_message="You are an assistant evaluating and providing feedback for CHF predictions.",
+                llm_config=False,
+                description="Critic providing feedback for predictions.",
+            ),
+            factory.llm_config, factory.client,
+        )
+        self.helper = _attach_llm(
+            AssistantAgent(
+                name="Helper",
+                human_input_mode="NEVER",
+                system_message="""Interact with the retriever to provide any context.""",
+                llm_config=False,
+            ),
+            factory.tool_llm_config, factory.tool_client,
+        )
+
+        tool = factory.tool
+
+        async def query_graphRAG(
+            question: Annotated[str, 'Query string containing information that you want from RAG search']
+        ) -> str:
+            return await tool(self.context, question)
+
+        for agent in [self.helper, self.predictor]:
+            agent.register_function({TOOL_NAME: query_graphRAG})
+
+        self.stream = ChainlitIOStream() if factory.stream else None
+        if self.stream is not None:
+            for agent in [self.helper, self.predictor, self.critic]:
+                self.stream.attach(agent)
+
+        self.compactors = []
+        if factory.prompt_token_budget:
+            self.compactors = [
+                add_history_compaction(
+                    agent,
+                    max_tokens=factory.prompt_token_budget,
+                    keep_recent=factory.keep_recent_messages,
+                )
+                for agent in [self.helper, self.predictor, self.critic]
+            ]
+
+        for agent in [self.helper, self.predictor, self.critic]:
+            _trace_turns(agent)
+
+        self.counter = LLMCallCounter()
+        self.router = TransitionRouter(CHF_TRANSITIONS)
+        self.router.validate(self.agents)
+        self.groupchat = autogen.GroupChat(
+            agents=self.agents,
+            messages=[],
+            max_round=factory.max_round,
+            speaker_selection_method=self.router,
+            allow_repeat_speaker=True,
+        )
+        # No llm_config: speakers are only ever chosen by the router.
+        self.manager = autogen.GroupChatManager(
+            groupchat=self.groupchat,
+            llm_config=False,
+            is_termination_msg=_ends_with_terminate,
+            code_execution_config=False,
+        )
+
+        # Completions are looked up in the shared cache before calling the LLM.
+        # initiate_chat() swaps client_cache for its own `cache` argument, so
+        # callers should also pass cache=agent_set.cache there.
+        self.cache = factory.cache
+        for agent in [*self.agents, self.manager]:
+            agent.client_cache = self.cache
+
+    def prompt_tokens(self) -> dict[str, list[int]]:
+        """Prompt tokens sent per round, by agent (empty without a token budget)."""
+        return {compactor.name: compactor.prompt_tokens for compactor in self.compactors}
+
+    @property
+    def agents(self) -> list[autogen.ConversableAgent]:
+        return [self.user_proxy, self.helper, self.predictor, self.critic]
+
+    def bind(self, fn: Callable) -> Callable:
+        """Wrap fn so it runs with this session's LLM call counter and, if enabled,
+        streams agent replies to the UI. The caller's context (e.g. the current
+        trace span) is carried over to the worker thread that runs it."""
+        context = contextvars.copy_context()
+
+        def run(*args, **kwargs):
+            with counting(self.counter):
+                if self.stream is None:
+                    return fn(*args, **kwargs)
+                with IOStream.set_default(self.stream):
+                    return fn(*args, **kwargs)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return context.run(run, *args, **kwargs)
+
+        return wrapper
+
+    def reset(self) -> None:
+        """Clear all conversation state while keeping the wiring."""
+        for agent in self.agents:
+            agent.reset()
+        self.groupchat.reset()
+        self.manager.reset()
+        self.router.reset()
+        self.counter = LLMCallCounter()
+        for compactor in self.compactors:
+            compactor.reset()
+        if self.stream is not None:
+            self.stream.reset()
+
+
+class AgentFactory:
+    """Builds shared clients and tool schemas once and pools AgentSets."""
+
+    def __init__(
+        self,
+        llm_config: dict,
+        tool: Tool,
+        max_round: int = 10,
+        user_proxy_cls: type[autogen.ConversableAgent] = ChainlitUserProxyAgent,
+        human_input_mode: str = "ALWAYS",
+        stream: bool = False,
+        prompt_token_budget: int | None = None,
+        keep_recent_messages: int = 4,
+        cache: AbstractCache | None = None,
+    ):
+        self.tool = tool
+        self.cache = cache
+        self.max_round = max_round
+        self.user_proxy_cls = user_proxy_cls
+        self.human_input_mode = human_input_mode
+        self.stream = stream
+        self.prompt_token_budget = prompt_token_budget
+        self.keep_recent_messages = keep_recent_messages
+
+        start = time.perf_counter()
+        llm_config = {**copy.deepcopy(llm_config), **({"stream": True} if stream else {})}
+        self.llm_config = llm_config
+        self.client = count_calls(OpenAIWrapper(**self.llm_config), "content")
+        tool_schema = get_function_schema(
+            _query_graphRAG_signature, name=TOOL_NAME, description=TOOL_DESCRIPTION
+        )
+        self.tool_llm_config = {**copy.deepcopy(llm_config), "tools": [tool_schema]}
+        self.tool_client = count_calls(OpenAIWrapper(**self.tool_llm_config), "content")
+        print(f"Agent factory ready in {time.perf_counter() - start:.3f}s")
+
+        self._pool: list[AgentSet] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> AgentSet:
+        """Return a reset AgentSet, reusing a released one when available."""
+        with self._lock:
+            if self._pool:
+                return self._pool.pop()
+        return AgentSet(self)
+
+    def release(self, agent_set: AgentSet) -> None:
+        agent_set.reset()
+        agent_set.context = {}
+        with self._lock:
+            self._pool.append(agent_set)
@@ -0,0 +1,210 @@
+"""Two-tier cache for GraphRAG answers returned by query_graphRAG.
+
+Tier one is an exact-match LRU + TTL map keyed by (search type, community
+level, response type, normalized question, artifact version). Tier two is
+optional: when an embedding function is given, a question whose embedding is
+within `similarity_threshold` (cosine) of a cached question with the same
+search settings reuses that answer.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+from utils.embedding_cache import get_embedding_cache
+from utils.ollama_client import EMBEDDING_MODEL, get_client
+
+log = logging.getLogger(__name__)
+
+EmbedFn = Callable[[str], list[float]]
+# Question embeddings kept so put() reuses the one get() just computed.
+RECENT_EMBEDDINGS = 64
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    compute_seconds: float
+    created_at: float
+    embedding: np.ndarray | None = None
+
+
+@dataclass
+class AnswerCacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    embed_errors: int = 0
+    seconds_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "embed_errors": self.embed_errors,
+            "hit_rate": self.hit_rate,
+            "seconds_saved": self.seconds_saved,
+        }
+
+
+class AnswerCache:
+    """Thread-safe LRU + TTL answer cache with an optional semantic tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        embed_fn: EmbedFn | None = None,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.stats = AnswerCacheStats()
+        self._entries: OrderedDict[tuple, CachedAnswer] = OrderedDict()
+        self._recent: OrderedDict[str, np.ndarray | None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(search_type: str, community: int, response_type: str, question: str, version: str) -> tuple:
+        return (search_type, community, response_type, version, normalize_question(question))
+
+    def _embed(self, question: str) -> np.ndarray | None:
+        """Normalized question embedding, or None when the semantic tier is off or
+        the embedding service fails (the cache then works as exact-match only)."""
+        if self.embed_fn is None:
+            return None
+        question = normalize_question(question)
+        with self._lock:
+            if question in self._recent:
+                self._recent.move_to_end(question)
+                return self._recent[question]
+        try:
+            vector = np.asarray(self.embed_fn(question), dtype=np.float32)
+        except Exception as e:
+            log.warning("Answer cache: could not embed the question, using exact match only: %s", e)
+            with self._lock:
+                self.stats.embed_errors += 1
+            return None
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm > 0 else None
+        with self._lock:
+            self._recent[question] = vector
+            while len(self._recent) > RECENT_EMBEDDINGS:
+                self._recent.popitem(last=False)
+        return vector
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def get(
+        self, search_type: str, community: int, response_type: str, question: str, version: str
+    ) -> str | None:
+        key = self._key(search_type, community, response_type, question, version)
+        with self._lock:
+            self._purge_expired(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.exact_hits += 1
+                self.stats.seconds_saved += entry.compute_seconds
+                return entry.answer
+            if self.embed_fn is None:
+                self.stats.misses += 1
+                return None
+            candidates = [
+                (other, entry) for other, entry in self._entries.items()
+                if other[:4] == key[:4] and entry.embedding is not None
+            ]
+
+        # Embedding the question can take a round trip, so it runs outside the lock.
+        embedding = self._embed(question) if candidates else None
+        with self._lock:
+            if embedding is not None:
+                similarities = np.stack([entry.embedding for _, entry in candidates]) @ embedding
+                best = int(np.argmax(similarities))
+                best_key, best_entry = candidates[best]
+                if similarities[best] >= self.similarity_threshold and best_key in self._entries:
+                    self._entries.move_to_end(best_key)
+                    self.stats.semantic_hits += 1
+                    self.stats.seconds_saved += best_entry.compute_seconds
+                    return best_entry.answer
+            self.stats.misses += 1
+            return None
+
+    def put(
+        self,
+        search_type: str,
+        community: int,
+        response_type: str,
+        question: str,
+        version: str,
+        answer: str,
+        compute_seconds: float,
+    ) -> None:
+        key = self._key(search_type, community, response_type, question, version)
+        entry = CachedAnswer(
+            answer=answer,
+            compute_seconds=compute_seconds,
+            created_at=time.time(),
+            embedding=self._embed(question),
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._recent.clear()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), **self.stats.as_dict()}
+
+
+def _ollama_embed(question: str) -> list[float]:
+    cache = get_embedding_cache()
+    if cache is not None and (cached := cache.get(EMBEDDING_MODEL, question)):
+        return cached
+    embedding = get_client().embed(model=EMBEDDING_MODEL, input=[question])["embeddings"][0]
+    if cache is not None:
+        cache.put(EMBEDDING_MODEL, question, embedding)
+    return embedding
+
+
+def answer_cache_from_env() -> AnswerCache:
+    """Build the app's answer cache from ANSWER_CACHE_* environment variables."""
+    semantic = os.environ.get("ANSWER_CACHE_SEMANTIC", "").lower() in ("1", "true", "yes")
+    return AnswerCache(
+        max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "256")),
+        ttl_seconds=float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        embed_fn=_ollama_embed if semantic else None,
+        similarity_threshold=float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.95")),
+    )
@@ -0,0 +1,52 @@
+"""Helpers for locating GraphRAG index outputs under <root>/output/<timestamp>/artifacts."""
+
+import os
+from pathlib import Path
+
+
+# The tables search reads. graphrag writes create_final_documents last, so a
+# folder without all of them is a run still in progress (or one that failed).
+REQUIRED_TABLES = (
+    "create_final_nodes",
+    "create_final_entities",
+    "create_final_relationships",
+    "create_final_text_units",
+    "create_final_community_reports",
+    "create_final_documents",
+)
+
+
+def is_complete(artifacts: Path, required: tuple[str, ...] = REQUIRED_TABLES) -> bool:
+    return all((artifacts / f"{name}.parquet").exists() for name in required)
+
+
+def latest_output_dir(root_dir: str | Path = ".", required: tuple[str, ...] = REQUIRED_TABLES) -> Path | None:
+    """Return the most recently modified output/<timestamp> folder with complete artifacts.
+
+    Uses the same "newest mtime wins" rule as graphrag's query CLI, but skips
+    folders whose indexing run has not written every required table yet.
+    """
+    output = Path(root_dir) / "output"
+    if not output.exists():
+        return None
+    folders = [
+        folder for folder in output.iterdir()
+        if (folder / "artifacts").is_dir() and is_complete(folder / "artifacts", required)
+    ]
+    if not folders:
+        return None
+    return max(folders, key=os.path.getmtime)
+
+
+def latest_artifacts_dir(root_dir: str | Path = ".", required: tuple[str, ...] = REQUIRED_TABLES) -> Path:
+    folder = latest_output_dir(root_dir, required)
+    if folder is None:
+        msg = f"Could not find any artifacts under {Path(root_dir) / 'output'}. Run the indexing pipeline first."
+        raise ValueError(msg)
+    return (folder / "artifacts").absolute()
+
+
+def artifact_version(root_dir: str | Path = ".") -> str:
+    """Name of the latest output timestamp, or an empty string when there is none."""
+    folder = latest_output_dir(root_dir)
+    return folder.name if folder is not None else ""
@@ -1,5 +1,7 @@
 from autogen.agentchat import Agent, AssistantAgent, UserProxyAgent
 from typing import Dict, Optional, Union, Callable
+import builtins
+import time
 import chainlit as cl
 
 async def ask_helper(func, **kwargs):
@@ -78,4 +80,82 @@ class ChainlitUserProxyAgent(UserProxyAgent):
             recipient=recipient,
             request_reply=request_reply,
             silent=silent,
-        )
\ No newline at end of file
+        )
+
+
+class ChainlitIOStream:
+    """
+    AutoGen IOStream that streams agent completions token by token into Chainlit.
+    With "stream": True in the llm_config, AutoGen's OpenAI client prints each
+    token with end=""; those go to the current agent's cl.Message and everything
+    else is printed to the console as before. Time-to-first-token is recorded per turn.
+    Tool calls and tool results are not completions and are left out of both.
+    """
+    def __init__(self):
+        self.message = None
+        self.turn_start = None
+        self.first_token_at = None
+        self.ttft = []
+
+    def attach(self, agent: Agent):
+        agent.register_reply([Agent, None], self._begin_turn, position=0)
+        agent.register_hook("process_message_before_send", self._end_turn)
+
+    def print(self, *objects, sep=" ", end="\n", flush=False):
+        if end == "" and self.message is not None:
+            self._stream(sep.join(map(str, objects)))
+        else:
+            builtins.print(*objects, sep=sep, end=end, flush=flush)
+
+    def input(self, prompt="", *, password=False):
+        return builtins.input(prompt)
+
+    @staticmethod
+    def _is_tool_message(message) -> bool:
+        return isinstance(message, dict) and bool(message.get("tool_calls") or message.get("role") == "tool")
+
+    def _begin_turn(self, recipient, messages=None, sender=None, config=None):
+        self._finish()
+        if messages and isinstance(messages[-1], dict) and messages[-1].get("tool_calls"):
+            # recipient is about to execute the tool calls, not to call the LLM.
+            return False, None
+        self.message = cl.Message(content="", author=recipient.name)
+        self.turn_start = time.perf_counter()
+        self.first_token_at = None
+        return False, None
+
+    def _end_turn(self, sender, message, recipient, silent):
+        if self.message is not None and self.message.author == sender.name:
+            # Tool calls and tool output are shown by the agents themselves;
+            # streaming them again would duplicate them and record a bogus TTFT.
+            if self.first_token_at is None and not self._is_tool_message(message):
+                # Cached completions are returned whole instead of streamed.
+                content = message.get("content") if isinstance(message, dict) else message
+                if content:
+                    self._stream(content)
+            self._finish()
+        return message
+
+    def _stream(self, token: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            self.ttft.append((self.message.author, self.first_token_at - self.turn_start))
+            builtins.print(f"[TTFT] {self.message.author}: {self.first_token_at - self.turn_start:.2f}s")
+        cl.run_sync(self.message.stream_token(token))
+
+    def _finish(self):
+        if self.message is not None and self.first_token_at is not None:
+            cl.run_sync(self.message.send())
+        self.message = None
+
+    def reset(self):
+        self.message = None
+        self.ttft = []
+
+    def summary(self) -> dict:
+        values = [seconds for _, seconds in self.ttft]
+        return {
+            "turns": len(values),
+            "mean_ttft": sum(values) / len(values) if values else None,
+            "max_ttft": max(values) if values else None,
+        }
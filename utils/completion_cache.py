@@ -0,0 +1,87 @@
+"""Process-shared, disk-backed LLM completion cache for the AutoGen agents.
+
+The agents run with a fixed seed and temperature 0, so an identical request
+gives an identical completion. CompletionCache implements AutoGen's
+AbstractCache protocol: OpenAIWrapper builds the key from model, messages,
+tools and parameters, and the cache stores the pickled response in a
+DiskLRUCache under sha256(key). One instance is shared by every session and
+by the cl.make_async worker threads, and it survives app restarts.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from types import TracebackType
+from typing import Any
+
+from utils.disk_cache import DiskLRUCache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "completions.sqlite3")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CompletionCache:
+    """AutoGen AbstractCache backed by a size-bounded DiskLRUCache."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int | None = DEFAULT_MAX_BYTES):
+        self._store = DiskLRUCache(path, max_bytes=max_bytes)
+
+    @staticmethod
+    def key(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, default: Any | None = None) -> Any | None:
+        value = self._store.get(self.key(key))
+        if value is None:
+            return default
+        try:
+            return pickle.loads(value)
+        except Exception as e:
+            log.warning("Ignoring unreadable completion cache entry: %s", e)
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        self._store.put(self.key(key), pickle.dumps(value))
+
+    def close(self) -> None:
+        # Shared by every agent and session; the store lives as long as the process.
+        pass
+
+    def __enter__(self) -> "CompletionCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def stats(self) -> dict:
+        return self._store.stats()
+
+    def clear(self) -> None:
+        self._store.clear()
+
+
+_lock = threading.Lock()
+_cache: CompletionCache | None = None
+
+
+def get_completion_cache() -> CompletionCache | None:
+    """Return the process-wide cache, or None when COMPLETION_CACHE_DISABLED is set."""
+    global _cache
+    if os.environ.get("COMPLETION_CACHE_DISABLED"):
+        return None
+    with _lock:
+        if _cache is None:
+            path = os.environ.get("COMPLETION_CACHE_PATH", DEFAULT_CACHE_PATH)
+            max_bytes = int(os.environ.get("COMPLETION_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+            _cache = CompletionCache(path, max_bytes=max_bytes or None)
+            log.info("Using completion cache at %s", path)
+        return _cache
@@ -0,0 +1,267 @@
+"""Content-hash manifest for incremental PDF to markdown conversion.
+
+For every PDF the manifest records the sha256 of the source, a hash of the
+converter settings, the conversion status and the sha256 of the markdown it
+produced. plan() compares a folder of PDFs against it:
+
+- unchanged: same content and settings, output still matches its checksum
+- copied:    same content as another converted PDF (renamed or duplicated);
+             its output can be copied instead of converting again
+- changed:   content or settings differ from the last conversion
+- resumed:   the last conversion was interrupted (status "in_progress")
+- adopted:   converted before the manifest existed (no entry was ever
+             recorded under its name); recorded as done
+- new:       never seen
+- removed:   in the manifest, but the PDF is gone
+
+A removed PDF keeps its entry with status "removed", so a PDF added again
+under the same name is compared with what was recorded instead of adopting
+whatever markdown is left under that name.
+
+Entries are marked "in_progress" before conversion starts and "done" only
+after the markdown is saved, so a crash never leaves a partial output that
+looks complete. The manifest is written atomically (temp file + rename).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_hash(settings: dict) -> str:
+    """Stable hash of the converter settings that influence the output."""
+    encoded = json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+@dataclass
+class ConversionPlan:
+    new: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    resumed: list[str] = field(default_factory=list)
+    copied: list[tuple[str, str]] = field(default_factory=list)  # (filepath, fname to copy from)
+    adopted: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def to_convert(self) -> list[str]:
+        return self.new + self.changed + self.resumed
+
+    def summary(self) -> dict:
+        return {
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "resumed": len(self.resumed),
+            "copied": len(self.copied),
+            "adopted": len(self.adopted),
+            "unchanged": len(self.unchanged),
+            "removed": len(self.removed),
+        }
+
+
+class ConversionManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self._hashes: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", {})
+
+    def save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def source_sha256(self, filepath: str) -> str:
+        """sha256 of the PDF, reusing the recorded hash when size and mtime are unchanged."""
+        stat = os.stat(filepath)
+        entry = self.entries.get(os.path.basename(filepath))
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return entry["sha256"]
+        return file_sha256(filepath)
+
+    def output_valid(self, entry: dict, markdown_path: str) -> bool:
+        return (
+            entry.get("status") == "done"
+            and os.path.exists(markdown_path)
+            and file_sha256(markdown_path) == entry.get("output_sha256")
+        )
+
+    def plan(self, files: list[str], settings: str, markdown_path) -> ConversionPlan:
+        """Classify files against the manifest; markdown_path(fname) locates an output."""
+        plan = ConversionPlan()
+        hashes = {filepath: self.source_sha256(filepath) for filepath in files}
+        done_by_hash = {
+            entry["sha256"]: fname
+            for fname, entry in self.entries.items()
+            if entry.get("status") == "done" and entry.get("settings") == settings
+        }
+        for filepath, sha256 in hashes.items():
+            fname = os.path.basename(filepath)
+            entry = self.entries.get(fname)
+            if entry is None:
+                source = done_by_hash.get(sha256)
+                if source is not None and self.output_valid(self.entries[source], markdown_path(source)):
+                    plan.copied.append((filepath, source))
+                elif os.path.exists(markdown_path(fname)):
+                    plan.adopted.append(filepath)
+                else:
+                    plan.new.append(filepath)
+            elif entry.get("status") == "removed":
+                # Re-added: its old markdown is only reused if it is the output
+                # of the same content, converted with the same settings.
+                if (
+                    entry.get("sha256") == sha256
+                    and entry.get("settings") == settings
+                    and os.path.exists(markdown_path(fname))
+                    and file_sha256(markdown_path(fname)) == entry.get("output_sha256")
+                ):
+                    plan.adopted.append(filepath)
+                else:
+                    plan.changed.append(filepath)
+            elif entry.get("status") == "in_progress":
+                plan.resumed.append(filepath)
+            elif entry.get("sha256") != sha256 or entry.get("settings") != settings:
+                plan.changed.append(filepath)
+            elif entry.get("status") == "skipped" or (
+                entry.get("status") == "done" and self.output_valid(entry, markdown_path(fname))
+            ):
+                plan.unchanged.append(filepath)
+            else:
+                # Failed last time, or the output was deleted or edited.
+                plan.changed.append(filepath)
+        present = {os.path.basename(filepath) for filepath in files}
+        plan.removed = sorted(
+            fname for fname, entry in self.entries.items()
+            if fname not in present and entry.get("status") != "removed"
+        )
+        self._hashes = hashes
+        return plan
+
+    def _record(self, filepath: str, settings: str, **fields) -> None:
+        stat = os.stat(filepath)
+        sha256 = self._hashes.get(filepath) or file_sha256(filepath)
+        self.entries[os.path.basename(filepath)] = {
+            "source": filepath,
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "settings": settings,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **fields,
+        }
+
+    def start(self, filepath: str, settings: str) -> None:
+        self._record(filepath, settings, status="in_progress")
+
+    def finish(self, filepath: str, settings: str, markdown_path: str, **fields) -> None:
+        self._record(
+            filepath, settings, status="done",
+            output=os.path.dirname(markdown_path),
+            output_sha256=file_sha256(markdown_path),
+            **fields,
+        )
+
+    def fail(self, filepath: str, settings: str, reason: str) -> None:
+        self._record(filepath, settings, status="failed", reason=reason)
+
+    def remove(self, fname: str) -> None:
+        """Mark the entry of a PDF that is gone; its output is no longer accounted for."""
+        self.entries[fname] = {
+            **self.entries[fname], "status": "removed", "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def skip(self, filepath: str, settings: str, reason: str) -> None:
+        """Record a PDF that is deliberately not converted (e.g. too little text)."""
+        self._record(filepath, settings, status="skipped", reason=reason)
+
+    def report(self, plan: ConversionPlan, failed: list[str] | None = None) -> str:
+        lines = [
+            "Conversion report: " + ", ".join(f"{count} {name}" for name, count in plan.summary().items())
+        ]
+        for name in ("new", "changed", "resumed", "adopted", "removed"):
+            for item in getattr(plan, name):
+                lines.append(f"  {name:<9} {os.path.basename(item)}")
+        for filepath, source in plan.copied:
+            lines.append(f"  {'copied':<9} {os.path.basename(filepath)} (same content as {source})")
+        for filepath in failed or []:
+            lines.append(f"  {'failed':<9} {os.path.basename(filepath)}")
+        return "\n".join(lines)
+
+
+def shard_manifest_path(out_folder: str, shard_idx: int, num_shards: int) -> str:
+    if num_shards == 1:
+        return os.path.join(out_folder, "manifest.json")
+    return os.path.join(out_folder, f"manifest.shard-{shard_idx}-of-{num_shards}.json")
+
+
+def merge_manifests(out_folder: str, num_shards: int,
+                    present: set[str] | None = None) -> tuple[ConversionManifest, list[str]]:
+    """Rebuild <out_folder>/manifest.json from the shard manifests.
+
+    The merged manifest holds only what the shards recorded, never entries
+    left over from an earlier merge. With present (the PDF names in the input
+    folder), entries of other names are kept as "removed". Returns it with a list of problems (missing shard
+    manifests, a PDF recorded by more than one shard). The merged manifest is
+    only written when there are no problems.
+    """
+    merged = ConversionManifest(os.path.join(out_folder, "manifest.json"))
+    merged.entries = {}
+    problems = []
+    owner: dict[str, int] = {}
+    for shard_idx in range(num_shards):
+        path = shard_manifest_path(out_folder, shard_idx, num_shards)
+        if not os.path.exists(path):
+            problems.append(f"missing manifest for shard {shard_idx}/{num_shards}: {path}")
+            continue
+        for fname, entry in ConversionManifest(path).entries.items():
+            if present is not None and fname not in present:
+                entry = {**entry, "status": "removed"}
+            if fname in owner and owner[fname] != shard_idx:
+                problems.append(f"{fname} recorded by shards {owner[fname]} and {shard_idx}")
+            owner[fname] = shard_idx
+            merged.entries[fname] = {**entry, "shard": f"{shard_idx}/{num_shards}"}
+    if not problems:
+        merged.save()
+    return merged, problems
+
+
+def orphaned_outputs(out_folder: str, manifest: ConversionManifest) -> list[str]:
+    """Output folders in out_folder that no converted PDF in manifest points to,
+    e.g. the markdown of a PDF that was deleted or renamed."""
+    # Compared by folder name: shards may see out_folder under different paths.
+    outputs = {
+        os.path.basename(os.path.normpath(entry["output"]))
+        for entry in manifest.entries.values()
+        if entry.get("status") == "done" and entry.get("output")
+    }
+    return sorted(
+        entry.path for entry in os.scandir(out_folder)
+        if entry.is_dir() and not entry.name.startswith(".") and entry.name not in outputs
+    )
@@ -0,0 +1,153 @@
+"""A small SQLite-backed key/value cache with LRU eviction.
+
+Values are opaque bytes. The database runs in WAL mode and every access goes
+through one lock, so a single instance can be shared by worker threads and
+several processes can open the same file.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Mapping
+
+# Stay well below SQLite's bound-parameter limit when expanding IN (...) lists.
+_MAX_PARAMS = 500
+
+
+def _chunks(items: list, size: int = _MAX_PARAMS):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class DiskLRUCache:
+    """Persistent bytes cache bounded by entry count and/or total value size."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)"
+        )
+
+    def get(self, key: str) -> bytes | None:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, value: bytes) -> None:
+        self.put_many({key: value})
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """Return the cached values for the keys that are present and mark them recently used."""
+        keys = list(dict.fromkeys(keys))
+        found: dict[str, bytes] = {}
+        if not keys:
+            return found
+        with self._lock:
+            for chunk in _chunks(keys):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time_ns()
+                with self._conn:
+                    self._conn.execute("BEGIN")
+                    self._conn.executemany(
+                        "UPDATE entries SET last_access = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Mapping[str, bytes]) -> None:
+        """Insert or replace values, then evict least recently used entries over the bounds."""
+        if not items:
+            return
+        now = time.time_ns()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    [(key, value, len(value), now) for key, value in items.items()],
+                )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        excess_entries = max(0, count - self.max_entries) if self.max_entries else 0
+        excess_bytes = max(0, total - self.max_bytes) if self.max_bytes else 0
+        if not excess_entries and not excess_bytes:
+            return
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access"
+        ):
+            if len(victims) >= excess_entries and freed >= excess_bytes:
+                break
+            victims.append(key)
+            freed += size
+        for chunk in _chunks(victims):
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM entries WHERE key IN ({placeholders})", chunk)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": count,
+                "bytes": total,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -6,7 +6,6 @@
 import asyncio
 from collections.abc import Callable
 from typing import Any
-import ollama
 import numpy as np
 import tiktoken
 from tenacity import (
@@ -27,6 +26,44 @@ from graphrag.query.llm.oai.typing import (
 from graphrag.query.llm.text_utils import chunk_text
 from graphrag.query.progress import StatusReporter
 
+from utils.embedding_cache import get_embedding_cache
+from utils.ollama_client import (
+    EMBEDDING_MODEL,
+    get_async_client,
+    get_client,
+    get_semaphore,
+)
+from utils.tracing import get_tracer
+
+# Longest text embedded in one piece. Longer texts are embedded in chunks and
+# averaged, by this query embedder and by the indexing embedder
+# (utils/openai_embeddings_llm.py) alike, so the vector cached for a text does
+# not depend on which of them embedded it.
+MAX_INPUT_TOKENS = 8191
+
+
+def split_long_text(
+    text: str, token_encoder: tiktoken.Encoding, max_tokens: int = MAX_INPUT_TOKENS
+) -> list[tuple[str, int]] | None:
+    """Split text into (chunk, n_tokens) pieces of at most max_tokens.
+
+    Returns None when the text fits in one request.
+    """
+    chunks = [
+        (token_encoder.decode(list(tokens)), len(tokens))
+        for tokens in chunk_text(text=text, max_tokens=max_tokens, token_encoder=token_encoder)
+    ]
+    return chunks if len(chunks) > 1 else None
+
+
+def combine_chunk_embeddings(embeddings: list[list[float]], lengths: list[int]) -> list[float]:
+    """Length-weighted average of the chunk embeddings, L2-normalized."""
+    combined = np.average(np.asarray(embeddings, dtype=np.float32), axis=0, weights=lengths)
+    norm = np.linalg.norm(combined)
+    if norm > 0:
+        combined = combined / norm
+    return combined.tolist()
+
 
 class OpenAIEmbedding(BaseTextEmbedding, OpenAILLMImpl):
     """Wrapper for OpenAI Embedding models."""
@@ -42,11 +79,13 @@ class OpenAIEmbedding(BaseTextEmbedding, OpenAILLMImpl):
         api_type: OpenaiApiType = OpenaiApiType.OpenAI,
         organization: str | None = None,
         encoding_name: str = "cl100k_base",
-        max_tokens: int = 8191,
+        max_tokens: int = MAX_INPUT_TOKENS,
         max_retries: int = 10,
         request_timeout: float = 180.0,
         retry_error_types: tuple[type[BaseException]] = OPENAI_RETRY_ERROR_TYPES,  # type: ignore
         reporter: StatusReporter | None = None,
+        batch_size: int = 16,
+        chunk_long_texts: bool = True,
     ):
         OpenAILLMImpl.__init__(
             self=self,
@@ -68,31 +107,142 @@ class OpenAIEmbedding(BaseTextEmbedding, OpenAILLMImpl):
         self.token_encoder = tiktoken.get_encoding(self.encoding_name)
         self.retry_error_types = retry_error_types
         self.embedding_dim = 384  # Nomic-embed-text model dimension
-        self.ollama_client = ollama.Client()
+        self.batch_size = batch_size
+        self.chunk_long_texts = chunk_long_texts
+        self.ollama_client = get_client()
+        self.cache = get_embedding_cache()
+
+    def _split_long_text(self, text: str) -> list[tuple[str, int]] | None:
+        """Split text into (chunk, n_tokens) pieces of at most max_tokens.
+
+        Returns None when chunking is disabled or the text fits in one request.
+        """
+        if not self.chunk_long_texts:
+            return None
+        return split_long_text(text, self.token_encoder, self.max_tokens)
+
+    @staticmethod
+    def _inputs(text: str, chunks: list[tuple[str, int]] | None) -> list[str]:
+        return [text] if chunks is None else [chunk for chunk, _ in chunks]
+
+    def _from_response(self, response, chunks: list[tuple[str, int]] | None) -> list[float]:
+        # /api/embed returns L2-normalized vectors, like every other path here;
+        # the legacy /api/embeddings endpoint does not.
+        if chunks is None:
+            return response["embeddings"][0]
+        return combine_chunk_embeddings(
+            response["embeddings"], [n_tokens for _, n_tokens in chunks]
+        )
+
+    def _count_tokens(self, text: str, chunks: list[tuple[str, int]] | None) -> int:
+        if chunks is not None:
+            return sum(n_tokens for _, n_tokens in chunks)
+        return len(self.token_encoder.encode(text, disallowed_special=()))
 
     def embed(self, text: str, **kwargs: Any) -> list[float]:
         """Embed text using Ollama's nomic-embed-text model."""
-        try:
-            embedding = self.ollama_client.embeddings(model="nomic-embed-text", prompt=text)
-            return embedding["embedding"]
-        except Exception as e:
-            self._reporter.error(
-                message="Error embedding text",
-                details={self.__class__.__name__: str(e)},
-            )
-            return np.zeros(self.embedding_dim).tolist()
+        with get_tracer().span("embedding", texts=1) as span:
+            if self.cache is not None and (cached := self.cache.get(EMBEDDING_MODEL, text)):
+                span.set(cached=1)
+                return cached
+            try:
+                chunks = self._split_long_text(text)
+                if span.recording:
+                    span.set(cached=0, tokens=self._count_tokens(text, chunks))
+                response = self.ollama_client.embed(
+                    model=EMBEDDING_MODEL, input=self._inputs(text, chunks)
+                )
+                embedding = self._from_response(response, chunks)
+                if self.cache is not None:
+                    self.cache.put(EMBEDDING_MODEL, text, embedding)
+                return embedding
+            except Exception as e:
+                self._reporter.error(
+                    message="Error embedding text",
+                    details={self.__class__.__name__: str(e)},
+                )
+                return np.zeros(self.embedding_dim).tolist()
 
     async def aembed(self, text: str, **kwargs: Any) -> list[float]:
         """Embed text using Ollama's nomic-embed-text model asynchronously."""
-        try:
-            embedding = await self.ollama_client.embeddings(model="nomic-embed-text", prompt=text)
-            return embedding["embedding"]
-        except Exception as e:
-            self._reporter.error(
-                message="Error embedding text asynchronously",
-                details={self.__class__.__name__: str(e)},
+        with get_tracer().span("embedding", texts=1) as span:
+            if self.cache is not None and (cached := self.cache.get(EMBEDDING_MODEL, text)):
+                span.set(cached=1)
+                return cached
+            try:
+                chunks = self._split_long_text(text)
+                if span.recording:
+                    span.set(cached=0, tokens=self._count_tokens(text, chunks))
+                async with get_semaphore():
+                    response = await get_async_client().embed(
+                        model=EMBEDDING_MODEL, input=self._inputs(text, chunks)
+                    )
+                embedding = self._from_response(response, chunks)
+                if self.cache is not None:
+                    self.cache.put(EMBEDDING_MODEL, text, embedding)
+                return embedding
+            except Exception as e:
+                self._reporter.error(
+                    message="Error embedding text asynchronously",
+                    details={self.__class__.__name__: str(e)},
+                )
+                return np.zeros(self.embedding_dim).tolist()
+
+    async def aembed_batch(self, texts: list[str], **kwargs: Any) -> list[list[float]]:
+        """Embed several texts asynchronously, batch_size texts per Ollama request."""
+        with get_tracer().span("embedding.batch", texts=len(texts)) as span:
+            return await self._aembed_batch(texts, span)
+
+    async def _aembed_batch(self, texts: list[str], span) -> list[list[float]]:
+        if self.cache is not None:
+            embeddings = self.cache.get_many(EMBEDDING_MODEL, texts)
+        else:
+            embeddings = [None] * len(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        long_texts = [i for i in missing if self._split_long_text(texts[i]) is not None]
+        short_texts = sorted(set(missing) - set(long_texts))
+        batches = [
+            short_texts[i : i + self.batch_size]
+            for i in range(0, len(short_texts), self.batch_size)
+        ]
+        if span.recording:
+            span.set(
+                cached=len(texts) - len(missing),
+                batches=len(batches),
+                tokens=sum(
+                    len(self.token_encoder.encode(texts[i], disallowed_special=()))
+                    for i in short_texts
+                ),
             )
-            return np.zeros(self.embedding_dim).tolist()
+
+        async def embed_batch(batch: list[int]) -> None:
+            batch_texts = [texts[i] for i in batch]
+            try:
+                async with get_semaphore():
+                    response = await get_async_client().embed(
+                        model=EMBEDDING_MODEL, input=batch_texts
+                    )
+            except Exception as e:
+                self._reporter.error(
+                    message="Error embedding batch asynchronously",
+                    details={self.__class__.__name__: str(e)},
+                )
+                for i in batch:
+                    embeddings[i] = np.zeros(self.embedding_dim).tolist()
+                return
+            for i, embedding in zip(batch, response["embeddings"], strict=True):
+                embeddings[i] = embedding
+            if self.cache is not None:
+                self.cache.put_many(EMBEDDING_MODEL, batch_texts, response["embeddings"])
+
+        async def embed_long_text(i: int) -> None:
+            embeddings[i] = await self.aembed(texts[i])
+
+        await asyncio.gather(
+            *(embed_batch(batch) for batch in batches),
+            *(embed_long_text(i) for i in long_texts),
+        )
+        return embeddings
 
     def _embed_with_retry(
         self, text: str | tuple, **kwargs: Any  #str | tuple
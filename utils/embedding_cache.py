@@ -0,0 +1,81 @@
+"""Content-addressed embedding cache shared by the query and indexing embedders.
+
+Vectors are keyed by sha256(key version, model, text) and stored as packed float32 bytes in
+a DiskLRUCache, so re-indexing an unchanged corpus or repeating a question
+does not call Ollama again.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+
+from utils.disk_cache import DiskLRUCache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "embeddings.sqlite3")
+DEFAULT_MAX_ENTRIES = 1_000_000
+# Bumped when the cached vectors change meaning. v2: every path uses Ollama's
+# normalized /api/embed; v1 entries may hold unnormalized /api/embeddings vectors.
+KEY_VERSION = "v2"
+
+
+class EmbeddingCache:
+    """Bulk get/put of embedding vectors keyed by model and text."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int | None = DEFAULT_MAX_ENTRIES):
+        self._store = DiskLRUCache(path, max_entries=max_entries)
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{KEY_VERSION}\0{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> list[list[float] | None]:
+        """Return one vector per text, None where the text is not cached."""
+        keys = [self.key(model, text) for text in texts]
+        found = self._store.get_many(keys)
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(
+        self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]
+    ) -> None:
+        self._store.put_many({
+            self.key(model, text): np.asarray(embedding, dtype=np.float32).tobytes()
+            for text, embedding in zip(texts, embeddings, strict=True)
+        })
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        return self.get_many(model, [text])[0]
+
+    def put(self, model: str, text: str, embedding: Sequence[float]) -> None:
+        self.put_many(model, [text], [embedding])
+
+    def stats(self) -> dict:
+        return self._store.stats()
+
+
+_lock = threading.Lock()
+_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Return the process-wide cache, or None when EMBEDDING_CACHE_DISABLED is set."""
+    global _cache
+    if os.environ.get("EMBEDDING_CACHE_DISABLED"):
+        return None
+    with _lock:
+        if _cache is None:
+            path = os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+            max_entries = int(
+                os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+            )
+            _cache = EmbeddingCache(path, max_entries=max_entries or None)
+            log.info("Using embedding cache at %s", path)
+        return _cache
@@ -0,0 +1,141 @@
+"""Memory-mapped side-car store for embedding matrices.
+
+In parquet, embeddings are list<double> cells. Every search process decodes
+them into Python lists of floats at startup and keeps its own copy. An
+EmbeddingStore writes them once as a contiguous row-major binary file next to
+the artifacts, which search processes open with np.memmap. Opening costs
+nothing, pages are read on first touch, and all processes on the machine
+(e.g. several Chainlit workers) share one copy through the page cache.
+
+The rows can be quantized to float16 (half the size) or int8 with a per-row
+scale (a quarter). The quantized rows are scored first. When a float32 copy is
+kept, the best candidates are then rescored against it, so the final ranking
+is exact while the scan touches only the small file.
+
+Files for a store named <name> in <folder>:
+
+    <name>.json       count, dim, dtype, whether a float32 copy is kept
+    <name>.<dtype>    the (count, dim) rows in dtype
+    <name>.scale      int8 only: float32 per-row scales
+    <name>.float32    the float32 rows, if kept for rescoring
+
+Each file is written under a temporary name and renamed into place, so a
+process that has the old files memory-mapped keeps reading them intact.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+BLOCK_ROWS = 16384  # rows decoded to float32 at a time while scoring
+
+
+def write_atomic(path: Path, write) -> None:
+    """Call write(tmp) on a temporary file next to path, then rename it to path."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class EmbeddingStore:
+    def __init__(self, vectors: np.ndarray, dtype: str = "float32",
+                 scales: np.ndarray | None = None, full: np.ndarray | None = None):
+        self.vectors = vectors  # (count, dim) in dtype; an ndarray or a read-only memmap
+        self.dtype = dtype
+        self.scales = scales    # int8 only: row i decodes to vectors[i] * scales[i]
+        self.full = full        # float32 rows for rescoring quantized scores
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != "float32"
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, dtype: str = "float32", keep_full: bool = True) -> "EmbeddingStore":
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}, not {dtype!r}")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if dtype == "float32":
+            return cls(vectors)
+        full = vectors if keep_full else None
+        if dtype == "float16":
+            return cls(vectors.astype(np.float16), dtype, full=full)
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return cls(quantized, dtype, scales.astype(np.float32), full)
+
+    def write(self, folder: Path, name: str) -> None:
+        folder.mkdir(parents=True, exist_ok=True)
+        # Until the new .json is in place the store is incomplete and ignored,
+        # rather than an old .json describing new rows.
+        (folder / f"{name}.json").unlink(missing_ok=True)
+        write_atomic(folder / f"{name}.{self.dtype}", self.vectors.tofile)
+        if self.scales is not None:
+            write_atomic(folder / f"{name}.scale", self.scales.tofile)
+        if self.full is not None:
+            write_atomic(folder / f"{name}.float32", self.full.tofile)
+        meta = json.dumps({
+            "count": len(self), "dim": self.dim, "dtype": self.dtype, "float32": self.full is not None,
+        })
+        write_atomic(folder / f"{name}.json", lambda path: Path(path).write_text(meta))
+
+    @staticmethod
+    def exists(folder: Path, name: str) -> bool:
+        return (folder / f"{name}.json").exists()
+
+    @classmethod
+    def open(cls, folder: Path, name: str) -> "EmbeddingStore":
+        meta = json.loads((folder / f"{name}.json").read_text())
+        shape = (meta["count"], meta["dim"])
+        dtype = meta["dtype"]
+
+        def mmap(suffix, type_, shape):
+            if not shape[0]:
+                return np.zeros(shape, type_)
+            return np.memmap(folder / f"{name}.{suffix}", dtype=type_, mode="r", shape=shape)
+
+        vectors = mmap(dtype, DTYPES[dtype], shape)
+        scales = mmap("scale", np.float32, shape[:1]) if dtype == "int8" else None
+        full = mmap("float32", np.float32, shape) if meta.get("float32") and dtype != "float32" else None
+        return cls(vectors, dtype, scales, full)
+
+    def decode(self, rows) -> np.ndarray:
+        """float32 copy of vectors[rows] (a slice or an index array)."""
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[rows][:, None]
+        return block
+
+    def scores(self, query: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Dot products of query with every row (or with rows), decoded block by block."""
+        if rows is not None:
+            return self.decode(rows) @ query
+        if not self.quantized:
+            return self.vectors @ query
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, len(self))
+            out[start:end] = self.decode(slice(start, end)) @ query
+        return out
+
+    def exact_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """float32 dot products for rows: from the float32 copy when there is one."""
+        if self.full is not None:
+            return np.asarray(self.full[rows]) @ query
+        return self.scores(query, rows)
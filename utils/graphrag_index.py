@@ -0,0 +1,284 @@
+"""Process-wide, resident GraphRAG index for the Chainlit app.
+
+graphrag's run_local_search/run_global_search re-resolve the latest output
+folder and re-read every parquet table on each call. GraphRAGIndex loads the
+artifacts once, keeps the per-community-level domain objects in memory, and is
+shared by every session. When a newer output/<timestamp> appears it loads the
+new snapshot in the background and swaps it in with a single reference
+assignment, so in-flight queries finish on the snapshot they started with.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from graphrag.config import GraphRagConfig
+from graphrag.query.cli import _read_config_parameters
+from graphrag.query.factories import get_global_search_engine, get_local_search_engine
+from graphrag.query.indexer_adapters import (
+    read_indexer_covariates,
+    read_indexer_entities,
+    read_indexer_relationships,
+    read_indexer_reports,
+    read_indexer_text_units,
+)
+from graphrag.query.input.loaders.dfs import store_entity_semantic_embeddings
+from graphrag.vector_stores import VectorStoreFactory, VectorStoreType
+from rich import print
+
+from utils import report_packs
+from utils.artifacts import latest_output_dir
+from utils.tracing import get_tracer
+from utils.vector_index import VectorIndex, VectorIndexStore, load_or_build, search_mode
+
+
+def _description_embedding_store(config: GraphRagConfig):
+    """Connect the entity description vector store the same way graphrag's query CLI does."""
+    config_args = dict(config.embeddings.vector_store or {})
+    vector_store_type = config_args.get("type", VectorStoreType.LanceDB)
+    config_args.update({
+        "collection_name": config_args.get(
+            "query_collection_name",
+            config_args.get("collection_name", "description_embedding"),
+        ),
+    })
+    store = VectorStoreFactory.get_vector_store(
+        vector_store_type=vector_store_type, kwargs=config_args
+    )
+    store.connect(**config_args)
+    return store
+
+
+def _read_entities(path: Path, with_embeddings: bool) -> pd.DataFrame:
+    """Entities table; without the vector index the embeddings are needed for LanceDB.
+
+    Otherwise the description_embedding column is not read at all (the vector
+    index has them memory-mapped), which skips decoding a list of floats per row.
+    """
+    if with_embeddings:
+        return pd.read_parquet(path)
+    columns = [name for name in pq.read_schema(path).names if name != "description_embedding"]
+    entities = pd.read_parquet(path, columns=columns)
+    entities["description_embedding"] = None
+    return entities
+
+
+@dataclass
+class IndexSnapshot:
+    """The parquet tables of one output/<timestamp>/artifacts folder, held in memory."""
+
+    version: str
+    data_dir: Path
+    config: GraphRagConfig
+    nodes: pd.DataFrame
+    entities: pd.DataFrame
+    community_reports: pd.DataFrame
+    relationships: list
+    text_units: list
+    covariates: list
+    vector_index: VectorIndex | None = None
+    _levels: dict = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @classmethod
+    def load(cls, root_dir: str | Path, output_dir: Path) -> "IndexSnapshot":
+        data_dir = output_dir / "artifacts"
+        covariates_path = data_dir / "create_final_covariates.parquet"
+        mode, _ = search_mode()
+        vector_index = load_or_build(data_dir) if mode != "lancedb" else None
+        entities = _read_entities(data_dir / "create_final_entities.parquet", vector_index is None)
+        return cls(
+            version=output_dir.name,
+            data_dir=data_dir,
+            config=_read_config_parameters(str(root_dir)),
+            nodes=pd.read_parquet(data_dir / "create_final_nodes.parquet"),
+            entities=entities,
+            community_reports=pd.read_parquet(
+                data_dir / "create_final_community_reports.parquet"
+            ),
+            relationships=read_indexer_relationships(
+                pd.read_parquet(data_dir / "create_final_relationships.parquet")
+            ),
+            text_units=read_indexer_text_units(
+                pd.read_parquet(data_dir / "create_final_text_units.parquet")
+            ),
+            covariates=(
+                read_indexer_covariates(pd.read_parquet(covariates_path))
+                if covariates_path.exists()
+                else []
+            ),
+            vector_index=vector_index,
+        )
+
+    def level(self, community_level: int) -> dict:
+        """Entities, reports and vector store for a community level, built on first use."""
+        with self._lock:
+            data = self._levels.get(community_level)
+            if data is None:
+                entities = read_indexer_entities(self.nodes, self.entities, community_level)
+                mode, nprobe = search_mode()
+                if self.vector_index is not None and mode != "lancedb":
+                    store = VectorIndexStore(self.vector_index, mode, nprobe)
+                else:
+                    store = _description_embedding_store(self.config)
+                    store_entity_semantic_embeddings(entities=entities, vectorstore=store)
+                reports = read_indexer_reports(self.community_reports, self.nodes, community_level)
+                data = {
+                    "entities": entities,
+                    "reports": reports,
+                    "description_embedding_store": store,
+                }
+                self._levels[community_level] = data
+            return data
+
+    def report_pack(self, community_level: int) -> report_packs.ReportPack:
+        """The level's global search report pack, loaded or built on first global search."""
+        data = self.level(community_level)
+        with self._lock:
+            if "report_pack" not in data:
+                data["report_pack"] = report_packs.load_or_build(
+                    self.data_dir, community_level, data["reports"], data["entities"],
+                    self.config.global_search.max_tokens, self.config.encoding_model,
+                )
+            return data["report_pack"]
+
+    def local_search_engine(self, community_level: int, response_type: str):
+        data = self.level(community_level)
+        return get_local_search_engine(
+            self.config,
+            reports=data["reports"],
+            text_units=self.text_units,
+            entities=data["entities"],
+            relationships=self.relationships,
+            covariates={"claims": self.covariates},
+            description_embedding_store=data["description_embedding_store"],
+            response_type=response_type,
+        )
+
+    def global_search_engine(self, community_level: int, response_type: str):
+        data = self.level(community_level)
+        engine = get_global_search_engine(
+            self.config,
+            reports=data["reports"],
+            entities=data["entities"],
+            response_type=response_type,
+        )
+        # Serve the precomputed map-stage batches instead of rebuilding them per query.
+        engine.context_builder = report_packs.PackedGlobalContext(
+            self.report_pack(community_level), report_packs.top_k_from_env()
+        )
+        return engine
+
+    def search(
+        self, local: bool, community_level: int, response_type: str, query: str
+    ) -> str:
+        search_type = "local" if local else "global"
+        with get_tracer().span(
+            "graphrag.search", search_type=search_type, community_level=community_level
+        ) as span:
+            if local:
+                engine = self.local_search_engine(community_level, response_type)
+            else:
+                engine = self.global_search_engine(community_level, response_type)
+            result = engine.search(query=query)
+            if span.recording:
+                span.set(
+                    llm_calls=result.llm_calls,
+                    prompt_tokens=result.prompt_tokens,
+                    completion_time=round(result.completion_time, 3),
+                )
+                # Global search: the map stage runs one LLM call per batch of reports.
+                map_responses = getattr(result, "map_responses", None) or []
+                if map_responses:
+                    span.set(
+                        map_batches=len(map_responses),
+                        map_prompt_tokens=sum(r.prompt_tokens for r in map_responses),
+                        map_max_seconds=round(max(r.completion_time for r in map_responses), 3),
+                    )
+            return result.response
+
+
+class GraphRAGIndex:
+    """Shared handle on the newest IndexSnapshot under root_dir."""
+
+    def __init__(self, root_dir: str | Path = ".", refresh_interval: float = 30.0):
+        self.root_dir = Path(root_dir)
+        self.refresh_interval = refresh_interval
+        self._snapshot: IndexSnapshot | None = None
+        self._lock = threading.Lock()
+        self._loading: str | None = None
+        self._failed: set[str] = set()  # versions that failed to load; not retried
+        self._last_check = 0.0
+
+    @property
+    def version(self) -> str:
+        return self.snapshot().version
+
+    def snapshot(self) -> IndexSnapshot:
+        """Return the current snapshot, loading it synchronously the first time."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    output_dir = latest_output_dir(self.root_dir)
+                    if output_dir is None:
+                        msg = f"No GraphRAG artifacts found under {self.root_dir / 'output'}"
+                        raise ValueError(msg)
+                    self._snapshot = self._load(output_dir)
+                    self._last_check = time.monotonic()
+                return self._snapshot
+        self._maybe_refresh(snapshot)
+        return snapshot
+
+    def _load(self, output_dir: Path) -> IndexSnapshot:
+        start = time.perf_counter()
+        snapshot = IndexSnapshot.load(self.root_dir, output_dir)
+        print(f"Loaded GraphRAG index {snapshot.version} in {time.perf_counter() - start:.2f}s")
+        return snapshot
+
+    def _maybe_refresh(self, current: IndexSnapshot) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self.refresh_interval:
+            return
+        self._last_check = now
+        output_dir = latest_output_dir(self.root_dir)
+        if output_dir is None or output_dir.name == current.version or output_dir.name in self._failed:
+            return
+        with self._lock:
+            if self._loading is not None:
+                return
+            self._loading = output_dir.name
+        threading.Thread(target=self._swap, args=(output_dir,), daemon=True).start()
+
+    def _swap(self, output_dir: Path) -> None:
+        try:
+            snapshot = self._load(output_dir)
+            self._snapshot = snapshot
+        except Exception as e:
+            # Keep serving the current snapshot.
+            self._failed.add(output_dir.name)
+            print(f"Failed to load GraphRAG index {output_dir.name}, keeping {self._snapshot.version}: {e}")
+        finally:
+            self._loading = None
+
+    def search(
+        self, local: bool, community_level: int, response_type: str, query: str
+    ) -> str:
+        return self.snapshot().search(local, community_level, response_type, query)
+
+
+_index_lock = threading.Lock()
+_indexes: dict[Path, GraphRAGIndex] = {}
+
+
+def get_index(root_dir: str | Path = ".") -> GraphRAGIndex:
+    """Return the process-wide GraphRAGIndex for root_dir."""
+    key = Path(root_dir).resolve()
+    with _index_lock:
+        if key not in _indexes:
+            _indexes[key] = GraphRAGIndex(key)
+        return _indexes[key]
@@ -0,0 +1,124 @@
+"""Token-budgeted history compaction for the group-chat agents.
+
+Every round of the GroupChat resends an agent's whole message history,
+including long query_graphRAG results, so prompt prefill grows each round.
+HistoryCompactor is an AutoGen MessageTransform (applied through
+TransformMessages) that keeps each prompt under a token budget:
+
+1. The first message (the task) and the most recent `keep_recent` messages
+   are always kept verbatim.
+2. Older tool outputs are replaced by a short reference holding their first
+   `tool_preview_tokens` tokens.
+3. If the history is still over budget, the oldest messages are dropped.
+   An assistant tool call is always dropped together with its tool responses.
+
+The tokens of every compacted prompt are recorded in `prompt_tokens`.
+
+Tokens are counted with the project's cl100k_base encoder.
+"""
+
+import copy
+
+import tiktoken
+
+from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+
+# Rough per-message overhead of the chat format (role, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class HistoryCompactor:
+    def __init__(
+        self,
+        name: str,
+        max_tokens: int = 6000,
+        keep_recent: int = 4,
+        tool_preview_tokens: int = 200,
+        encoding_name: str = "cl100k_base",
+    ):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.tool_preview_tokens = tool_preview_tokens
+        self.token_encoder = tiktoken.get_encoding(encoding_name)
+        self.prompt_tokens: list[int] = []
+
+    def _count(self, text) -> int:
+        if not text:
+            return 0
+        return len(self.token_encoder.encode(str(text), disallowed_special=()))
+
+    def count_message(self, message: dict) -> int:
+        tokens = MESSAGE_OVERHEAD_TOKENS + self._count(message.get("content"))
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            tokens += self._count(function.get("name")) + self._count(function.get("arguments"))
+        for response in message.get("tool_responses") or []:
+            tokens += MESSAGE_OVERHEAD_TOKENS + self._count(response.get("content"))
+        return tokens
+
+    def count(self, messages: list[dict]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+    def _preview(self, content: str, ref: str) -> str:
+        tokens = self.token_encoder.encode(str(content), disallowed_special=())
+        if len(tokens) <= self.tool_preview_tokens:
+            return content
+        preview = self.token_encoder.decode(tokens[: self.tool_preview_tokens])
+        return f"[{ref} elided, {len(tokens)} tokens; beginning:]\n{preview} ..."
+
+    def _compact_tool_output(self, message: dict, index: int) -> dict:
+        message = copy.copy(message)
+        ref = f"tool result #{index}"
+        if message.get("tool_responses"):
+            message["tool_responses"] = [
+                {**response, "content": self._preview(response.get("content", ""), ref)}
+                for response in message["tool_responses"]
+            ]
+        if message.get("role") in ("tool", "function") and message.get("content"):
+            message["content"] = self._preview(message["content"], ref)
+        return message
+
+    @staticmethod
+    def _is_tool_output(message: dict) -> bool:
+        return message.get("role") in ("tool", "function") or bool(message.get("tool_responses"))
+
+    def apply_transform(self, messages: list[dict]) -> list[dict]:
+        keep_from = max(1, len(messages) - self.keep_recent)
+        compacted = [
+            self._compact_tool_output(message, i) if 0 < i < keep_from and self._is_tool_output(message) else message
+            for i, message in enumerate(messages)
+        ]
+
+        total = self.count(compacted)
+        # messages[0] is the task the agents are answering; never drop it.
+        start = 1
+        while total > self.max_tokens and start < keep_from:
+            # Drop the oldest message, and with it any tool responses that
+            # answer it, so the remaining history still starts cleanly.
+            total -= self.count_message(compacted[start])
+            start += 1
+            while start < len(compacted) and self._is_tool_output(compacted[start]):
+                total -= self.count_message(compacted[start])
+                start += 1
+        compacted = compacted[:1] + compacted[start:]
+
+        self.prompt_tokens.append(total)
+        return compacted
+
+    def get_logs(self, pre_transform_messages: list[dict], post_transform_messages: list[dict]) -> tuple[str, bool]:
+        pre = self.count(pre_transform_messages)
+        post = self.count(post_transform_messages)
+        if post < pre:
+            return f"{self.name}: compacted history from {pre} to {post} tokens.", True
+        return f"{self.name}: history within budget ({post} tokens).", False
+
+    def reset(self) -> None:
+        self.prompt_tokens = []
+
+
+def add_history_compaction(agent, **kwargs) -> HistoryCompactor:
+    """Attach a HistoryCompactor to agent and return it."""
+    compactor = HistoryCompactor(agent.name, **kwargs)
+    TransformMessages(transforms=[compactor], verbose=False).add_to_agent(agent)
+    return compactor
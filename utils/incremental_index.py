@@ -0,0 +1,375 @@
+"""Incremental GraphRAG re-indexing for added, changed and removed documents.
+
+graphrag ids a document by the md5 of its text, so comparing the document
+ids of the newest artifacts with the files under input/markdown shows exactly
+which documents are new (added or edited) and which are gone. Instead of
+re-indexing everything, update():
+
+1. indexes only the new documents in a scratch root. The scratch run uses the
+   same settings, prompts and LLM cache and skips the community report workflow.
+2. drops the text units of removed documents, and the entities and
+   relationships that were only backed by them.
+3. merges the new entities (by name) and relationships (by source and
+   target) into the previous ones. A new description is appended to the
+   previous one as is; graphrag's description summarization is not re-run,
+   so a merged description can read as a list until the next full index.
+   Entities whose description changed are re-embedded.
+4. re-clusters the merged graph with the configured Leiden strategy. A
+   community with the same members at the same level as before keeps its
+   report; reports are only generated for communities whose membership changed.
+5. writes everything as a new output/<timestamp>/artifacts version. Unchanged
+   rows are copied from the previous version.
+
+    python -m utils.incremental_index --root .
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import networkx as nx
+import pandas as pd
+import tiktoken
+import yaml
+from datashaper import NoopVerbCallbacks
+from graphrag.index.cache import load_cache
+from graphrag.index.create_pipeline_config import create_pipeline_config
+from graphrag.index.verbs.graph.clustering.strategies.leiden import run as run_leiden
+from graphrag.index.verbs.graph.report.strategies.graph_intelligence.run_graph_intelligence import (
+    run as run_community_report,
+)
+from graphrag.query.cli import _read_config_parameters
+from rich import print
+
+from utils.artifacts import REQUIRED_TABLES, latest_artifacts_dir
+from utils.embedding import OpenAIEmbedding
+from utils.vector_index import INDEX_DIR, VectorIndex
+
+SCRATCH_SKIP_WORKFLOWS = ["create_final_community_reports"]
+TABLES = [
+    "create_final_documents",
+    "create_final_text_units",
+    "create_final_entities",
+    "create_final_relationships",
+    "create_final_nodes",
+    "create_final_communities",
+    "create_final_community_reports",
+]
+
+
+def document_id(text: str) -> str:
+    """The id graphrag's text loader gives a document: md5 of its text."""
+    return hashlib.md5(text.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def read_input_documents(root_dir: Path, config) -> dict[str, Path]:
+    """document id -> file for every input file matching settings.yaml's file_pattern."""
+    base_dir = root_dir / config.input.base_dir
+    pattern = re.compile(config.input.file_pattern)
+    documents = {}
+    for path in sorted(base_dir.rglob("*")):
+        if path.is_file() and pattern.search(path.relative_to(base_dir).as_posix()):
+            documents[document_id(path.read_text(encoding=config.input.encoding or "utf-8"))] = path
+    return documents
+
+
+def load_tables(artifacts: Path) -> dict[str, pd.DataFrame]:
+    return {
+        name: pd.read_parquet(artifacts / f"{name}.parquet")
+        for name in TABLES
+        if (artifacts / f"{name}.parquet").exists()
+    }
+
+
+def _ids(value) -> list:
+    return [] if value is None else list(value)
+
+
+def index_documents(root_dir: Path, base_dir: Path, files: list[Path], scratch: Path) -> Path:
+    """Run graphrag.index on files only and return the scratch artifacts folder."""
+    settings = yaml.safe_load((root_dir / "settings.yaml").read_text())
+    settings["input"] = {**settings.get("input", {}), "base_dir": "input"}
+    # Share the LLM cache with full runs, so re-extracting a chunk is free.
+    cache = settings.get("cache", {})
+    settings["cache"] = {**cache, "base_dir": str((root_dir / cache.get("base_dir", "cache")).resolve())}
+    settings["skip_workflows"] = sorted(set(settings.get("skip_workflows") or []) | set(SCRATCH_SKIP_WORKFLOWS))
+    (scratch / "input").mkdir(parents=True)
+    (scratch / "settings.yaml").write_text(yaml.safe_dump(settings, sort_keys=False))
+    for name in ("prompts", ".env"):
+        if (root_dir / name).exists():
+            os.symlink((root_dir / name).resolve(), scratch / name)
+    for path in files:
+        # Same relative path, so the document gets the same title as in a full run.
+        target = scratch / "input" / path.relative_to(base_dir)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, target)
+    subprocess.run([sys.executable, "-m", "graphrag.index", "--root", str(scratch)], check=True)
+    return latest_artifacts_dir(scratch, required=tuple(
+        name for name in REQUIRED_TABLES if name != "create_final_community_reports"
+    ))
+
+
+class IncrementalIndexer:
+    def __init__(self, root_dir: str = "."):
+        self.root_dir = Path(root_dir).resolve()
+        self.config = _read_config_parameters(str(self.root_dir))
+        self.token_encoder = tiktoken.get_encoding(self.config.encoding_model)
+
+    def diff(self) -> tuple[Path, dict[str, pd.DataFrame], dict[str, Path], set[str]]:
+        previous_dir = latest_artifacts_dir(self.root_dir)
+        previous = load_tables(previous_dir)
+        current = read_input_documents(self.root_dir, self.config)
+        previous_ids = set(previous["create_final_documents"]["id"])
+        added = {doc_id: path for doc_id, path in current.items() if doc_id not in previous_ids}
+        removed = previous_ids - set(current)
+        return previous_dir, previous, added, removed
+
+    def update(self, dry_run: bool = False) -> Path | None:
+        start = time.perf_counter()
+        previous_dir, previous, added, removed = self.diff()
+        print(f"Previous version {previous_dir.parent.name}: {len(added)} new or changed documents, {len(removed)} removed")
+        for path in added.values():
+            print(f"  + {path.relative_to(self.root_dir)}")
+        if not added and not removed:
+            print("Index is up to date.")
+            return None
+        if dry_run:
+            return None
+
+        scratch = self.root_dir / "output" / f".incremental-{time.strftime('%Y%m%d-%H%M%S')}"
+        try:
+            delta = load_tables(index_documents(
+                self.root_dir, self.root_dir / self.config.input.base_dir, list(added.values()), scratch
+            )) if added else {}
+            tables = self.merge(previous, delta, removed)
+            tables.update(asyncio.run(self.recluster(previous, tables)))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        # Written under a hidden name and renamed when complete, so the app
+        # never loads a half-written version.
+        version = time.strftime("%Y%m%d-%H%M%S")
+        staging = self.root_dir / "output" / f".staging-{version}"
+        output = staging / "artifacts"
+        output.mkdir(parents=True)
+        for name, table in tables.items():
+            table.to_parquet(output / f"{name}.parquet")
+        covariates = previous_dir / "create_final_covariates.parquet"
+        if covariates.exists():
+            table = pd.read_parquet(covariates)
+            kept_units = set(tables["create_final_text_units"]["id"])
+            table[table["text_unit_id"].isin(kept_units)].to_parquet(output / covariates.name)
+        VectorIndex.from_entities(tables["create_final_entities"]).save(output / INDEX_DIR)
+        os.replace(staging, self.root_dir / "output" / version)
+        output = self.root_dir / "output" / version / "artifacts"
+        print(f"Wrote {output} in {time.perf_counter() - start:.1f}s")
+        return output
+
+    def merge(self, previous: dict, delta: dict, removed: set[str]) -> dict[str, pd.DataFrame]:
+        empty = pd.DataFrame()
+        documents = previous["create_final_documents"]
+        text_units = previous["create_final_text_units"]
+        entities = previous["create_final_entities"]
+        relationships = previous["create_final_relationships"]
+
+        # 1. Drop what only removed documents supported.
+        documents = documents[~documents["id"].isin(removed)]
+        text_units = text_units[~text_units["document_ids"].apply(lambda ids: bool(set(_ids(ids)) & removed))]
+        kept_units = set(text_units["id"])
+        entities = entities.assign(text_unit_ids=entities["text_unit_ids"].apply(lambda ids: [i for i in _ids(ids) if i in kept_units]))
+        entities = entities[entities["text_unit_ids"].apply(len) > 0]
+        relationships = relationships.assign(text_unit_ids=relationships["text_unit_ids"].apply(lambda ids: [i for i in _ids(ids) if i in kept_units]))
+        names = set(entities["name"])
+        relationships = relationships[
+            (relationships["text_unit_ids"].apply(len) > 0)
+            & relationships["source"].isin(names)
+            & relationships["target"].isin(names)
+        ]
+
+        # 2. Merge the new documents' entities by name, relationships by (source, target).
+        entity_ids, relationship_ids = {}, {}
+        merged_entities = {row["name"]: row for row in entities.to_dict("records")}
+        next_id = max((int(row["human_readable_id"]) for row in merged_entities.values()), default=-1) + 1
+        reembed = []
+        for row in delta.get("create_final_entities", empty).to_dict("records"):
+            old = merged_entities.get(row["name"])
+            if old is None:
+                entity_ids[row["id"]] = row["id"]
+                merged_entities[row["name"]] = {**row, "human_readable_id": next_id}
+                next_id += 1
+                continue
+            entity_ids[row["id"]] = old["id"]
+            old["text_unit_ids"] = sorted(set(_ids(old["text_unit_ids"])) | set(_ids(row["text_unit_ids"])))
+            if row["description"] and row["description"] not in (old["description"] or ""):
+                old["description"] = f"{old['description'] or ''}\n{row['description']}".strip()
+                reembed.append(old)
+        if reembed:
+            embedder = OpenAIEmbedding(api_key="ollama", max_retries=1)
+            texts = [f"{row['name']}:{row['description']}" for row in reembed]
+            for row, embedding in zip(reembed, asyncio.run(embedder.aembed_batch(texts))):
+                row["description_embedding"] = embedding
+        entities = pd.DataFrame(list(merged_entities.values()))
+
+        merged_relationships = {(row["source"], row["target"]): row for row in relationships.to_dict("records")}
+        next_id = max((int(row["human_readable_id"]) for row in merged_relationships.values()), default=-1) + 1
+        for row in delta.get("create_final_relationships", empty).to_dict("records"):
+            old = merged_relationships.get((row["source"], row["target"]))
+            if old is None:
+                relationship_ids[row["id"]] = row["id"]
+                merged_relationships[(row["source"], row["target"])] = {**row, "human_readable_id": str(next_id)}
+                next_id += 1
+                continue
+            relationship_ids[row["id"]] = old["id"]
+            old["weight"] += row["weight"]
+            old["text_unit_ids"] = sorted(set(_ids(old["text_unit_ids"])) | set(_ids(row["text_unit_ids"])))
+            if row["description"] and row["description"] not in (old["description"] or ""):
+                old["description"] = f"{old['description'] or ''}\n{row['description']}".strip()
+        relationships = pd.DataFrame(list(merged_relationships.values()))
+        degree = pd.concat([relationships["source"], relationships["target"]]).value_counts()
+        relationships["source_degree"] = relationships["source"].map(degree).fillna(0).astype(int)
+        relationships["target_degree"] = relationships["target"].map(degree).fillna(0).astype(int)
+        relationships["rank"] = relationships["source_degree"] + relationships["target_degree"]
+
+        # 3. Text units: keep the old ones (minus dropped entities), add the new ones with merged ids.
+        kept_entities, kept_relationships = set(entities["id"]), set(relationships["id"])
+        d_text_units = delta.get("create_final_text_units", empty)
+        if len(d_text_units):
+            d_text_units = d_text_units.assign(
+                entity_ids=d_text_units["entity_ids"].apply(lambda ids: [entity_ids.get(i, i) for i in _ids(ids)]),
+                relationship_ids=d_text_units["relationship_ids"].apply(lambda ids: [relationship_ids.get(i, i) for i in _ids(ids)]),
+            )
+        text_units = pd.concat([text_units, d_text_units], ignore_index=True)
+        text_units["entity_ids"] = text_units["entity_ids"].apply(lambda ids: [i for i in _ids(ids) if i in kept_entities])
+        text_units["relationship_ids"] = text_units["relationship_ids"].apply(lambda ids: [i for i in _ids(ids) if i in kept_relationships])
+        documents = pd.concat([documents, delta.get("create_final_documents", empty)], ignore_index=True)
+
+        return {
+            "create_final_documents": documents,
+            "create_final_text_units": text_units,
+            "create_final_entities": entities,
+            "create_final_relationships": relationships,
+        }
+
+    async def recluster(self, previous: dict, tables: dict) -> dict[str, pd.DataFrame]:
+        entities = tables["create_final_entities"]
+        relationships = tables["create_final_relationships"]
+        graph = nx.Graph()
+        graph.add_nodes_from(entities["name"])
+        graph.add_weighted_edges_from(relationships[["source", "target", "weight"]].itertuples(index=False))
+        graph.remove_nodes_from(list(nx.isolates(graph)))
+        # {level: {community id: [entity names]}}
+        communities = run_leiden(graph, self.config.cluster_graph.resolved_strategy())
+
+        previous_nodes = previous["create_final_nodes"]
+        previous_reports = previous["create_final_community_reports"].set_index("community", drop=False)
+        previous_members = {
+            (int(level), frozenset(group["title"])): str(community)
+            for (level, community), group in previous_nodes.dropna(subset=["community"]).groupby(["level", "community"])
+        }
+
+        degree = dict(graph.degree)
+        entity_rows = entities.set_index("name")
+        nodes, community_rows, reports, pending = [], [], [], []
+        clustered = set()
+        flat = [
+            (level, str(community), list(members))
+            for level, clusters in communities.items()
+            for community, members in clusters.items()
+        ]
+        for level, community, members in flat:
+            clustered.update(members)
+            for name in members:
+                entity = entity_rows.loc[name]
+                nodes.append({
+                    "id": entity["id"], "human_readable_id": entity["human_readable_id"], "title": name,
+                    "type": entity.get("type"), "description": entity.get("description"),
+                    "degree": degree.get(name, 0), "community": community, "level": level,
+                })
+            member_set = set(members)
+            internal = relationships[relationships["source"].isin(member_set) & relationships["target"].isin(member_set)]
+            community_rows.append({
+                "id": community, "title": f"Community {community}", "level": level,
+                "relationship_ids": list(internal["id"]),
+                "text_unit_ids": sorted({tu for ids in entity_rows.loc[members, "text_unit_ids"] for tu in _ids(ids)}),
+            })
+            previous_community = previous_members.get((level, frozenset(members)))
+            if previous_community is not None and previous_community in previous_reports.index:
+                reports.append({**previous_reports.loc[previous_community].to_dict(), "community": community, "level": level})
+            else:
+                pending.append((community, level, members, internal))
+
+        print(f"{len(community_rows)} communities: {len(reports)} reports reused, {len(pending)} to generate")
+        reports += await self.generate_reports(pending, entity_rows, degree)
+        # Isolated entities, and those outside the largest component when the
+        # strategy clusters only that (use_lcc), belong to no community.
+        for name in set(entities["name"]) - clustered:
+            entity = entity_rows.loc[name]
+            nodes.append({
+                "id": entity["id"], "human_readable_id": entity["human_readable_id"], "title": name,
+                "type": entity.get("type"), "description": entity.get("description"),
+                "degree": 0, "community": None, "level": 0,
+            })
+        return {
+            "create_final_nodes": pd.DataFrame(nodes),
+            "create_final_communities": pd.DataFrame(community_rows),
+            "create_final_community_reports": pd.DataFrame(reports),
+        }
+
+    def _context(self, members: list[str], internal: pd.DataFrame, entity_rows: pd.DataFrame, degree: dict) -> str:
+        """Entity and relationship tables for the report prompt, highest degree first,
+        cut at community_reports.max_input_length tokens."""
+        budget = self.config.community_reports.max_input_length
+        lines = ["-----Entities-----", "human_readable_id,title,description,degree"]
+        for name in sorted(members, key=lambda name: degree.get(name, 0), reverse=True):
+            entity = entity_rows.loc[name]
+            lines.append(f"{entity['human_readable_id']},{name},{entity['description']},{degree.get(name, 0)}")
+        lines += ["", "-----Relationships-----", "human_readable_id,source,target,description,rank"]
+        for row in internal.sort_values("rank", ascending=False).itertuples(index=False):
+            lines.append(f"{row.human_readable_id},{row.source},{row.target},{row.description},{row.rank}")
+        context, tokens = [], 0
+        for line in lines:
+            tokens += len(self.token_encoder.encode(line, disallowed_special=()))
+            if tokens > budget:
+                break
+            context.append(line)
+        return "\n".join(context)
+
+    async def generate_reports(self, pending: list, entity_rows: pd.DataFrame, degree: dict) -> list[dict]:
+        cache = load_cache(create_pipeline_config(self.config).cache, str(self.root_dir))
+        strategy = self.config.community_reports.resolved_strategy(str(self.root_dir))
+        semaphore = asyncio.Semaphore(self.config.llm.concurrent_requests)
+
+        async def generate(community, level, members, internal):
+            async with semaphore:
+                report = await run_community_report(
+                    community, self._context(members, internal, entity_rows, degree), level,
+                    NoopVerbCallbacks(), cache, strategy,
+                )
+            if report is None:
+                print(f"Could not generate a report for community {community}")
+                return None
+            return {**report, "id": str(uuid.uuid4())}
+
+        reports = await asyncio.gather(*(generate(*args) for args in pending))
+        return [report for report in reports if report is not None]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-index only the documents that changed since the last GraphRAG run.")
+    parser.add_argument("--root", default=".", help="GraphRAG root folder (with settings.yaml and output/)")
+    parser.add_argument("--dry-run", action="store_true", help="only report which documents changed")
+    args = parser.parse_args(argv)
+    IncrementalIndexer(args.root).update(dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
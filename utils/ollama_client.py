@@ -0,0 +1,69 @@
+"""Process-wide Ollama clients shared by the query and indexing embedders.
+
+Every caller in a process reuses the same keep-alive connection pool instead of
+opening a new HTTP connection per request. The async client and the semaphore
+are bound to an event loop, so one of each is kept per running loop (Chainlit
+runs a single loop; GraphRAG's threaded async_mode runs one loop per thread).
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+import ollama
+
+EMBEDDING_MODEL = "nomic-embed-text"
+
+MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "16"))
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("OLLAMA_MAX_CONCURRENT_REQUESTS", "8"))
+KEEPALIVE_EXPIRY = 60.0
+
+_lock = threading.Lock()
+_client: ollama.Client | None = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client() -> ollama.Client:
+    """Return the process-wide synchronous client (httpx clients are thread-safe)."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = ollama.Client(limits=_limits())
+        return _client
+
+
+def get_async_client() -> ollama.AsyncClient:
+    """Return the pooled async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = ollama.AsyncClient(limits=_limits())
+            _async_clients[loop] = client
+        return client
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore bounding in-flight Ollama requests on the running loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+            _semaphores[loop] = semaphore
+        return semaphore
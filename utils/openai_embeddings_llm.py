@@ -3,6 +3,12 @@
 
 """The EmbeddingsLLM class."""
 
+import asyncio
+import logging
+import time
+
+import tiktoken
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential_jitter
 from typing_extensions import Unpack
 
 from graphrag.llm.base import BaseLLM
@@ -12,9 +18,21 @@ from graphrag.llm.types import (
     LLMInput,
 )
 
+from utils.embedding import MAX_INPUT_TOKENS, combine_chunk_embeddings, split_long_text
+from utils.embedding_cache import get_embedding_cache
+from utils.ollama_client import EMBEDDING_MODEL, get_async_client
+from utils.tracing import get_tracer
+
 from .openai_configuration import OpenAIConfiguration
 from .types import OpenAIClientTypes
-import ollama
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_BATCH_MAX_TOKENS = 8191
+DEFAULT_CONCURRENT_REQUESTS = 5
+DEFAULT_MAX_RETRIES = 3
+
 
 class OpenAIEmbeddingsLLM(BaseLLM[EmbeddingInput, EmbeddingOutput]):
     """A text-embedding generator LLM."""
@@ -25,16 +43,159 @@ class OpenAIEmbeddingsLLM(BaseLLM[EmbeddingInput, EmbeddingOutput]):
     def __init__(self, client: OpenAIClientTypes, configuration: OpenAIConfiguration):
         self.client = client
         self.configuration = configuration
+        self.batch_size = int(
+            configuration.lookup("batch_size", None) or DEFAULT_BATCH_SIZE
+        )
+        self.batch_max_tokens = int(
+            configuration.lookup("batch_max_tokens", None) or DEFAULT_BATCH_MAX_TOKENS
+        )
+        self.concurrent_requests = int(
+            configuration.lookup("concurrent_requests", None)
+            or DEFAULT_CONCURRENT_REQUESTS
+        )
+        self.max_retries = int(
+            configuration.lookup("max_retries", None) or DEFAULT_MAX_RETRIES
+        )
+        self.token_encoder = tiktoken.get_encoding(
+            configuration.lookup("encoding_model", None) or "cl100k_base"
+        )
+
+    def _make_batches(self, input: list[str]) -> list[list[int]]:
+        """Group input indices into batches bounded by batch_size and batch_max_tokens.
+
+        An input that is larger than batch_max_tokens on its own is sent as a
+        single-item batch.
+        """
+        token_counts = [
+            len(tokens)
+            for tokens in self.token_encoder.encode_batch(input, disallowed_special=())
+        ]
+        batches: list[list[int]] = []
+        current: list[int] = []
+        current_tokens = 0
+        for i, n_tokens in enumerate(token_counts):
+            if current and (
+                len(current) >= self.batch_size
+                or current_tokens + n_tokens > self.batch_max_tokens
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += n_tokens
+        if current:
+            batches.append(current)
+        return batches
 
     async def _execute_llm(
         self, input: EmbeddingInput, **kwargs: Unpack[LLMInput]
     ) -> EmbeddingOutput | None:
-        args = {
-            "model": self.configuration.model,
-            **(kwargs.get("model_parameters") or {}),
-        }
-        embedding_list = []
-        for inp in input:
-            embedding = ollama.embeddings(model="nomic-embed-text", prompt=inp)
-            embedding_list.append(embedding["embedding"])
+        texts = list(input)
+        if not texts:
+            return []
+
+        start = time.perf_counter()
+        cache = get_embedding_cache()
+        if cache is not None:
+            embedding_list = cache.get_many(EMBEDDING_MODEL, texts)
+        else:
+            embedding_list = [None] * len(texts)
+        missing = [i for i, embedding in enumerate(embedding_list) if embedding is None]
+        # Texts over the model context are embedded in chunks and averaged, as
+        # utils/embedding.py does, instead of being truncated by the server.
+        long_texts = {}
+        for i in missing:
+            chunks = split_long_text(texts[i], self.token_encoder, MAX_INPUT_TOKENS)
+            if chunks is not None:
+                long_texts[i] = chunks
+        short_texts = [i for i in missing if i not in long_texts]
+
+        batches = [
+            [short_texts[i] for i in batch]
+            for batch in self._make_batches([texts[i] for i in short_texts])
+        ]
+        semaphore = asyncio.Semaphore(self.concurrent_requests)
+        client = get_async_client()
+
+        async def embed(inputs: list[str]) -> list[list[float]]:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_retries),
+                wait=wait_exponential_jitter(max=10),
+                reraise=True,
+            ):
+                with attempt:
+                    async with semaphore:
+                        response = await client.embed(model=EMBEDDING_MODEL, input=inputs)
+                    return response["embeddings"]
+            return []  # unreachable: AsyncRetrying reraises
+
+        async def embed_batch(batch: list[int]) -> None:
+            batch_texts = [texts[i] for i in batch]
+            try:
+                embeddings = await embed(batch_texts)
+            except Exception as e:
+                if len(batch) > 1:
+                    # Retry the halves, so one bad input does not fail its neighbours.
+                    log.warning(
+                        "Embedding inputs %d-%d failed (%s); retrying in halves",
+                        batch[0], batch[-1], e,
+                    )
+                    half = len(batch) // 2
+                    results = await asyncio.gather(
+                        embed_batch(batch[:half]), embed_batch(batch[half:]), return_exceptions=True
+                    )
+                    for result in results:
+                        if isinstance(result, BaseException):
+                            raise result
+                    return
+                msg = f"Embedding input {batch[0]} of {len(texts)} failed: {e}"
+                raise RuntimeError(msg) from e
+            for i, embedding in zip(batch, embeddings, strict=True):
+                embedding_list[i] = embedding
+            if cache is not None:
+                cache.put_many(EMBEDDING_MODEL, batch_texts, embeddings)
+
+        async def embed_long_text(i: int) -> None:
+            chunks = long_texts[i]
+            try:
+                embeddings = await embed([chunk for chunk, _ in chunks])
+            except Exception as e:
+                msg = f"Embedding input {i} of {len(texts)} ({len(chunks)} chunks) failed: {e}"
+                raise RuntimeError(msg) from e
+            embedding_list[i] = combine_chunk_embeddings(embeddings, [n for _, n in chunks])
+            if cache is not None:
+                cache.put(EMBEDDING_MODEL, texts[i], embedding_list[i])
+
+        with get_tracer().span(
+            "embedding.index",
+            texts=len(texts),
+            cached=len(texts) - len(missing),
+            batches=len(batches) + len(long_texts),
+        ) as span:
+            if span.recording:
+                span.set(tokens=sum(
+                    len(tokens)
+                    for tokens in self.token_encoder.encode_batch(
+                        [texts[i] for i in missing], disallowed_special=()
+                    )
+                ))
+            # Every batch runs to the end, so the ones that succeed are cached
+            # even when another fails; then the first failure is raised.
+            results = await asyncio.gather(
+                *(embed_batch(batch) for batch in batches),
+                *(embed_long_text(i) for i in long_texts),
+                return_exceptions=True,
+            )
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        log.info(
+            "Embedded %d documents (%d cached) in %d batches in %.2fs (%.1f docs/sec)",
+            len(texts),
+            len(texts) - len(missing),
+            len(batches) + len(long_texts),
+            elapsed,
+            len(texts) / elapsed if elapsed > 0 else float("inf"),
+        )
         return embedding_list
@@ -9,18 +9,27 @@ import pypdfium2 # Needs to be at the top to avoid warnings
 import argparse
 import torch.multiprocessing as mp
 from tqdm import tqdm
-import math
-from marker.output import markdown_exists, save_markdown
+from marker.output import get_markdown_filepath, get_subfolder_path, save_markdown
 from marker.pdf.utils import find_filetype
 from marker.pdf.extract_text import get_length_of_text
 from marker.settings import settings
 import traceback
 import json
+import hashlib
+import shutil
+import sys
+from importlib.metadata import version
 import torch
+from utils.conversion_manifest import ConversionManifest, merge_manifests, orphaned_outputs, settings_hash, shard_manifest_path
 
 configure_logging()
 
-def worker_init(shared_model):
+# Rough RAM one CPU worker needs on top of the shared models, in GB
+CPU_RAM_PER_WORKER = 4
+
+def worker_init(shared_model, torch_threads=None):
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
     if shared_model is None:
         shared_model = load_all_models()
 
@@ -31,60 +40,129 @@ def worker_exit():
     global model_refs
     del model_refs
 
-def process_single_pdf(args):
-    filepath, out_folder, metadata, min_length = args
-
-    fname = os.path.basename(filepath)
-    if markdown_exists(out_folder, fname):
-        return
-
+def page_count(filepath):
+    doc = pypdfium2.PdfDocument(filepath)
     try:
-        # Skip trying to convert files that don't have a lot of embedded text
-        # This can indicate that they were scanned, and not OCRed properly
-        # Usually these files are not recent/high-quality
-        if min_length:
-            filetype = find_filetype(filepath)
-            if filetype == "other":
-                return 0
-
-            length = get_length_of_text(filepath)
-            if length < min_length:
-                return
-
-        full_text, images, out_metadata = convert_single_pdf(filepath, model_refs, metadata=metadata, batch_multiplier=2)
-        if len(full_text.strip()) > 0:
-            save_markdown(out_folder, fname, full_text, images, out_metadata)
-        else:
-            print(f"Empty file: {filepath}.  Could not convert.")
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def plan_page_ranges(files, pages_per_shard):
+    """Split files into (filepath, start_page, max_pages, n_pages) tasks, largest first.
+
+    A PDF longer than pages_per_shard is split into page ranges so one big
+    document cannot keep a single worker busy after the others are done.
+    """
+    tasks = []
+    for filepath in files:
+        try:
+            n_pages = page_count(filepath)
+        except Exception as e:
+            print(f"Could not read page count of {filepath}: {e}")
+            continue
+        if n_pages <= pages_per_shard:
+            tasks.append((filepath, None, None, n_pages))
+            continue
+        for start_page in range(0, n_pages, pages_per_shard):
+            max_pages = min(pages_per_shard, n_pages - start_page)
+            tasks.append((filepath, start_page, max_pages, max_pages))
+    return sorted(tasks, key=lambda task: task[3], reverse=True)
+
+
+def process_page_range(args):
+    filepath, start_page, max_pages, metadata = args
+    try:
+        full_text, images, out_metadata = convert_single_pdf(
+            filepath, model_refs, max_pages=max_pages, start_page=start_page,
+            metadata=metadata, batch_multiplier=2,
+        )
+        return filepath, start_page or 0, full_text, images, out_metadata
     except Exception as e:
-        print(f"Error converting {filepath}: {e}")
+        print(f"Error converting {filepath} (from page {start_page or 0}): {e}")
         print(traceback.format_exc())
+        return filepath, start_page or 0, None, {}, {}
+
+
+def stitch_page_ranges(parts):
+    """Join (start_page, full_text, images, metadata) parts of one PDF in page order.
+
+    Image names that repeat across parts are prefixed with the part's first
+    page and the markdown references are rewritten to match.
+    """
+    texts, images, pages = [], {}, 0
+    parts = sorted(parts, key=lambda part: part[0])
+    for start_page, full_text, part_images, part_metadata in parts:
+        for name, image in part_images.items():
+            new_name = name
+            if name in images:
+                new_name = f"p{start_page}_{name}"
+                full_text = full_text.replace(f"]({name})", f"]({new_name})")
+            images[new_name] = image
+        texts.append(full_text.strip())
+        pages += part_metadata.get("pages", 0) or 0
+    metadata = dict(parts[0][3])
+    metadata["pages"] = pages
+    metadata["page_ranges"] = len(parts)
+    return "\n\n".join(texts), images, metadata
+
+
+def copy_output(out_folder, source_fname, fname):
+    """Reuse the converted output of source_fname (same PDF content) for fname."""
+    source_folder = get_subfolder_path(out_folder, source_fname)
+    folder = get_subfolder_path(out_folder, fname)
+    shutil.copytree(source_folder, folder, dirs_exist_ok=True)
+    source_md = os.path.join(folder, os.path.basename(get_markdown_filepath(out_folder, source_fname)))
+    markdown_path = get_markdown_filepath(out_folder, fname)
+    if source_md != markdown_path:
+        os.replace(source_md, markdown_path)
+        source_meta = source_md.rsplit(".", 1)[0] + "_meta.json"
+        if os.path.exists(source_meta):
+            os.replace(source_meta, markdown_path.rsplit(".", 1)[0] + "_meta.json")
+    return markdown_path
+
+
+def shard_of(fname, num_shards):
+    """Deterministic shard for a file name, the same on every machine."""
+    return int(hashlib.sha1(fname.encode("utf-8")).hexdigest()[:8], 16) % num_shards
+
+
+def list_pdfs(in_folder):
+    files = [os.path.join(in_folder, f) for f in sorted(os.listdir(in_folder))]
+    return [f for f in files if os.path.isfile(f)]
+
+
+def available_ram_gb():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024**3
+    except (ValueError, OSError, AttributeError):
+        return None
 
 
-def multiple():
-    chunk_idx = 0 
-    num_chunks = 1
-    max = None
-    workers = 10
-    meta = None
-    min_len = None
-    in_folder = 'input/toray' #os.path.abspath(args.in_folder)
-    out_folder = 'input/markdown' #os.path.abspath(args.out_folder)
-
-    files = [os.path.join(in_folder, f) for f in os.listdir(in_folder)]
-    files = [f for f in files if os.path.isfile(f)]
+def auto_workers(n_tasks):
+    """Worker count from GPU RAM with CUDA, otherwise from free RAM and CPU cores."""
+    if settings.CUDA:
+        return int(min(settings.INFERENCE_RAM // settings.VRAM_PER_TASK, n_tasks))
+    workers = os.cpu_count() or 1
+    ram = available_ram_gb()
+    if ram is not None:
+        workers = min(workers, int(ram // CPU_RAM_PER_WORKER))
+    return max(1, min(workers, n_tasks))
+
+
+def multiple(in_folder='input/toray', out_folder='input/markdown', chunk_idx=0, num_chunks=1,
+             workers=None, max_files=None, meta=None, min_len=None, pages_per_shard=40, on_saved=None):
+    """Convert the PDFs of one shard of in_folder; on_saved(markdown_path) is called
+    in the main process as soon as each document's markdown has been written."""
+    files = list_pdfs(in_folder)
     os.makedirs(out_folder, exist_ok=True)
 
-    # Handle chunks if we're processing in parallel
-    # Ensure we get all files into a chunk
-    chunk_size = math.ceil(len(files) / num_chunks)
-    start_idx = chunk_idx * chunk_size
-    end_idx = start_idx + chunk_size
-    files_to_convert = files[start_idx:end_idx]
+    # Each file belongs to exactly one shard, decided by its name
+    files_to_convert = [f for f in files if shard_of(os.path.basename(f), num_chunks) == chunk_idx]
 
     # Limit files converted if needed
-    if max:
-        files_to_convert = files_to_convert[:max]
+    if max_files:
+        files_to_convert = files_to_convert[:max_files]
 
     metadata = {}
     if meta:
@@ -92,14 +170,63 @@ def multiple():
         with open(metadata_file, "r") as f:
             metadata = json.load(f)
 
-    total_processes = min(len(files_to_convert), workers)
+    # Skip PDFs whose content, converter settings and output are unchanged since the last run
+    manifest_path = shard_manifest_path(out_folder, chunk_idx, num_chunks)
+    manifest = ConversionManifest(manifest_path)
+    if num_chunks > 1 and not os.path.exists(manifest_path):
+        # First sharded run: start from what an earlier merged run recorded
+        merged = ConversionManifest(os.path.join(out_folder, "manifest.json"))
+        shard_fnames = {os.path.basename(f) for f in files_to_convert}
+        manifest.entries = {fname: entry for fname, entry in merged.entries.items() if fname in shard_fnames}
+    converter_settings = settings_hash({
+        "marker": version("marker-pdf"),
+        "batch_multiplier": 2,
+        "pages_per_shard": pages_per_shard,
+        "min_len": min_len,
+        "metadata": metadata,
+    })
+    plan = manifest.plan(files_to_convert, converter_settings, lambda fname: get_markdown_filepath(out_folder, fname))
+    for f, source_fname in plan.copied:
+        manifest.finish(f, converter_settings, copy_output(out_folder, source_fname, os.path.basename(f)), copied_from=source_fname)
+    for f in plan.adopted:
+        manifest.finish(f, converter_settings, get_markdown_filepath(out_folder, os.path.basename(f)))
+    # Mark PDFs that are gone (after copying, so renamed files could reuse their output);
+    # their markdown is left for merge to flag or delete
+    present = {os.path.basename(f) for f in files}
+    for fname in plan.removed:
+        if fname not in present:
+            manifest.remove(fname)
+    files_to_convert = plan.to_convert
+
+    # Skip files without much embedded text (likely scans that were not OCRed),
+    # before planning the page ranges
+    if min_len:
+        too_short = [f for f in files_to_convert if find_filetype(f) == "other" or get_length_of_text(f) < min_len]
+        for f in too_short:
+            manifest.skip(f, converter_settings, "too little embedded text")
+        files_to_convert = [f for f in files_to_convert if f not in too_short]
+
+    # Partial or stale outputs are removed; entries stay in_progress until saved
+    for f in files_to_convert:
+        shutil.rmtree(get_subfolder_path(out_folder, os.path.basename(f)), ignore_errors=True)
+        manifest.start(f, converter_settings)
+    manifest.save()
+
+    tasks = plan_page_ranges(files_to_convert, pages_per_shard)
+    total_pages = sum(task[3] for task in tasks)
+    if not tasks:
+        for f in files_to_convert:
+            manifest.fail(f, converter_settings, "could not read page count")
+        manifest.save()
+        print(manifest.report(plan, files_to_convert))
+        return
 
-    # Dynamically set GPU allocation per task based on GPU ram
-    if settings.CUDA:
-        tasks_per_gpu = settings.INFERENCE_RAM // settings.VRAM_PER_TASK if settings.CUDA else 0
-        total_processes = int(min(tasks_per_gpu, total_processes))
+    # Dynamically set GPU allocation per task based on GPU ram, or CPU workers on free RAM
+    if workers:
+        total_processes = min(len(tasks), workers)
     else:
-        total_processes = int(total_processes)
+        total_processes = auto_workers(len(tasks))
+    torch_threads = None if settings.CUDA else max(1, (os.cpu_count() or 1) // total_processes)
 
     try:
         mp.set_start_method('spawn') # Required for CUDA, forkserver doesn't work
@@ -118,33 +245,145 @@ def multiple():
                 continue
             model.share_memory()
 
-    print(f"Converting {len(files_to_convert)} pdfs in chunk {chunk_idx + 1}/{num_chunks} with {total_processes} processes, and storing in {out_folder}")
-    task_args = [(f, out_folder, metadata.get(os.path.basename(f)), min_len) for f in files_to_convert]
-
-    with mp.Pool(processes=total_processes, initializer=worker_init, initargs=(model_lst,)) as pool:
-        list(tqdm(pool.imap(process_single_pdf, task_args), total=len(task_args), desc="Processing PDFs", unit="pdf"))
+    print(f"Converting {len(files_to_convert)} pdfs ({total_pages} pages in {len(tasks)} page ranges) in shard {chunk_idx}/{num_chunks} with {total_processes} processes, and storing in {out_folder}")
+    task_args = [(f, start_page, max_pages, metadata.get(os.path.basename(f))) for f, start_page, max_pages, _ in tasks]
+    task_pages = {(f, start_page or 0): n_pages for f, start_page, _, n_pages in tasks}
+    remaining = {}
+    for f, *_ in tasks:
+        remaining[f] = remaining.get(f, 0) + 1
+    parts = {f: [] for f in remaining}
+    failed = set()
+    not_converted = [f for f in files_to_convert if f not in remaining]
+    for f in not_converted:
+        manifest.fail(f, converter_settings, "could not read page count")
+
+    # Largest ranges are queued first; chunksize=1 lets each free worker take the next one
+    with mp.Pool(processes=total_processes, initializer=worker_init, initargs=(model_lst, torch_threads)) as pool:
+        with tqdm(total=total_pages, desc="Processing PDFs", unit="page") as progress:
+            for f, start_page, full_text, images, out_metadata in pool.imap_unordered(process_page_range, task_args, chunksize=1):
+                progress.update(task_pages[(f, start_page)])
+                if full_text is None:
+                    failed.add(f)
+                else:
+                    parts[f].append((start_page, full_text, images, out_metadata))
+                remaining[f] -= 1
+                if remaining[f] == 0:
+                    fname = os.path.basename(f)
+                    if f in failed:
+                        print(f"Skipping {f}: some page ranges failed to convert.")
+                        manifest.fail(f, converter_settings, "page range conversion failed")
+                    else:
+                        full_text, images, out_metadata = stitch_page_ranges(parts[f])
+                        if len(full_text.strip()) > 0:
+                            save_markdown(out_folder, fname, full_text, images, out_metadata)
+                            manifest.finish(f, converter_settings, get_markdown_filepath(out_folder, fname),
+                                            pages=out_metadata.get("pages"))
+                            if on_saved is not None:
+                                on_saved(get_markdown_filepath(out_folder, fname))
+                        else:
+                            print(f"Empty file: {f}.  Could not convert.")
+                            failed.add(f)
+                            manifest.fail(f, converter_settings, "empty output")
+                    manifest.save()
+                    del parts[f]
 
         pool._worker_handler.terminate = worker_exit
 
+    manifest.save()
+    print(manifest.report(plan, sorted(failed) + not_converted))
+
     # Delete all CUDA tensors
     del model_lst
 
 
-def single():
+def merge(in_folder, out_folder, num_chunks, delete_orphans=False):
+    """Merge the shard manifests and check that every PDF was converted by one shard
+    and that every output folder belongs to one of them."""
+    pdfs = list_pdfs(in_folder)
+    merged, problems = merge_manifests(out_folder, num_chunks, {os.path.basename(f) for f in pdfs})
+    for f in pdfs:
+        fname = os.path.basename(f)
+        entry = merged.entries.get(fname)
+        if entry is None:
+            problems.append(f"{fname} (shard {shard_of(fname, num_chunks)}) was not processed")
+        elif entry.get("status") not in ("done", "skipped"):
+            problems.append(f"{fname} (shard {shard_of(fname, num_chunks)}) is {entry.get('status')}: {entry.get('reason', '')}")
+    counts = {}
+    for entry in merged.entries.values():
+        counts[entry.get("status")] = counts.get(entry.get("status"), 0) + 1
+    for folder in orphaned_outputs(out_folder, merged):
+        if delete_orphans:
+            shutil.rmtree(folder)
+            print(f"Deleted orphaned output {folder}")
+        else:
+            problems.append(f"{os.path.basename(folder)} is not the output of any PDF (rerun with --delete-orphans to remove it)")
+    print(f"Merged {num_chunks} shard manifests: {counts}")
+    for problem in problems:
+        print(f"  {problem}")
+    return not problems
+
+
+def single(fname='input/pdf/AHA Guidelines for Critic_Until Stage A.pdf', output='input/markdown'):
     # fname = 'input/toray/Toray-Cetex-TC910_PA6_PDS.pdf' #'input/solvay/Composite_Aerospace_Brochure.pdf'
-    fname = 'input/pdf/AHA Guidelines for Critic_Until Stage A.pdf'
     model_lst = load_all_models()
     full_text, images, out_meta = convert_single_pdf(fname, model_lst, max_pages=None, langs=None, batch_multiplier=1, start_page=None)
 
     fname = os.path.basename(fname)
 
-    output = 'input/markdown'
     subfolder_path = save_markdown(output, fname, full_text, images, out_meta)
 
     print(f"Saved markdown to the {subfolder_path} folder")
 
 
+def parse_shard(value):
+    try:
+        idx, total = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if total < 1 or not 0 <= idx < total:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..{total - 1}, got {value!r}")
+    return idx, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert PDFs to markdown with marker.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert a folder of PDFs (optionally one shard of it)")
+    convert.add_argument("in_folder")
+    convert.add_argument("out_folder")
+    convert.add_argument("--shard", type=parse_shard, default=(0, 1), help="convert shard i of N (0-based), e.g. 0/4")
+    convert.add_argument("--workers", type=int, default=None, help="worker processes (default: from GPU or free RAM and CPUs)")
+    convert.add_argument("--max", dest="max_files", type=int, default=None, help="convert at most this many PDFs")
+    convert.add_argument("--metadata", default=None, help="JSON file with per-PDF metadata, keyed by file name")
+    convert.add_argument("--min-length", type=int, default=None, help="skip PDFs with less embedded text than this")
+    convert.add_argument("--pages-per-shard", type=int, default=40, help="split longer PDFs into page ranges of this size")
+
+    merge_parser = commands.add_parser("merge", help="merge shard manifests and check every PDF was converted")
+    merge_parser.add_argument("in_folder")
+    merge_parser.add_argument("out_folder")
+    merge_parser.add_argument("--num-shards", type=int, required=True)
+    merge_parser.add_argument("--delete-orphans", action="store_true",
+                              help="delete output folders that no converted PDF points to")
+
+    single_parser = commands.add_parser("single", help="convert one PDF")
+    single_parser.add_argument("pdf")
+    single_parser.add_argument("out_folder")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        chunk_idx, num_chunks = args.shard
+        multiple(args.in_folder, args.out_folder, chunk_idx, num_chunks, workers=args.workers,
+                 max_files=args.max_files, meta=args.metadata, min_len=args.min_length,
+                 pages_per_shard=args.pages_per_shard)
+    elif args.command == "merge":
+        return 0 if merge(args.in_folder, args.out_folder, args.num_shards, args.delete_orphans) else 1
+    else:
+        single(args.pdf, args.out_folder)
+    return 0
+
+
 if __name__ == "__main__":
-    torch.mps.empty_cache()
-    single()
-    #multiple()
\ No newline at end of file
+    if torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+    sys.exit(main())
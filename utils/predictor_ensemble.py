@@ -0,0 +1,144 @@
+"""Parallel predictor ensemble for the nested-chat pipeline.
+
+The nested chat runs predictor -> critic -> predictor one blocking LLM call
+at a time. PredictorEnsemble fans out N independent predictor runs at once
+(each with its own seed and prompt variant), lets one critic pass compare and
+critique all candidates together, and then makes a final re-prediction that
+consumes the critique. On a LiteLLM backend serving several requests in
+parallel this takes roughly the wall-clock time of the sequential chain.
+
+The ensemble agents cannot call tools. The caller retrieves context for the
+question once per turn (e.g. a GraphRAG search) and passes it to run(), which
+adds it to the prompt of every predictor and of the critic.
+"""
+
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autogen import AssistantAgent
+from autogen.cache.abstract_cache_base import AbstractCache
+from rich import print
+
+PREDICTOR_SYSTEM_MESSAGE = "You are a medical expert specializing in CHF prediction."
+CRITIC_SYSTEM_MESSAGE = "You are an assistant evaluating and providing feedback for CHF predictions."
+
+# Appended to the predictor system message so candidates are not identical.
+PROMPT_VARIANTS = [
+    "",
+    "Reason primarily from the patient's documented risk factors and comorbidities.",
+    "Reason primarily from the most recent clinical findings and test results.",
+    "Reason step by step through the staging criteria in the guidelines.",
+    "Weigh the evidence for and against CHF before committing to a prediction.",
+]
+
+PREDICTION_PROMPT = "Please provide your CHF prediction based on the patient's medical records."
+REFLECTION_PROMPT = (
+    "Evaluate the predictions and provide feedback based on the guidelines provided. "
+    "Compare the candidates, point out where they disagree and which arguments are best supported."
+)
+REPREDICTION_PROMPT = "Re-evaluate the prediction considering the feedback provided."
+
+# Predictor calls of all sessions share one pool; they wait on the LLM server.
+EXECUTOR_WORKERS = 32
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="predictor")
+        return _executor
+
+
+def _content(reply) -> str:
+    if isinstance(reply, dict):
+        return reply.get("content") or ""
+    return reply or ""
+
+
+class PredictorEnsemble:
+    def __init__(
+        self,
+        llm_config: dict,
+        size: int = 3,
+        temperature: float = 0.7,
+        cache: AbstractCache | None = None,
+    ):
+        self.size = size
+        self.predictors = []
+        for i in range(size):
+            config = copy.deepcopy(llm_config)
+            config["seed"] = config.get("seed", 42) + i
+            if i > 0:
+                config["temperature"] = temperature
+            variant = PROMPT_VARIANTS[i % len(PROMPT_VARIANTS)]
+            self.predictors.append(
+                AssistantAgent(
+                    name=f"Predictor_{i + 1}",
+                    system_message=f"{PREDICTOR_SYSTEM_MESSAGE} {variant}".strip(),
+                    llm_config=config,
+                    description="Medical expert predicting CHF within 5 years.",
+                )
+            )
+        self.critic = AssistantAgent(
+            name="Critic",
+            system_message=CRITIC_SYSTEM_MESSAGE,
+            llm_config=copy.deepcopy(llm_config),
+            description="Critic providing feedback for predictions.",
+        )
+        for agent in [*self.predictors, self.critic]:
+            agent.client_cache = cache
+
+    def predict_all(self, context: str) -> list[str]:
+        messages = [{"role": "user", "content": f"{context}\n\n{PREDICTION_PROMPT}"}]
+        replies = get_executor().map(
+            lambda predictor: predictor.generate_reply(messages=messages), self.predictors
+        )
+        return [_content(reply) for reply in replies]
+
+    def critique(self, context: str, predictions: list[str]) -> str:
+        candidates = "\n\n".join(
+            f"### Candidate {i + 1}\n{prediction}" for i, prediction in enumerate(predictions)
+        )
+        messages = [{
+            "role": "user",
+            "content": f"{context}\n\n{candidates}\n\n{REFLECTION_PROMPT}",
+        }]
+        return _content(self.critic.generate_reply(messages=messages))
+
+    def repredict(self, context: str, predictions: list[str], critique: str) -> str:
+        candidates = "\n\n".join(
+            f"### Candidate {i + 1}\n{prediction}" for i, prediction in enumerate(predictions)
+        )
+        messages = [
+            {"role": "user", "content": f"{context}\n\n{PREDICTION_PROMPT}"},
+            {"role": "assistant", "content": candidates},
+            {"role": "user", "content": f"Feedback:\n{critique}\n\n{REPREDICTION_PROMPT}"},
+        ]
+        return _content(self.predictors[0].generate_reply(messages=messages))
+
+    def run(self, context: str, retrieved: str | None = None) -> str:
+        """Predict, critique and re-predict for context (the user's message),
+        grounded in retrieved when given."""
+        if retrieved:
+            context = f"{context}\n\nContext retrieved from the knowledge graph:\n{retrieved}"
+        start = time.perf_counter()
+        predictions = self.predict_all(context)
+        predicted = time.perf_counter()
+        critique = self.critique(context, predictions)
+        critiqued = time.perf_counter()
+        final = self.repredict(context, predictions, critique)
+        print(
+            f"Ensemble of {self.size}: predict {predicted - start:.1f}s, "
+            f"critique {critiqued - predicted:.1f}s, "
+            f"re-predict {time.perf_counter() - critiqued:.1f}s"
+        )
+        return final
+
+    def reset(self) -> None:
+        for agent in [*self.predictors, self.critic]:
+            agent.reset()
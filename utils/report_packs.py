@@ -0,0 +1,215 @@
+"""Precomputed community report packs for global search.
+
+On every query, graphrag's GlobalCommunityContext recomputes the community
+weights from all entities, formats and tokenizes every report of the level,
+and packs them into map-stage batches. None of that depends on the question.
+A ReportPack does it once per community level:
+
+- rows: one formatted report row per community, in graphrag's
+  id|title|occurrence weight|content|rank layout, sorted by rank (the LLM's
+  rating of the report), best first, with its token count;
+- batches: rows packed greedily into map-stage contexts of at most
+  global_search.max_tokens tokens, the limit graphrag's map stage uses.
+
+Packs are saved as <artifacts>/report_packs/level-<n>.json, ahead of time with
+
+    python -m utils.report_packs build --levels 0,1,2
+
+or on first use of a level. PackedGlobalContext replaces the context builder
+of graphrag's GlobalSearch, so the map stage starts without any preparation.
+With top_k (GLOBAL_SEARCH_TOP_K) only the k highest-ranked reports are
+packed. That means fewer batches and fewer map-stage LLM calls, at the cost of
+leaving out low-rated communities.
+"""
+
+import argparse
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import tiktoken
+from graphrag.model import CommunityReport, Entity
+from graphrag.query.context_builder.builders import GlobalContextBuilder
+
+from utils.embedding_store import write_atomic
+
+PACK_DIR = "report_packs"
+PACK_VERSION = 1
+# The tables a pack is built from: reports, the nodes that place them at a
+# level, and the entities behind the occurrence weights.
+SOURCES = (
+    "create_final_community_reports.parquet",
+    "create_final_nodes.parquet",
+    "create_final_entities.parquet",
+)
+CONTEXT_NAME = "Reports"
+COLUMN_DELIMITER = "|"
+HEADER = ["id", "title", "occurrence weight", "content", "rank"]
+
+
+def community_weights(reports: list[CommunityReport], entities: list[Entity]) -> dict[str, float]:
+    """graphrag's occurrence weight: distinct text units mentioning the community's
+    entities, normalized by the largest community."""
+    text_units: dict[str, set] = {report.community_id: set() for report in reports}
+    for entity in entities:
+        for community_id in entity.community_ids or []:
+            if community_id in text_units:
+                text_units[community_id].update(entity.text_unit_ids or [])
+    largest = max((len(units) for units in text_units.values()), default=0) or 1
+    return {community_id: len(units) / largest for community_id, units in text_units.items()}
+
+
+@dataclass
+class ReportPack:
+    level: int
+    max_tokens: int
+    header_tokens: int
+    rows: list[dict] = field(default_factory=list)      # id, title, rank, text, tokens; best rank first
+    batches: list[list[int]] = field(default_factory=list)  # row numbers per map-stage context
+    key: list = field(default_factory=list)
+
+    @classmethod
+    def build(cls, level: int, reports: list[CommunityReport], entities: list[Entity],
+              max_tokens: int, token_encoder: tiktoken.Encoding, key: list | None = None) -> "ReportPack":
+        weights = community_weights(reports, entities)
+        rows = []
+        for report in sorted(reports, key=lambda report: report.rank or 0, reverse=True):
+            text = COLUMN_DELIMITER.join([
+                report.short_id or "", report.title, str(weights.get(report.community_id, 0.0)),
+                report.full_content, str(report.rank),
+            ])
+            rows.append({
+                "id": report.id, "title": report.title, "rank": report.rank,
+                "text": text, "tokens": len(token_encoder.encode(text + "\n", disallowed_special=())),
+            })
+        header_tokens = len(token_encoder.encode(cls.header(), disallowed_special=()))
+        pack = cls(level, max_tokens, header_tokens, rows, key=key or [])
+        pack.batches = pack.pack(range(len(rows)))
+        return pack
+
+    @staticmethod
+    def header() -> str:
+        return f"-----{CONTEXT_NAME}-----\n" + COLUMN_DELIMITER.join(HEADER) + "\n"
+
+    def pack(self, row_numbers) -> list[list[int]]:
+        """Greedily fill batches with rows, in order, using the stored token counts."""
+        batches, batch, tokens = [], [], self.header_tokens
+        for i in row_numbers:
+            if batch and tokens + self.rows[i]["tokens"] > self.max_tokens:
+                batches.append(batch)
+                batch, tokens = [], self.header_tokens
+            batch.append(i)
+            tokens += self.rows[i]["tokens"]
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def batches_for(self, top_k: int | None = None) -> list[list[int]]:
+        if not top_k or top_k >= len(self.rows):
+            return self.batches
+        return self.pack(range(top_k))
+
+    def context(self, batch: list[int]) -> str:
+        return self.header() + "\n".join(self.rows[i]["text"] for i in batch)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"version": PACK_VERSION, **asdict(self)})
+        write_atomic(path, lambda tmp: Path(tmp).write_text(data))
+
+    @classmethod
+    def load(cls, path: Path) -> "ReportPack | None":
+        data = json.loads(path.read_text())
+        if data.pop("version", None) != PACK_VERSION:
+            return None
+        return cls(**data)
+
+
+class PackedGlobalContext(GlobalContextBuilder):
+    """GlobalContextBuilder that serves a ReportPack's precomputed batches."""
+
+    def __init__(self, pack: ReportPack, top_k: int | None = None):
+        self.pack = pack
+        self.top_k = top_k
+
+    def build_context(self, conversation_history=None, **kwargs) -> tuple[list[str], dict[str, pd.DataFrame]]:
+        batches = self.pack.batches_for(self.top_k)
+        used = [self.pack.rows[i] for batch in batches for i in batch]
+        records = pd.DataFrame(
+            [{"id": row["id"], "title": row["title"], "rank": row["rank"]} for row in used]
+        )
+        return [self.pack.context(batch) for batch in batches], {CONTEXT_NAME.lower(): records}
+
+
+def pack_key(artifacts: Path, level: int, max_tokens: int, encoding_model: str) -> list:
+    """Identifies the settings and tables a pack was built from; a mismatch means rebuild."""
+    sources = []
+    for name in SOURCES:
+        stat = (artifacts / name).stat()
+        sources.append([name, stat.st_size, stat.st_mtime])
+    return [
+        ["community_level", level], ["max_tokens", max_tokens], ["encoding_model", encoding_model],
+        *sources,
+    ]
+
+
+def load_or_build(artifacts: Path, level: int, reports: list[CommunityReport], entities: list[Entity],
+                  max_tokens: int, encoding_model: str) -> ReportPack:
+    """Load <artifacts>/report_packs/level-<level>.json, building and saving it when missing or stale."""
+    path = artifacts / PACK_DIR / f"level-{level}.json"
+    key = pack_key(artifacts, level, max_tokens, encoding_model)
+    if path.exists():
+        pack = ReportPack.load(path)
+        if pack is not None and pack.key == key:
+            return pack
+    pack = ReportPack.build(level, reports, entities, max_tokens, tiktoken.get_encoding(encoding_model), key)
+    try:
+        pack.save(path)
+    except OSError as e:
+        print(f"Could not save the report pack to {path}: {e}")
+    return pack
+
+
+def top_k_from_env() -> int | None:
+    return int(os.environ.get("GLOBAL_SEARCH_TOP_K", "0")) or None
+
+
+def main(argv=None):
+    from graphrag.query.cli import _read_config_parameters
+    from graphrag.query.indexer_adapters import read_indexer_entities, read_indexer_reports
+
+    from utils.artifacts import latest_artifacts_dir
+
+    parser = argparse.ArgumentParser(description="Precompute global search report packs for community levels.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build")
+    build.add_argument("artifacts", nargs="?", type=Path, help="artifacts folder (default: latest under ./output)")
+    build.add_argument("--root", default=".", help="GraphRAG root folder (with settings.yaml)")
+    build.add_argument("--levels", default="0,1,2")
+    args = parser.parse_args(argv)
+
+    config = _read_config_parameters(args.root)
+    artifacts = args.artifacts or latest_artifacts_dir(args.root)
+    nodes = pd.read_parquet(artifacts / "create_final_nodes.parquet")
+    # Weights only need each entity's communities and text units; skip the embeddings.
+    entities_path = artifacts / "create_final_entities.parquet"
+    entities = pd.read_parquet(entities_path, columns=[
+        name for name in pq.read_schema(entities_path).names if name != "description_embedding"
+    ])
+    entities["description_embedding"] = None
+    reports = pd.read_parquet(artifacts / "create_final_community_reports.parquet")
+    for level in (int(level) for level in args.levels.split(",")):
+        pack = load_or_build(
+            artifacts, level,
+            read_indexer_reports(reports, nodes, level), read_indexer_entities(nodes, entities, level),
+            config.global_search.max_tokens, config.encoding_model,
+        )
+        print(f"level {level}: {len(pack.rows)} reports in {len(pack.batches)} map batches "
+              f"({sum(row['tokens'] for row in pack.rows)} tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Worker pool that keeps GraphRAG retrieval off the Chainlit event loop.
+
+Local and global search are synchronous (global search runs a long map-reduce
+over LLM calls), so they run on a dedicated thread pool. The pool size bounds
+how many searches run at once, every call has a timeout, and all calls made on
+behalf of a session can be cancelled when that session ends.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+
+class RetrievalExecutor:
+    def __init__(self, max_workers: int = 4, timeout: float = 300.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="graphrag-retrieval"
+        )
+        self._lock = threading.Lock()
+        self._sessions: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Future, Future]]] = {}
+
+    async def run(
+        self,
+        session_id: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout: float | None = None,
+    ) -> Any:
+        """Run fn(*args) on the pool and await it from the calling event loop.
+
+        Raises asyncio.TimeoutError after `timeout` seconds and CancelledError
+        if the session is cancelled while waiting.
+        """
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context (e.g. the current trace span) to the worker.
+        future = self._pool.submit(contextvars.copy_context().run, fn, *args)
+        waiter = asyncio.wrap_future(future, loop=loop)
+        task = (loop, waiter, future)
+        with self._lock:
+            self._sessions.setdefault(session_id, set()).add(task)
+        try:
+            return await asyncio.wait_for(waiter, timeout or self.timeout)
+        finally:
+            future.cancel()
+            with self._lock:
+                tasks = self._sessions.get(session_id)
+                if tasks is not None:
+                    tasks.discard(task)
+                    if not tasks:
+                        del self._sessions[session_id]
+
+    def cancel_session(self, session_id: str) -> int:
+        """Cancel every pending or awaited retrieval of a session; returns how many."""
+        with self._lock:
+            tasks = self._sessions.pop(session_id, set())
+        for loop, waiter, future in tasks:
+            # Queued searches never start; running ones finish in the
+            # background but nobody waits on them any more.
+            future.cancel()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(waiter.cancel)
+        return len(tasks)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(len(tasks) for tasks in self._sessions.values())
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def retrieval_executor_from_env() -> RetrievalExecutor:
+    """Build the executor from GRAPHRAG_RETRIEVAL_WORKERS / GRAPHRAG_RETRIEVAL_TIMEOUT."""
+    return RetrievalExecutor(
+        max_workers=int(os.environ.get("GRAPHRAG_RETRIEVAL_WORKERS", "4")),
+        timeout=float(os.environ.get("GRAPHRAG_RETRIEVAL_TIMEOUT", "300")),
+    )
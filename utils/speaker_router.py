@@ -0,0 +1,128 @@
+"""Declarative, zero-LLM speaker selection for AutoGen group chats.
+
+A TransitionRouter is passed to GroupChat as speaker_selection_method. It
+looks up (previous speaker, last speaker) in a transition table and returns
+the next agent, so choosing a speaker never costs an LLM round trip. ANY
+matches every previous speaker. A transition to END, or a pair missing from
+the table, ends the chat explicitly instead of returning None and leaving
+the choice to AutoGen.
+
+LLMCallCounter counts the completions (agent replies) made while a
+conversation runs, and the speaker choices the router made without one.
+"""
+
+import contextlib
+import contextvars
+import functools
+import threading
+from dataclasses import dataclass
+
+from autogen import Agent, GroupChat, OpenAIWrapper
+from autogen.exception_utils import NoEligibleSpeaker
+
+from utils.tracing import get_tracer
+
+ANY = "*"
+END = "__end__"
+
+
+class TransitionRouter:
+    def __init__(self, transitions: dict[tuple[str, str], str]):
+        self.transitions = dict(transitions)
+        self.state: str | None = None
+        self.decisions = 0
+
+    def __call__(self, last_speaker: Agent, groupchat: GroupChat) -> Agent:
+        name = last_speaker.name
+        with get_tracer().span("speaker.route", last_speaker=name) as span:
+            next_name = self.transitions.get(
+                (self.state, name), self.transitions.get((ANY, name), END)
+            )
+            span.set(next_speaker=next_name)
+            self.state = name
+            self.decisions += 1
+            counter = current_counter()
+            if counter is not None:
+                counter.routing_decisions += 1
+        if next_name == END:
+            msg = f"Conversation ended after {name}"
+            raise NoEligibleSpeaker(msg)
+        return groupchat.agent_by_name(next_name)
+
+    def validate(self, agents: list[Agent]) -> None:
+        """Raise ValueError if the table names an agent that is not in the chat."""
+        names = {agent.name for agent in agents}
+        unknown = {
+            name
+            for (previous, last), next_name in self.transitions.items()
+            for name in (previous, last, next_name)
+            if name not in names and name not in (ANY, END, None)
+        }
+        if unknown:
+            msg = f"Transition table refers to unknown agents: {sorted(unknown)}"
+            raise ValueError(msg)
+
+    def reset(self) -> None:
+        self.state = None
+
+
+@dataclass
+class LLMCallCounter:
+    content: int = 0
+    routing_decisions: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, kind: str) -> None:
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def as_dict(self) -> dict:
+        return {
+            "content_llm_calls": self.content,
+            "routing_decisions": self.routing_decisions,
+        }
+
+
+_current_counter: contextvars.ContextVar[LLMCallCounter | None] = contextvars.ContextVar(
+    "llm_call_counter", default=None
+)
+
+
+def current_counter() -> LLMCallCounter | None:
+    return _current_counter.get()
+
+
+@contextlib.contextmanager
+def counting(counter: LLMCallCounter):
+    """Make counter the active counter for the current context."""
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def count_calls(client: OpenAIWrapper, kind: str) -> OpenAIWrapper:
+    """Make every client.create() count as a `kind` call on the active counter
+    and trace it as an llm.completion span."""
+    create = client.create
+    tracer = get_tracer()
+
+    @functools.wraps(create)
+    def counted_create(**config):
+        counter = current_counter()
+        if counter is not None:
+            counter.add(kind)
+        with tracer.span("llm.completion", kind=kind) as span:
+            response = create(**config)
+            if span.recording and (usage := getattr(response, "usage", None)) is not None:
+                span.set(
+                    prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                    completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                )
+            return response
+
+    client.create = counted_create
+    return client
@@ -0,0 +1,194 @@
+"""Pipelined PDF -> markdown -> GraphRAG indexing.
+
+Converting the corpus with marker and indexing it with GraphRAG used to run
+one after the other. This module overlaps them with two stages connected by a
+bounded asyncio queue:
+
+1. convert: pdf_to_markdown.multiple() runs in a thread and hands every
+   markdown file to the next stage as soon as it is saved.
+2. extract: the document is chunked with the settings.yaml chunking strategy,
+   and entities are extracted from each chunk with graphrag's own
+   graph-intelligence strategy, LLM loader and pipeline cache.
+
+A full queue blocks the converter, so a slow extract stage holds it back
+instead of buffering the whole corpus. GraphRAG's index pipeline works on the
+whole dataset, so a final `graphrag.index` run (--index) still builds the
+graph, summarizes and embeds the entity descriptions and builds the
+communities. It finds every extraction LLM call in graphrag's cache, so the
+total time is about the slower stage plus that final run.
+
+Embeddings are not warmed here: with `embeddings.target: required` graphrag
+only embeds the summarized entity descriptions, which exist only after the
+whole dataset has been extracted.
+
+    python -m utils.streaming_index input/pdf input/markdown --root . --index
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from datashaper import NoopVerbCallbacks
+from graphrag.index.cache import load_cache
+from graphrag.index.create_pipeline_config import create_pipeline_config
+from graphrag.index.verbs.entities.extraction.strategies.graph_intelligence.run_graph_intelligence import (
+    run_gi,
+)
+from graphrag.index.verbs.entities.extraction.strategies.typing import Document
+from graphrag.index.verbs.text.chunk.strategies.tokens import run as run_token_chunks
+from graphrag.query.cli import _read_config_parameters
+from rich import print
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    seconds: float = 0.0
+    extra: dict = field(default_factory=dict)
+
+
+class StreamingIndexer:
+    def __init__(
+        self,
+        root_dir: str = ".",
+        markdown_queue_size: int = 4,
+        extract_workers: int = 2,
+    ):
+        self.root_dir = str(Path(root_dir).resolve())
+        self.config = _read_config_parameters(self.root_dir)
+        self.pipeline_cache = load_cache(create_pipeline_config(self.config).cache, self.root_dir)
+        self.chunk_strategy = self.config.chunks.resolved_strategy()
+        self.extract_strategy = self.config.entity_extraction.resolved_strategy(
+            self.root_dir, self.config.encoding_model
+        )
+        self.entity_types = self.config.entity_extraction.entity_types
+        self.markdown_queue_size = markdown_queue_size
+        self.extract_workers = extract_workers
+        self.stats = {name: StageStats() for name in ("convert", "extract")}
+        self.failed: list[tuple[str, str]] = []
+
+    def chunk(self, text: str) -> list[str]:
+        chunks = run_token_chunks([text], self.chunk_strategy, lambda *args, **kwargs: None)
+        return [chunk.text_chunk for chunk in chunks]
+
+    async def extract(self, chunk_id: str, text: str) -> int:
+        result = await run_gi(
+            [Document(text=text, id=chunk_id)],
+            self.entity_types,
+            NoopVerbCallbacks(),
+            self.pipeline_cache,
+            self.extract_strategy,
+        )
+        return len(result.entities)
+
+    async def _extract_document(self, markdown_path: str) -> None:
+        stats = self.stats["extract"]
+        start = time.perf_counter()
+        text = Path(markdown_path).read_text(encoding="utf-8")
+        chunks = self.chunk(text)
+        entities = await asyncio.gather(*(
+            self.extract(f"{markdown_path}:{i}", chunk) for i, chunk in enumerate(chunks)
+        ))
+        stats.items += 1
+        stats.seconds += time.perf_counter() - start
+        stats.extra["chunks"] = stats.extra.get("chunks", 0) + len(chunks)
+        stats.extra["entities"] = stats.extra.get("entities", 0) + sum(entities)
+        print(f"[extract] {os.path.basename(markdown_path)}: {len(chunks)} chunks, {sum(entities)} entities")
+
+    async def _extract_stage(self, markdown_queue: asyncio.Queue) -> None:
+        try:
+            while (markdown_path := await markdown_queue.get()) is not _DONE:
+                try:
+                    await self._extract_document(markdown_path)
+                except Exception as e:
+                    # e.g. the folder was removed because the PDF is being reconverted.
+                    self.failed.append((markdown_path, repr(e)))
+                    print(f"[extract] {os.path.basename(markdown_path)} failed: {e!r}")
+        finally:
+            # Let the other extract workers stop too.
+            await markdown_queue.put(_DONE)
+
+    async def run(self, convert, existing: list[str]) -> None:
+        """Run the stages; convert(on_saved) converts PDFs and calls on_saved(markdown_path)."""
+        loop = asyncio.get_running_loop()
+        markdown_queue: asyncio.Queue = asyncio.Queue(self.markdown_queue_size)
+
+        def on_saved(markdown_path: str) -> None:
+            # Blocks the converter while the extract stage is behind.
+            asyncio.run_coroutine_threadsafe(markdown_queue.put(markdown_path), loop).result()
+            self.stats["convert"].items += 1
+
+        async def convert_stage() -> None:
+            start = time.perf_counter()
+            converting = asyncio.create_task(asyncio.to_thread(convert, on_saved))
+            # Markdown from earlier runs is fed in while the converter warms up.
+            for markdown_path in existing:
+                await markdown_queue.put(markdown_path)
+            await converting
+            self.stats["convert"].seconds = time.perf_counter() - start
+            await markdown_queue.put(_DONE)
+
+        extractors = [
+            asyncio.create_task(self._extract_stage(markdown_queue))
+            for _ in range(self.extract_workers)
+        ]
+        await convert_stage()
+        await asyncio.gather(*extractors)
+
+    def summary(self) -> dict:
+        return {
+            **{name: {"items": stats.items, "seconds": round(stats.seconds, 1), **stats.extra}
+               for name, stats in self.stats.items()},
+            "failed": len(self.failed),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert PDFs and feed them into GraphRAG indexing as they finish.")
+    parser.add_argument("in_folder")
+    parser.add_argument("out_folder")
+    parser.add_argument("--root", default=".", help="GraphRAG root folder (with settings.yaml)")
+    parser.add_argument("--workers", type=int, default=None, help="marker worker processes")
+    parser.add_argument("--extract-workers", type=int, default=2, help="documents extracted concurrently")
+    parser.add_argument("--markdown-queue", type=int, default=4, help="converted documents waiting for extraction")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="do not feed markdown converted by earlier runs into the pipeline")
+    parser.add_argument("--index", action="store_true", help="run graphrag.index once the stages are done")
+    args = parser.parse_args(argv)
+
+    # Imported here so the marker models are only loaded by the converting process.
+    from utils.pdf_to_markdown import multiple
+
+    existing = [] if args.skip_existing else sorted(
+        str(path) for path in Path(args.out_folder).glob("*/*.md")
+    )
+
+    def convert(on_saved):
+        multiple(args.in_folder, args.out_folder, workers=args.workers, on_saved=on_saved)
+
+    indexer = StreamingIndexer(
+        args.root,
+        markdown_queue_size=args.markdown_queue,
+        extract_workers=args.extract_workers,
+    )
+    start = time.perf_counter()
+    asyncio.run(indexer.run(convert, existing))
+    print(f"Stages finished in {time.perf_counter() - start:.1f}s: {indexer.summary()}")
+
+    if args.index:
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-m", "graphrag.index", "--root", args.root])
+        print(f"graphrag.index finished in {time.perf_counter() - start:.1f}s")
+        return result.returncode
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Lightweight nested span tracing for conversations, searches and embeddings.
+
+Spans nest through a contextvar, so a span opened inside another span (in the
+same task, or in a thread started through AgentSet.bind or the retrieval
+executor) becomes its child. Finished spans are appended as JSON lines to
+TRACE_FILE, using the field names of OTLP's JSON encoding (traceId, spanId,
+parentSpanId, startTimeUnixNano, ...), and are also collected on the root
+span so the app can show a timing breakdown.
+
+Tracing is off unless TRACE_FILE or TRACE_CHAINLIT_STEPS is set. When it is
+off, span() returns a shared no-op context manager and nothing is recorded.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any
+
+
+class Span:
+    recording = True
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.root: Span = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes)
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        # Only the root keeps the finished spans of its trace.
+        self.finished: list[Span] = []
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+    def to_otlp(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent is not None else "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": "STATUS_CODE_OK" if self.status == "OK" else "STATUS_CODE_ERROR",
+                       "message": "" if self.status == "OK" else self.status},
+        }
+
+
+class _NoopSpan:
+    recording = False
+    finished: list[Span] = []
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_NOOP_CONTEXT = contextlib.nullcontext(NOOP_SPAN)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "trace_span", default=None
+)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+class Tracer:
+    def __init__(self, path: str | None = None, chainlit_steps: bool = False):
+        self.path = path
+        self.chainlit_steps = chainlit_steps
+        self.enabled = path is not None or chainlit_steps
+        self._lock = threading.Lock()
+        self._file = None
+
+    def span(self, name: str, **attributes: Any):
+        """Context manager for a child of the current span (or a new trace)."""
+        if not self.enabled:
+            return _NOOP_CONTEXT
+        return self._span(name, attributes)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, attributes: dict[str, Any]):
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            span.root.finished.append(span)
+            self._write(span)
+
+    def _write(self, span: Span) -> None:
+        if self.path is None:
+            return
+        line = json.dumps(span.to_otlp())
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def traced(self, name: str | None = None):
+        """Decorator running a sync or async function inside a span."""
+
+        def decorate(fn):
+            span_name = name or fn.__qualname__
+            if inspect.iscoroutinefunction(fn):
+
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await fn(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+
+def breakdown(root: Span) -> str:
+    """Markdown timing tree of a finished trace."""
+    spans = sorted(root.finished, key=lambda span: span.start_ns)
+    lines = ["| Span | Seconds | Details |", "|---|---|---|"]
+    for span in spans:
+        details = ", ".join(f"{key}={value}" for key, value in span.attributes.items())
+        lines.append(f"| {'&nbsp;&nbsp;' * span.depth}{span.name} | {span.duration:.3f} | {details} |")
+    return "\n".join(lines)
+
+
+_tracer_lock = threading.Lock()
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer configured from TRACE_FILE / TRACE_CHAINLIT_STEPS."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(
+                path=os.environ.get("TRACE_FILE") or None,
+                chainlit_steps=os.environ.get("TRACE_CHAINLIT_STEPS", "").lower() in ("1", "true", "yes"),
+            )
+        return _tracer
@@ -0,0 +1,294 @@
+"""Vector index over the entity description embeddings.
+
+Local search maps a question to entities by similarity between the question
+embedding and every entity's description embedding. The default graphrag path
+copies all entities into LanceDB for every community level and scans them from
+there. VectorIndex keeps the embeddings as one contiguous, L2-normalized
+matrix in a memory-mapped EmbeddingStore (float32, or float16/int8 with float32
+rescoring, see utils/embedding_store.py):
+
+- exact: one matrix-vector product plus argpartition for the top k.
+- ivf:   the rows are clustered with k-means into ~sqrt(n) inverted lists. A
+         query scores the centroids first and then only the rows of the
+         `nprobe` nearest lists. A higher nprobe gives better recall at a higher
+         latency; nprobe == nlist is the exact scan.
+
+The index is built from create_final_entities.parquet after indexing and saved
+in <artifacts>/vector_index/. IndexSnapshot loads it with the other artifacts
+and builds it on the fly when it is missing.
+
+    python -m utils.vector_index build            # latest artifacts
+    python -m utils.vector_index build output/20241126-173731/artifacts --nlist 256
+
+VECTOR_INDEX selects the mode used by search: "exact" (default), "ivf", or
+"lancedb" for graphrag's own vector store. VECTOR_INDEX_NPROBE sets nprobe,
+VECTOR_INDEX_DTYPE the precision of indexes built on the fly.
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from graphrag.model.types import TextEmbedder
+from graphrag.vector_stores.base import (
+    BaseVectorStore,
+    VectorStoreDocument,
+    VectorStoreSearchResult,
+)
+
+from utils.embedding_store import DTYPES, EmbeddingStore, write_atomic
+
+INDEX_DIR = "vector_index"
+STORE_NAME = "description_embedding"
+RESCORE_FACTOR = 4
+DEFAULT_MODE = "exact"
+DEFAULT_NPROBE = 8
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 42) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means on normalized rows; returns (centroids, assignment)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(nlist):
+            members = vectors[assignment == i]
+            # Re-seed empty lists with a random row.
+            centroids[i] = members.sum(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+        centroids = _normalize(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class VectorIndex:
+    """Normalized embeddings with exact and IVF top-k search (cosine similarity)."""
+
+    def __init__(self, ids: list[str], store: EmbeddingStore, centroids: np.ndarray | None = None,
+                 order: np.ndarray | None = None, offsets: np.ndarray | None = None):
+        self.ids = ids
+        self.store = store
+        self.centroids = centroids
+        self.order = order      # row numbers grouped by inverted list
+        self.offsets = offsets  # list i is order[offsets[i]:offsets[i + 1]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    @classmethod
+    def build(cls, ids: list[str], embeddings, nlist: int | None = None, dtype: str = "float32",
+              keep_float32: bool = True) -> "VectorIndex":
+        vectors = _normalize(np.asarray(np.stack(embeddings), dtype=np.float32)) if len(ids) else np.zeros((0, 0), np.float32)
+        store = EmbeddingStore.quantize(vectors, dtype, keep_float32)
+        nlist = nlist if nlist is not None else int(np.sqrt(len(ids)))
+        if nlist < 2 or len(ids) < 2 * nlist:
+            return cls(ids, store)
+        centroids, assignment = kmeans(vectors, nlist)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        return cls(ids, store, centroids, order, offsets)
+
+    @classmethod
+    def from_entities(cls, entities: pd.DataFrame, nlist: int | None = None, dtype: str | None = None,
+                      keep_float32: bool = True) -> "VectorIndex":
+        entities = entities[entities["description_embedding"].notna()]
+        dtype = dtype or os.environ.get("VECTOR_INDEX_DTYPE", "float32")
+        return cls.build(list(entities["id"]), list(entities["description_embedding"]), nlist, dtype, keep_float32)
+
+    def save(self, folder: Path) -> None:
+        """Write the index; every file is renamed into place, ids.json last, and
+        exists() is False until it is."""
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / "ids.json").unlink(missing_ok=True)
+        if self.centroids is not None:
+            write_atomic(folder / "ivf.npz", self._write_ivf)
+        else:
+            # An exact-only index must not pick up the lists of an earlier build.
+            (folder / "ivf.npz").unlink(missing_ok=True)
+        self.store.write(folder, STORE_NAME)
+        ids = json.dumps(self.ids)
+        write_atomic(folder / "ids.json", lambda path: Path(path).write_text(ids))
+
+    def _write_ivf(self, path: Path) -> None:
+        # A file object, because np.savez appends .npz to a path that lacks it.
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @staticmethod
+    def exists(folder: Path) -> bool:
+        return (folder / "ids.json").exists() and EmbeddingStore.exists(folder, STORE_NAME)
+
+    @classmethod
+    def load(cls, folder: Path) -> "VectorIndex":
+        """Open a saved index; the embeddings are memory-mapped, not read."""
+        ids = json.loads((folder / "ids.json").read_text())
+        store = EmbeddingStore.open(folder, STORE_NAME)
+        if (folder / "ivf.npz").exists():
+            with np.load(folder / "ivf.npz") as ivf:
+                return cls(ids, store, ivf["centroids"], ivf["order"], ivf["offsets"])
+        return cls(ids, store)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray | None:
+        """Rows in the nprobe inverted lists nearest to query, or None to scan everything."""
+        if self.centroids is None or nprobe >= self.nlist:
+            return None
+        lists = _top_k(self.centroids @ query, nprobe)
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def search(self, query, k: int = 10, mode: str = "exact", nprobe: int = DEFAULT_NPROBE,
+               mask: np.ndarray | None = None) -> list[tuple[int, float]]:
+        """(row, cosine similarity) of the k nearest rows; mask limits the eligible rows.
+
+        With a quantized store, the RESCORE_FACTOR * k best quantized scores are
+        rescored in float32.
+        """
+        if not len(self):
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        rows = self.candidates(query, nprobe) if mode == "ivf" else None
+        if rows is None:
+            rows = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+            scores = self.store.scores(query) if mask is None else self.store.scores(query, rows)
+        else:
+            if mask is not None:
+                rows = rows[mask[rows]]
+            scores = self.store.scores(query, rows)
+        if not len(rows):
+            return []
+        if not self.store.quantized:
+            top = _top_k(scores, k)
+            return [(int(rows[i]), float(scores[i])) for i in top]
+        pool = rows[_top_k(scores, k * RESCORE_FACTOR)]
+        exact = self.store.exact_scores(query, pool)
+        top = _top_k(exact, k)
+        return [(int(pool[i]), float(exact[i])) for i in top]
+
+
+def load_or_build(artifacts: Path) -> VectorIndex:
+    """Load <artifacts>/vector_index, building and saving it first when it is missing."""
+    folder = artifacts / INDEX_DIR
+    if VectorIndex.exists(folder):
+        return VectorIndex.load(folder)
+    entities = pd.read_parquet(artifacts / "create_final_entities.parquet", columns=["id", "description_embedding"])
+    index = VectorIndex.from_entities(entities)
+    try:
+        index.save(folder)
+        return VectorIndex.load(folder)
+    except OSError as e:
+        print(f"Could not save the vector index to {folder}: {e}")
+    return index
+
+
+class VectorIndexStore(BaseVectorStore):
+    """graphrag vector store backed by a VectorIndex, for the local search context builder.
+
+    Documents carry only the entity id; the local search context looks entities
+    up by id (EntityVectorStoreKey.ID), so text and vectors are not needed.
+    load_documents rebuilds the index in memory only; the saved index is
+    written by VectorIndex.save.
+    """
+
+    def __init__(self, index: VectorIndex, mode: str = DEFAULT_MODE, nprobe: int = DEFAULT_NPROBE,
+                 collection_name: str = "description_embedding", **kwargs):
+        super().__init__(collection_name=collection_name, **kwargs)
+        self.index = index
+        self.mode = mode
+        self.nprobe = nprobe
+        self.row_of = {entity_id: row for row, entity_id in enumerate(index.ids)}
+        self._mask = None
+
+    def connect(self, **kwargs) -> None:
+        pass
+
+    def load_documents(self, documents: list[VectorStoreDocument], overwrite: bool = True) -> None:
+        """Rebuild the index from documents, replacing the current rows or, without
+        overwrite, adding to them. Keeps the precision and IVF setting of the index."""
+        documents = [document for document in documents if document.vector is not None]
+        ids = [str(document.id) for document in documents]
+        vectors = [np.asarray(document.vector, dtype=np.float32) for document in documents]
+        store = self.index.store
+        if not overwrite and len(self.index):
+            current = store.full if store.full is not None else store.decode(slice(0, len(store)))
+            ids = list(self.index.ids) + ids
+            vectors = list(np.asarray(current, dtype=np.float32)) + vectors
+        self.index = VectorIndex.build(
+            ids, vectors, nlist=None if self.index.nlist else 0, dtype=store.dtype,
+            keep_float32=store.full is not None or not store.quantized,
+        )
+        self.row_of = {entity_id: row for row, entity_id in enumerate(self.index.ids)}
+        self._mask = None
+
+    def filter_by_id(self, include_ids: list[str] | list[int]):
+        if include_ids:
+            self._mask = np.zeros(len(self.index), dtype=bool)
+            self._mask[[self.row_of[i] for i in include_ids if i in self.row_of]] = True
+        else:
+            self._mask = None
+        self.query_filter = include_ids or None
+        return self.query_filter
+
+    def similarity_search_by_vector(self, query_embedding: list[float], k: int = 10, **kwargs) -> list[VectorStoreSearchResult]:
+        return [
+            VectorStoreSearchResult(
+                document=VectorStoreDocument(id=self.index.ids[row], text=None, vector=None),
+                score=score,
+            )
+            for row, score in self.index.search(query_embedding, k, self.mode, self.nprobe, self._mask)
+        ]
+
+    def similarity_search_by_text(self, text: str, text_embedder: TextEmbedder, k: int = 10, **kwargs) -> list[VectorStoreSearchResult]:
+        query_embedding = text_embedder(text)
+        if query_embedding:
+            return self.similarity_search_by_vector(query_embedding, k)
+        return []
+
+
+def search_mode() -> tuple[str, int]:
+    mode = os.environ.get("VECTOR_INDEX", DEFAULT_MODE).lower()
+    if mode not in ("exact", "ivf", "lancedb"):
+        raise ValueError(f"VECTOR_INDEX must be exact, ivf or lancedb, not {mode!r}")
+    return mode, int(os.environ.get("VECTOR_INDEX_NPROBE", DEFAULT_NPROBE))
+
+
+def main(argv=None):
+    from utils.artifacts import latest_artifacts_dir
+
+    parser = argparse.ArgumentParser(description="Build the entity description vector index for an artifacts folder.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build")
+    build.add_argument("artifacts", nargs="?", type=Path, help="artifacts folder (default: latest under ./output)")
+    build.add_argument("--nlist", type=int, default=None, help="IVF lists (default: sqrt(entities); 0 for exact only)")
+    build.add_argument("--dtype", choices=DTYPES, default=None, help="stored precision (default: $VECTOR_INDEX_DTYPE or float32)")
+    build.add_argument("--no-float32", action="store_true", help="do not keep float32 rows for rescoring quantized scores")
+    args = parser.parse_args(argv)
+
+    artifacts = args.artifacts or latest_artifacts_dir(".")
+    start = time.perf_counter()
+    entities = pd.read_parquet(artifacts / "create_final_entities.parquet", columns=["id", "description_embedding"])
+    index = VectorIndex.from_entities(entities, args.nlist, args.dtype, not args.no_float32)
+    index.save(artifacts / INDEX_DIR)
+    print(f"Indexed {len(index)} embeddings ({index.store.dtype}, {index.store.nbytes / 1e6:.1f} MB, "
+          f"{index.nlist} IVF lists) in {time.perf_counter() - start:.1f}s -> {artifacts / INDEX_DIR}")
+
+
+if __name__ == "__main__":
+    main()
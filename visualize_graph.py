@@ -1,23 +1,217 @@
-import networkx as nx
-import matplotlib.pyplot as plt
+"""Level-of-detail visualization of the GraphRAG entity graph.
 
-# Load the graph from the .graphml file
-# graph_path = "/Users/elaineyys/Desktop/autogen_graphRAG/output/20241107-151951/artifacts/merged_graph.graphml"
-# graph_path = "/Users/elaineyys/Desktop/autogen_graphRAG/output/20241107-151951/artifacts/embedded_graph.graphml"
-graph_path = "/Users/elaineyys/Desktop/autogen_graphRAG/output/20241126-173731/artifacts/embedded_graph.graphml"
-G = nx.read_graphml(graph_path)
+Pushing every entity of embedded_graph.graphml into pyvis stops working beyond
+a few thousand nodes: the whole XML tree is held in memory and the browser
+runs a physics layout over everything. Instead this script
 
-# # Using a spring layout for better aesthetics
-# pos = nx.spring_layout(G)
+- streams the graphml with iterparse, keeping only the edges it needs:
+  edges between communities are summed as they are read, and only edges inside a
+  community are stored,
+- writes an overview page with one node per community at --level (sized by
+  member count, edges weighted by the links between communities),
+- writes one detail page per community, opened by clicking its node in the
+  overview, with at most --max-nodes of its highest-degree entities, so the
+  browser only draws one trimmed community at a time,
+- computes all layouts offline with a seeded spring layout and caches them
+  next to the artifacts, so pages are rebuilt without recomputing positions and
+  the browser physics stays off.
 
-# plt.figure(figsize=(12, 12))
-# nx.draw(G, pos, with_labels=True, node_color='skyblue', edge_color='gray', node_size=700, font_size=12, font_color='darkblue')
-# plt.title("Graph Visualization")
-# plt.show()
+    python visualize_graph.py --level 1
+    python visualize_graph.py output/20241126-173731/artifacts --level 0 --max-nodes 300
+"""
 
+import argparse
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from pathlib import Path
 
+import networkx as nx
+import pandas as pd
 from pyvis.network import Network
 
-net = Network(notebook=True)
-net.from_nx(G)
-net.show("graph.html")
\ No newline at end of file
+from utils.artifacts import latest_artifacts_dir
+
+SCALE = 1000  # spring_layout positions are in [-1, 1]; pyvis wants pixels
+UNCLUSTERED = "-1"
+OPEN_DETAIL_JS = """
+<script type="text/javascript">
+  network.on("click", function (params) {
+    if (params.nodes.length) {
+      window.location.href = "communities/" + encodeURIComponent(params.nodes[0]) + ".html";
+    }
+  });
+</script>
+</body>"""
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_graphml(path: Path, node_attrs: tuple[str, ...] = ("type", "degree")):
+    """Yield ("node", id, attrs) and ("edge", (source, target), attrs) from a graphml
+    file without building the tree; every element is cleared once it is read."""
+    keys = {}
+    for _, elem in ET.iterparse(path, events=("end",)):
+        tag = _local(elem.tag)
+        if tag == "key":
+            keys[elem.get("id")] = elem.get("attr.name")
+        elif tag in ("node", "edge"):
+            attrs = {}
+            for data in elem:
+                name = keys.get(data.get("key"))
+                if name in node_attrs or (tag == "edge" and name == "weight"):
+                    attrs[name] = data.text
+            if tag == "node":
+                yield "node", elem.get("id"), attrs
+            else:
+                yield "edge", (elem.get("source"), elem.get("target")), attrs
+            elem.clear()
+        elif tag == "graph":
+            elem.clear()
+
+
+def community_membership(artifacts: Path, level: int) -> dict[str, str]:
+    """title -> community at level, read from the nodes table without its other columns."""
+    nodes = pd.read_parquet(artifacts / "create_final_nodes.parquet", columns=["title", "community", "level"])
+    nodes = nodes[nodes["level"] == level].dropna(subset=["community"])
+    return dict(zip(nodes["title"], nodes["community"].astype(str)))
+
+
+class LayoutCache:
+    """Positions per graph, stored as JSON and invalidated when the input files
+    or max_nodes (which decides the subgraphs laid out) change."""
+
+    def __init__(self, path: Path, sources: list[Path], max_nodes: int):
+        self.path = path
+        self.key = [max_nodes] + [
+            [str(source), os.path.getsize(source), os.path.getmtime(source)] for source in sources
+        ]
+        self.layouts: dict[str, dict[str, list[float]]] = {}
+        if path.exists():
+            data = json.loads(path.read_text())
+            if data.get("key") == self.key:
+                self.layouts = data["layouts"]
+        self.dirty = False
+
+    def get(self, name: str, graph: nx.Graph) -> dict[str, list[float]]:
+        if name not in self.layouts:
+            positions = nx.spring_layout(graph, weight="weight", seed=42) if len(graph) else {}
+            self.layouts[name] = {str(node): [float(x), float(y)] for node, (x, y) in positions.items()}
+            self.dirty = True
+        return self.layouts[name]
+
+    def save(self) -> None:
+        if self.dirty:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps({"key": self.key, "layouts": self.layouts}))
+
+
+def load(graph_path: Path, membership: dict[str, str]):
+    """Stream the graph once, returning node attributes, the community graph and
+    the subgraph of every community."""
+    nodes = {}
+    between = Counter()
+    inside = defaultdict(nx.Graph)
+    for kind, key, attrs in iter_graphml(graph_path):
+        if kind == "node":
+            nodes[key] = attrs
+            continue
+        source, target = key
+        weight = float(attrs.get("weight") or 1)
+        a = membership.get(source, UNCLUSTERED)
+        b = membership.get(target, UNCLUSTERED)
+        if a == b:
+            inside[a].add_edge(source, target, weight=weight)
+        else:
+            between[tuple(sorted((a, b)))] += weight
+
+    members = Counter(membership.get(node, UNCLUSTERED) for node in nodes)
+    overview = nx.Graph()
+    for community, size in members.items():
+        overview.add_node(community, size=size)
+    for (a, b), weight in between.items():
+        overview.add_edge(a, b, weight=weight)
+    for node in nodes:
+        community = membership.get(node, UNCLUSTERED)
+        inside[community].add_node(node)
+    return nodes, overview, inside
+
+
+def _network(title: str) -> Network:
+    net = Network(height="900px", width="100%", heading=title, cdn_resources="remote")
+    net.toggle_physics(False)
+    return net
+
+
+def write_overview(path: Path, level: int, overview: nx.Graph, positions: dict) -> None:
+    net = _network(f"Communities at level {level}")
+    largest = max((size for _, size in overview.nodes(data="size")), default=1)
+    for community, size in overview.nodes(data="size"):
+        x, y = positions[community]
+        label = "unclustered" if community == UNCLUSTERED else f"Community {community}"
+        net.add_node(
+            community, label=label, title=f"{label}: {size} entities (click to open)",
+            x=x * SCALE, y=y * SCALE, size=10 + 40 * (size / largest) ** 0.5,
+        )
+    for a, b, weight in overview.edges(data="weight"):
+        net.add_edge(a, b, value=weight, title=f"{weight:g} links")
+    html = net.generate_html().replace("</body>", OPEN_DETAIL_JS, 1)
+    path.write_text(html, encoding="utf-8")
+
+
+def shown_subgraph(graph: nx.Graph, max_nodes: int) -> nx.Graph:
+    """The max_nodes highest weighted-degree nodes of graph, with the edges between them."""
+    if len(graph) <= max_nodes:
+        return graph
+    keep = sorted(graph.nodes, key=lambda node: graph.degree(node, weight="weight"), reverse=True)[:max_nodes]
+    return graph.subgraph(keep)
+
+
+def write_detail(path: Path, community: str, shown: nx.Graph, total: int, nodes: dict, positions: dict) -> None:
+    title = f"Community {community}: {len(shown)} of {total} entities"
+    net = _network(title)
+    for node in shown.nodes:
+        x, y = positions[str(node)]
+        attrs = nodes.get(node, {})
+        net.add_node(
+            node, label=node, title=f"{node} ({attrs.get('type') or 'entity'}, degree {attrs.get('degree') or 0})",
+            x=x * SCALE, y=y * SCALE, size=10 + 2 * shown.degree(node) ** 0.5,
+        )
+    for a, b, weight in shown.edges(data="weight"):
+        net.add_edge(a, b, value=weight)
+    path.write_text(net.generate_html(), encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a community overview and per-community pages for a GraphRAG graph.")
+    parser.add_argument("artifacts", nargs="?", type=Path, help="artifacts folder (default: latest under ./output)")
+    parser.add_argument("--graph", default="embedded_graph.graphml", help="graphml file inside the artifacts folder")
+    parser.add_argument("--level", type=int, default=0, help="community level for the overview")
+    parser.add_argument("--max-nodes", type=int, default=500, help="highest-degree entities shown per community page")
+    parser.add_argument("--out", type=Path, default=Path("graph"), help="output folder")
+    args = parser.parse_args(argv)
+
+    artifacts = args.artifacts or latest_artifacts_dir(".")
+    graph_path = artifacts / args.graph
+    nodes_path = artifacts / "create_final_nodes.parquet"
+    membership = community_membership(artifacts, args.level)
+    nodes, overview, inside = load(graph_path, membership)
+    print(f"{len(nodes)} entities in {overview.number_of_nodes()} communities at level {args.level}")
+
+    cache = LayoutCache(artifacts / "layout_cache" / f"level-{args.level}.json", [graph_path, nodes_path], args.max_nodes)
+    (args.out / "communities").mkdir(parents=True, exist_ok=True)
+    write_overview(args.out / "index.html", args.level, overview, cache.get("overview", overview))
+    for community, graph in inside.items():
+        # Only the shown nodes are laid out: spring_layout is quadratic in the node count.
+        shown = shown_subgraph(graph, args.max_nodes)
+        positions = cache.get(f"community:{community}", shown)
+        write_detail(args.out / "communities" / f"{community}.html", community, shown, len(graph), nodes, positions)
+    cache.save()
+    print(f"Open {args.out / 'index.html'}")
+
+
+if __name__ == "__main__":
+    main()